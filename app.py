@@ -1,66 +1,156 @@
 #!/usr/bin/env python3
-import random
+import sys
 import tkinter as tk
+import weakref
+from tkinter import font as tkfont
 from tkinter import ttk
 
+import telemetry
+from engine import (
+    CARD_LABELS,
+    CARD_TEXT_COLORS,
+    CARDS,
+    card_suit_color,
+    card_suit_symbol,
+    card_text_color,
+    joker_symbol,
+    outcome_lines,
+)
+from journal import open_session
+from odds import mask_press_odds, odds_summary
+from rngs import make_rng
+from sprites import SpriteCache
+from stats import ASPECTS, DECK_FIELDS, SESSION_FIELDS, SessionStats, deck_fields
+from tasks import FRAME_MS, TaskRunner
+from timeline import StreamArchive, Timeline
+
+
+# How often the GUI prints a telemetry summary while tracing is on.
+TELEMETRY_SUMMARY_MS = 10_000
+
+
+class CardSlot:
+    """Canvas items for one card position, reused across redraws.
+
+    ``items`` is the base rectangle followed by five text items, and
+    ``image_item`` shows a pre-rendered sprite instead; each is created on
+    first use. ``layout``, ``face`` and ``image`` remember what was last
+    applied so unchanged properties are not sent to Tk again.
+    """
+
+    __slots__ = (
+        "items",
+        "tag",
+        "rank_tag",
+        "symbol_tag",
+        "layout",
+        "face",
+        "visible",
+        "image_item",
+        "image",
+        "image_position",
+        "image_visible",
+    )
 
-def build_deck():
-    suits = ["Clubs", "Diamonds", "Hearts", "Spades"]
-    ranks = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]
-    deck = [(rank, suit) for suit in suits for rank in ranks]
-    deck.append(("Joker", "Red"))
-    deck.append(("Joker", "Black"))
-    return deck
-
-
-def card_suit_symbol(suit):
-    return {
-        "Clubs": "♣",
-        "Diamonds": "♦",
-        "Hearts": "♥",
-        "Spades": "♠",
-    }[suit]
-
-
-def card_suit_color(suit):
-    return "#b00020" if suit in ("Hearts", "Diamonds") else "#1a1a1a"
-
-
-def suit_interpretation(suit):
-    return {
-        "Clubs": "Intuition/Motivation (Internal State)",
-        "Diamonds": "Perception/Actions (Performance)",
-        "Hearts": "Relationship/Manuver (Tactics)",
-        "Spades": "Understanding/Planning (Stratgy)",
-    }[suit]
-
-
-def skill_aspect_for_suit(suit):
-    return {
-        "Clubs": "Focus",
-        "Diamonds": "Technique",
-        "Hearts": "Tactics",
-        "Spades": "Strategy",
-    }[suit]
-
-
-def card_text_color(rank, suit):
-    if rank == "Joker":
-        return "#b00020" if suit == "Red" else "#1a1a1a"
-    return card_suit_color(suit)
-
-
-def suit_color_name(rank, suit):
-    if rank == "Joker":
-        return "Red" if suit == "Red" else "Black"
-    return "Red" if suit in ("Hearts", "Diamonds") else "Black"
-
-
-def joker_symbol(suit):
-    return "🃏" if suit == "Black" else "🃟"
+    def __init__(self, idx):
+        self.tag = f"slot{idx}"
+        self.rank_tag = f"slot{idx}_rank"
+        self.symbol_tag = f"slot{idx}_symbol"
+        self.items = None
+        self.layout = None
+        self.face = None
+        self.visible = False
+        self.image_item = None
+        self.image = None
+        self.image_position = None
+        self.image_visible = False
+
+    def create_items(self, canvas):
+        rect = canvas.create_rectangle(
+            0,
+            0,
+            0,
+            0,
+            outline="#2b2b2b",
+            width=2,
+            fill="#f8f7f4",
+            tags=(self.tag,),
+        )
+        texts = [
+            canvas.create_text(0, 0, tags=(self.tag, group))
+            for group in (self.rank_tag, self.symbol_tag, self.symbol_tag, self.rank_tag, self.symbol_tag)
+        ]
+        self.items = [rect] + texts
+        self.visible = True
+        telemetry.tracer.count("canvas_items_created", len(self.items))
+
+    def hide(self, canvas):
+        if self.visible:
+            canvas.itemconfigure(self.tag, state="hidden")
+            self.visible = False
+        if self.image_visible:
+            canvas.itemconfigure(self.image_item, state="hidden")
+            self.image_visible = False
+
+
+class CardPool:
+    """Per-canvas slot pool plus the named fonts used at each size."""
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.slots = []
+        self.fonts = {}
+
+    def font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            font = tkfont.Font(root=self.canvas, family="TkDefaultFont", size=size, weight="bold")
+            self.fonts[size] = font
+        return font
+
+    def slot(self, idx):
+        while len(self.slots) <= idx:
+            self.slots.append(CardSlot(len(self.slots)))
+        return self.slots[idx]
+
+
+_card_pools = weakref.WeakKeyDictionary()
+
+
+def card_pool(canvas):
+    pool = _card_pools.get(canvas)
+    if pool is None:
+        pool = CardPool(canvas)
+        _card_pools[canvas] = pool
+    return pool
+
+
+def _layout_card(canvas, pool, slot, joker, left, top, right, bottom, scale):
+    rect, top_corner, top_symbol, bottom_symbol, bottom_corner, center = slot.items
+    center_x = (left + right) / 2
+    center_y = (top + bottom) / 2
+    canvas.coords(rect, left, top, right, bottom)
+    canvas.coords(top_corner, left + 16, top + 18)
+    canvas.itemconfigure(top_corner, font=pool.font(int(21 * scale)))
+    canvas.coords(bottom_corner, right - 16, bottom - 18)
+    canvas.itemconfigure(bottom_corner, font=pool.font(int(21 * scale)))
+    if joker:
+        # Joker: corner symbols, a large center symbol and a label below it.
+        canvas.coords(center, center_x, center_y - 12)
+        canvas.itemconfigure(center, font=pool.font(int(84 * scale)))
+        canvas.coords(top_symbol, center_x, center_y + 30)
+        canvas.itemconfigure(top_symbol, font=pool.font(int(18 * scale)))
+        canvas.itemconfigure(bottom_symbol, text="")
+    else:
+        canvas.coords(center, center_x, center_y)
+        canvas.itemconfigure(center, font=pool.font(int(78 * scale)))
+        canvas.coords(top_symbol, left + 16, top + 36)
+        canvas.itemconfigure(top_symbol, font=pool.font(int(18 * scale)))
+        canvas.coords(bottom_symbol, right - 16, bottom - 36)
+        canvas.itemconfigure(bottom_symbol, font=pool.font(int(18 * scale)))
 
 
-def draw_card_image(canvas, rank, suit, card_width, card_height, offset_x=0, offset_y=0, scale=1.0):
+def draw_card_image(canvas, rank, suit, card_width, card_height, offset_x=0, offset_y=0, scale=1.0, slot_index=0):
     padding = 12
     scaled_width = card_width * scale
     scaled_height = card_height * scale
@@ -70,101 +160,81 @@ def draw_card_image(canvas, rank, suit, card_width, card_height, offset_x=0, off
     card_right = card_left + scaled_width
     card_bottom = card_top + scaled_height
 
-    # Card base
-    canvas.create_rectangle(
-        card_left,
-        card_top,
-        card_right,
-        card_bottom,
-        outline="#2b2b2b",
-        width=2,
-        fill="#f8f7f4",
-    )
-
-    if rank == "Joker":
-        accent = "#b00020" if suit == "Red" else "#1a1a1a"
-        corner_symbol = joker_symbol(suit)
-        canvas.create_text(
-            card_left + 16,
-            card_top + 18,
-            text=corner_symbol,
-            font=("TkDefaultFont", int(21 * scale), "bold"),
-            fill=accent,
-        )
-        canvas.create_text(
-            card_right - 16,
-            card_bottom - 18,
-            text=corner_symbol,
-            font=("TkDefaultFont", int(21 * scale), "bold"),
-            fill=accent,
-        )
-        canvas.create_text(
-            (card_left + card_right) / 2,
-            (card_top + card_bottom) / 2 - 12,
-            text=joker_symbol(suit),
-            font=("TkDefaultFont", int(84 * scale), "bold"),
-            fill=accent,
-        )
-        canvas.create_text(
-            (card_left + card_right) / 2,
-            (card_top + card_bottom) / 2 + 30,
-            text=f"JOKER ({suit})",
-            font=("TkDefaultFont", int(18 * scale), "bold"),
-            fill=accent,
-        )
+    pool = card_pool(canvas)
+    slot = pool.slot(slot_index)
+    if slot.items is None:
+        slot.create_items(canvas)
+    if slot.image_visible:
+        canvas.itemconfigure(slot.image_item, state="hidden")
+        slot.image_visible = False
+    joker = rank == "Joker"
+    layout = (joker, card_left, card_top, card_right, card_bottom, scale)
+    if slot.layout != layout:
+        _layout_card(canvas, pool, slot, joker, card_left, card_top, card_right, card_bottom, scale)
+        slot.layout = layout
+        slot.face = None
+    if not slot.visible:
+        canvas.itemconfigure(slot.tag, state="normal")
+        slot.visible = True
+    if slot.face == (rank, suit):
+        return
+    slot.face = (rank, suit)
+
+    if joker:
+        accent = card_text_color(rank, suit)
+        symbol = joker_symbol(suit)
+        _, _, label, _, _, center = slot.items
+        canvas.itemconfigure(slot.rank_tag, text=symbol, fill=accent)
+        canvas.itemconfigure(center, text=symbol, fill=accent)
+        canvas.itemconfigure(label, text=f"JOKER ({suit})", fill=accent)
         return
 
-    symbol = card_suit_symbol(suit)
+    # Corner ranks share one tag and the corner/center suit symbols another.
     color = card_suit_color(suit)
+    canvas.itemconfigure(slot.rank_tag, text=rank, fill=color)
+    canvas.itemconfigure(slot.symbol_tag, text=card_suit_symbol(suit), fill=color)
 
-    # Corner labels
-    canvas.create_text(
-        card_left + 16,
-        card_top + 18,
-        text=rank,
-        font=("TkDefaultFont", int(21 * scale), "bold"),
-        fill=color,
-    )
-    canvas.create_text(
-        card_left + 16,
-        card_top + 36,
-        text=symbol,
-        font=("TkDefaultFont", int(18 * scale), "bold"),
-        fill=color,
-    )
-
-    canvas.create_text(
-        card_right - 16,
-        card_bottom - 36,
-        text=symbol,
-        font=("TkDefaultFont", int(18 * scale), "bold"),
-        fill=color,
-    )
-    canvas.create_text(
-        card_right - 16,
-        card_bottom - 18,
-        text=rank,
-        font=("TkDefaultFont", int(21 * scale), "bold"),
-        fill=color,
-    )
 
-    # Center emblem
-    canvas.create_text(
-        (card_left + card_right) / 2,
-        (card_top + card_bottom) / 2,
-        text=symbol,
-        font=("TkDefaultFont", int(78 * scale), "bold"),
-        fill=color,
-    )
-
-
-def draw_card_stack(canvas, cards, card_width, card_height, stack_offset=32, max_stack=8, allow_scale=True):
-    canvas.delete("all")
-    if not cards:
+def draw_card_sprite(canvas, image, offset_x=0, offset_y=0, slot_index=0):
+    padding = 12
+    slot = card_pool(canvas).slot(slot_index)
+    if slot.visible:
+        canvas.itemconfigure(slot.tag, state="hidden")
+        slot.visible = False
+    # Sprites carry their 2px border, so they sit one pixel up and left.
+    position = (padding + offset_x - 1, padding + offset_y - 1)
+    if slot.image_item is None:
+        slot.image_item = canvas.create_image(*position, anchor="nw", image=image)
+        telemetry.tracer.count("canvas_items_created")
+        slot.image = image
+        slot.image_position = position
+        slot.image_visible = True
         return
-
-    stack_offset = stack_offset
-    max_stack = max_stack
+    if slot.image_position != position:
+        canvas.coords(slot.image_item, *position)
+        slot.image_position = position
+    if slot.image is not image:
+        if slot.image_visible:
+            canvas.itemconfigure(slot.image_item, image=image)
+        else:
+            canvas.itemconfigure(slot.image_item, image=image, state="normal")
+            slot.image_visible = True
+        slot.image = image
+    elif not slot.image_visible:
+        canvas.itemconfigure(slot.image_item, state="normal")
+        slot.image_visible = True
+
+
+def draw_card_stack(
+    canvas,
+    cards,
+    card_width,
+    card_height,
+    stack_offset=32,
+    max_stack=8,
+    allow_scale=True,
+    sprites=None,
+):
     start = max(0, len(cards) - max_stack)
     visible_cards = cards[start:]
 
@@ -172,7 +242,6 @@ def draw_card_stack(canvas, cards, card_width, card_height, stack_offset=32, max
     if not allow_scale or len(visible_cards) <= 5:
         scale = 1.0
     else:
-        padding = 12
         base_inner_width = card_width
         max_offset = (len(visible_cards) - 1) * stack_offset
         if base_inner_width > 0:
@@ -183,6 +252,15 @@ def draw_card_stack(canvas, cards, card_width, card_height, stack_offset=32, max
     for idx, (rank, suit) in enumerate(visible_cards):
         offset_x = idx * stack_offset
         offset_y = 0
+        if sprites is not None:
+            draw_card_sprite(
+                canvas,
+                sprites.get(rank, suit, scale),
+                offset_x=offset_x,
+                offset_y=offset_y,
+                slot_index=idx,
+            )
+            continue
         draw_card_image(
             canvas,
             rank,
@@ -192,16 +270,219 @@ def draw_card_stack(canvas, cards, card_width, card_height, stack_offset=32, max
             offset_x=offset_x,
             offset_y=offset_y,
             scale=scale,
+            slot_index=idx,
         )
-
-
-def main():
-    deck = []
-    history = []
-    draw_batches = []
-
+    # Hide leftover slots from a taller stack instead of deleting them.
+    for slot in card_pool(canvas).slots[len(visible_cards):]:
+        slot.hide(canvas)
+
+
+class HistoryPane:
+    """The "Drawn:" Text widget, kept in step with the timeline.
+
+    Only the last ``window`` presses of the segment are shown, behind a
+    count of the earlier ones, so the widget stays the same size however
+    long the session runs. It is a capped view, not a scrollable log:
+    earlier presses come back into it only when undo empties most of the
+    window, and Seek shows any press of the line without moving to it.
+    ``nodes`` are the presses shown and ``starts``
+    the Text column where each one's tokens begin, so moving along the
+    timeline only touches the presses that differ; tags are shared per
+    color rather than per card. The pane is a single logical line, which
+    is why a column is enough to locate a press.
+    """
+
+    def __init__(self, text, window=500):
+        self.text = text
+        self.window = window
+        self.nodes = []
+        self.index = {}
+        self.starts = []
+        self.tags = {}
+        # Presses of the segment before nodes[0] that are not shown.
+        self.hidden = 0
+        text.insert("1.0", self.header())
+        text.config(state="disabled")
+
+    def header(self):
+        if self.hidden:
+            return f"Drawn: (… {self.hidden} earlier) "
+        return "Drawn: "
+
+    def tag(self, color):
+        tag = self.tags.get(color)
+        if tag is None:
+            tag = f"color_{len(self.tags)}"
+            self.text.tag_configure(tag, foreground=color)
+            self.tags[color] = tag
+        return tag
+
+    def append(self, nodes):
+        text = self.text
+        text.config(state="normal")
+        for node in nodes:
+            chunks = []
+            for card in node.cards:
+                chunks.append(f"{CARD_LABELS[card]} ")
+                chunks.append(self.tag(CARD_TEXT_COLORS[card]))
+            chunks.append("; ")
+            chunks.append(())
+            self.index[node] = len(self.nodes)
+            self.nodes.append(node)
+            self.starts.append(int(text.index("end-1c").partition(".")[2]))
+            text.insert("end", *chunks)
+        ops = 2 + 2 * len(nodes)
+        # Let the pane run a quarter over the window before dropping the
+        # oldest presses, so the renumbering is paid once per batch.
+        if len(self.nodes) > self.window + max(1, self.window // 4):
+            self.drop_oldest(len(self.nodes) - self.window)
+            ops += 2
+        text.config(state="disabled")
+        telemetry.tracer.count("text_ops", ops)
+
+    def drop_oldest(self, count):
+        """Replace the oldest ``count`` presses with the earlier count."""
+        text = self.text
+        self.hidden += count
+        header = self.header()
+        text.delete("1.0", f"1.{self.starts[count]}")
+        text.insert("1.0", header)
+        shift = self.starts[count] - len(header)
+        for node in self.nodes[:count]:
+            del self.index[node]
+        del self.nodes[:count]
+        self.starts = [start - shift for start in self.starts[count:]]
+        for position, node in enumerate(self.nodes):
+            self.index[node] = position
+
+    def trim(self, keep):
+        if keep >= len(self.nodes):
+            return
+        text = self.text
+        text.config(state="normal")
+        text.delete(f"1.{self.starts[keep]}", "end-1c")
+        text.config(state="disabled")
+        telemetry.tracer.count("text_ops", 3)
+        for node in self.nodes[keep:]:
+            del self.index[node]
+        del self.nodes[keep:]
+        del self.starts[keep:]
+
+    def clear(self, hidden=0):
+        self.nodes.clear()
+        self.index.clear()
+        self.starts.clear()
+        self.hidden = hidden
+        text = self.text
+        text.config(state="normal")
+        text.delete("1.0", "end")
+        text.insert("1.0", self.header())
+        text.config(state="disabled")
+        telemetry.tracer.count("text_ops", 4)
+
+    def sync(self, current):
+        # Walk up from the current node to the nearest press already shown
+        # (or the segment start, or a full window), trim below it and
+        # append the rest.
+        missing = []
+        node = current
+        while not node.reshuffle and node not in self.index and len(missing) < self.window:
+            missing.append(node)
+            node = node.parent
+        if node in self.index:
+            self.trim(self.index[node] + 1)
+        elif node.reshuffle and not self.hidden and self.nodes and self.nodes[0].parent is node:
+            self.trim(0)
+        else:
+            self.clear(current.depth - len(missing))
+        if self.hidden and len(self.nodes) + len(missing) < self.window // 2:
+            # Undo has emptied most of the window; page earlier presses
+            # back in so the pane is full again.
+            node = current
+            missing = []
+            while not node.reshuffle and len(missing) < self.window:
+                missing.append(node)
+                node = node.parent
+            self.clear(current.depth - len(missing))
+        if missing:
+            missing.reverse()
+            self.append(missing)
+
+    def rebind(self, current):
+        """Point the shown presses at ``current``'s line after a compact().
+
+        The pane must have been synced to the same position beforehand.
+        """
+        node = current
+        for position in range(len(self.nodes) - 1, -1, -1):
+            self.nodes[position] = node
+            node = node.parent
+        self.index = {node: position for position, node in enumerate(self.nodes)}
+
+
+class StatsPanel:
+    """Labels for the deck and session figures, one per field.
+
+    update() only touches the labels whose text changed, so a press that
+    leaves most of the figures alone costs a Tcl call or two.
+    """
+
+    def __init__(self, parent, fields):
+        self.vars = {}
+        self.shown = {}
+        for field in fields:
+            var = tk.StringVar(value="")
+            ttk.Label(parent, textvariable=var, wraplength=220, justify="left").pack(anchor="w", pady=(0, 4))
+            self.vars[field] = var
+            self.shown[field] = ""
+
+    def update(self, values):
+        shown = self.shown
+        changed = 0
+        for field, text in values.items():
+            if shown[field] != text:
+                shown[field] = text
+                self.vars[field].set(text)
+                changed += 1
+        telemetry.tracer.count("stats_fields_set", changed)
+
+
+def odds_task(task, mask):
+    return odds_summary(mask_press_odds(mask))
+
+
+def main(
+    window_title="Card Drawer",
+    use_sprites=True,
+    warm_sprites=True,
+    journal_path=None,
+    trace_path=None,
+    history_window=500,
+    rng_backend="random",
+):
+    """Run the GUI.
+
+    With ``trace_path`` (or GOE_TRACE in the environment) set, draw, undo
+    and reshuffle are timed per phase, a summary goes to stderr every
+    TELEMETRY_SUMMARY_MS and a Chrome trace is written on close.
+
+    Every ``history_window`` new presses the timeline is compacted: older
+    presses are folded into card streams archived to a temporary file,
+    and branches that have not grown since the previous compaction are
+    dropped. The history pane shows the last ``history_window`` presses.
+    """
+    if trace_path:
+        telemetry.enable()
+    else:
+        trace_path = telemetry.from_environment()
+    rng = make_rng(rng_backend)
+    session_stats = SessionStats()
+    if journal_path is not None:
+        timeline, journal = open_session(journal_path, rng, stats=session_stats)
+    else:
+        timeline, journal = Timeline(rng), None
     root = tk.Tk()
-    root.title("Card Drawer")
+    root.title(window_title)
     # Poker size ratio: 2.5" x 3.5" -> 5:7 aspect
     card_width = 250
     card_height = 350
@@ -210,8 +491,18 @@ def main():
     canvas_width = card_width + (max_visible - 1) * stack_offset + 24
     canvas_height = card_height + 24
 
-    root.geometry("780x1000")
-    root.minsize(780, 1000)
+    sprites = SpriteCache.create(root, card_width, card_height) if use_sprites else None
+    if sprites is not None and warm_sprites:
+        sprites.warm()
+
+        def promote_sprites():
+            if sprites.promote():
+                root.after(50, promote_sprites)
+
+        root.after(50, promote_sprites)
+
+    root.geometry("1020x1000")
+    root.minsize(1020, 1000)
     root.resizable(True, True)
 
     style = ttk.Style(root)
@@ -220,8 +511,78 @@ def main():
     except tk.TclError:
         pass
 
+    side = ttk.Frame(root, padding=(0, 16, 16, 16), width=240)
+    side.pack(side="right", fill="y")
+    ttk.Label(side, text="Deck", font=("TkDefaultFont", 15, "bold")).pack(anchor="w", pady=(0, 6))
+    deck_panel = StatsPanel(side, DECK_FIELDS)
+    ttk.Label(side, text="Session", font=("TkDefaultFont", 15, "bold")).pack(anchor="w", pady=(12, 6))
+    session_panel = StatsPanel(side, SESSION_FIELDS)
+
+    ttk.Label(side, text="Seek", font=("TkDefaultFont", 15, "bold")).pack(anchor="w", pady=(12, 6))
+    seek_row = ttk.Frame(side)
+    seek_row.pack(anchor="w", fill="x")
+    seek_var = tk.StringVar(value="")
+    seek_entry = ttk.Entry(seek_row, textvariable=seek_var, width=10)
+    seek_entry.pack(side="left")
+    seek_result_var = tk.StringVar(value="Press number on this line")
+    ttk.Label(side, textvariable=seek_result_var, wraplength=220, justify="left").pack(anchor="w", pady=(6, 0))
+
+    def seek_press(event=None):
+        # Shows the press without moving the timeline, for checking a
+        # disputed draw.
+        try:
+            found = timeline.seek(int(seek_var.get()))
+        except (ValueError, IndexError):
+            seek_result_var.set("No such press on this line")
+            return
+        _, _, outcome_text, adv_text, xp_text = outcome_lines(found.outcome)
+        lines = [
+            f"Press {found.press} (deck {found.cycle + 1}, card {found.position})",
+            "Drawn: " + " ".join(CARD_LABELS[card] for card in found.cards),
+            outcome_text,
+        ]
+        lines.extend(text for text in (adv_text, xp_text) if text)
+        lines.append("Deck after: " + (" ".join(CARD_LABELS[card] for card in found.deck) or "empty"))
+        seek_result_var.set("\n".join(lines))
+
+    ttk.Button(seek_row, text="Seek", command=seek_press).pack(side="left", padx=(6, 0))
+    seek_entry.bind("<Return>", seek_press)
+
+    ttk.Label(side, text="Range", font=("TkDefaultFont", 15, "bold")).pack(anchor="w", pady=(12, 6))
+    range_row = ttk.Frame(side)
+    range_row.pack(anchor="w", fill="x")
+    range_var = tk.StringVar(value="")
+    range_entry = ttk.Entry(range_row, textvariable=range_var, width=14)
+    range_entry.pack(side="left")
+    range_result_var = tk.StringVar(value="Presses a-b; leave an end blank for the first or latest")
+    ttk.Label(side, textvariable=range_result_var, wraplength=220, justify="left").pack(anchor="w", pady=(6, 0))
+
+    def sum_range(event=None):
+        index = session_stats.index
+        first, dash, last = range_var.get().strip().partition("-")
+        try:
+            first = int(first) if first.strip() else 1
+            last = int(last) if last.strip() else (len(index) if dash else first)
+            totals = index.range(first, last)
+        except (ValueError, IndexError):
+            range_result_var.set("No such presses on this line")
+            return
+        lines = [
+            f"Presses {first}-{last} ({totals['presses']})",
+            f"Advantage: {totals['advantage']:+d} (matches {totals['face_matches']},"
+            f" mismatches {totals['face_mismatches']})",
+            f"Jokers: {totals['jokers']}",
+            f"Mean length: {totals['press_length'] / totals['presses']:.2f}",
+            "XP: " + ", ".join(f"{aspect} {totals[aspect]}" for aspect in ASPECTS),
+            f"Joker XP: {totals['joker_xp']}",
+        ]
+        range_result_var.set("\n".join(lines))
+
+    ttk.Button(range_row, text="Sum", command=sum_range).pack(side="left", padx=(6, 0))
+    range_entry.bind("<Return>", sum_range)
+
     container = ttk.Frame(root, padding=16)
-    container.pack(fill="both", expand=True)
+    container.pack(side="left", fill="both", expand=True)
 
     title = ttk.Label(container, text="Draw a Card", font=("TkDefaultFont", 24, "bold"))
     title.pack(pady=(0, 8))
@@ -246,8 +607,9 @@ def main():
         font=("TkDefaultFont", 15),
     )
     history_text.pack(pady=(0, 10), fill="x")
-    history_text.insert("1.0", "Drawn: ")
-    history_text.config(state="disabled")
+    history = HistoryPane(history_text, history_window)
+    archive = StreamArchive()
+    compacted_at = timeline.next_serial
 
     interpretation_var = tk.StringVar(value="Suit Meaning: ")
     interpretation_label = ttk.Label(
@@ -289,221 +651,148 @@ def main():
     )
     xp_label.pack(pady=(0, 10))
 
-    def format_card_short(rank, suit):
-        if rank == "Joker":
-            return joker_symbol(suit)
-        return f"{card_suit_symbol(suit)}{rank}"
-
-    def update_history():
-        history_text.config(state="normal")
-        history_text.delete("1.0", "end")
-        history_text.insert("1.0", "Drawn: ")
-        for idx, (token, color, is_separator) in enumerate(history):
-            if is_separator:
-                history_text.insert("end", "; ")
-                continue
-            tag = f"card_{idx}"
-            history_text.tag_configure(tag, foreground=color)
-            history_text.insert("end", f"{token} ", tag)
-        history_text.config(state="disabled")
-
-    pip_ranks = {"A", "2", "3", "4", "5", "6", "7", "8", "9", "10"}
-
-    def draw_card():
-        nonlocal deck
-        last_rank = None
-        last_suit = None
-        drawn_cards = []
-        drawn_this_press = []
-        while True:
-            if not deck:
-                deck = build_deck()
-                random.shuffle(deck)
-            rank, suit = deck.pop()
-            drawn_cards.append((rank, suit))
-            drawn_this_press.append((format_card_short(rank, suit), card_text_color(rank, suit)))
-            if rank in pip_ranks:
-                last_rank = rank
-                last_suit = suit
-                break
-        if last_rank == "Joker":
-            card_var.set(f"Joker ({last_suit})")
-            interpretation_var.set("Suit Meaning: Joker")
-            outcome_var.set("Outcome: ")
-        else:
-            card_var.set(f"{last_rank} of {last_suit}")
-            interpretation_var.set(f"Suit Meaning: {suit_interpretation(last_suit)}")
-            pip_color = suit_color_name(last_rank, last_suit)
-            face_matches = 0
-            face_mismatches = 0
-            face_count = 0
-            joker_count = 0
-            for rank, suit in drawn_cards:
-                if rank in {"J", "Q", "K"}:
-                    face_count += 1
-                    if suit_color_name(rank, suit) == pip_color:
-                        face_matches += 1
-                    else:
-                        face_mismatches += 1
-                elif rank == "Joker":
-                    joker_count += 1
-            net_advantage = face_matches - face_mismatches
-            outcome_parts = []
-            adv_var.set("")
-            xp_var.set("")
-            if face_count > 0:
-                if net_advantage > 0:
-                    adv_var.set(f"Advantage: +{net_advantage}")
-                    outcome_parts.append(f"Advantage +{net_advantage}")
-                elif net_advantage < 0:
-                    adv_var.set(f"Disadvantage: {net_advantage}")
-                    outcome_parts.append(f"Disadvantage {net_advantage}")
-                else:
-                    adv_var.set("Adv/Dis: Neutral (0)")
-                    outcome_parts.append("Neutral (0)")
-            xp_parts = []
-            if joker_count > 0:
-                suit_counts = {"Clubs": 0, "Diamonds": 0, "Hearts": 0, "Spades": 0}
-                for rank, suit in drawn_cards:
-                    if rank in {"J", "Q", "K"}:
-                        suit_counts[suit] += 1
-                for suit, count in suit_counts.items():
-                    if count > 0:
-                        xp_parts.append(f"+{count} {skill_aspect_for_suit(suit)}")
-                xp_parts.append(
-                    f"+{joker_count} {skill_aspect_for_suit(last_suit)} (Joker)"
-                )
-            if xp_parts:
-                xp_var.set("PoV XP: " + ", ".join(xp_parts))
-                outcome_parts.append("PoV XP " + ", ".join(xp_parts))
-            if not outcome_parts:
-                outcome_parts.append("Neutral (0)")
-            outcome_var.set("Outcome: " + " | ".join(outcome_parts))
-        card_label.configure(foreground=card_text_color(last_rank, last_suit))
+    odds_var = tk.StringVar(value="")
+    odds_label = ttk.Label(
+        container,
+        textvariable=odds_var,
+        font=("TkDefaultFont", 12),
+        wraplength=700,
+        justify="left",
+    )
+    odds_label.pack(pady=(0, 4))
+
+    # Shown moving while background work takes longer than a frame.
+    progress = ttk.Progressbar(container, mode="determinate", length=200)
+    progress.pack(pady=(0, 10))
+    progress_mode = None
+
+    def show_busy(count, fraction):
+        nonlocal progress_mode
+        mode = None if not count else "indeterminate" if fraction is None else "determinate"
+        if mode != progress_mode:
+            progress.stop()
+            progress.configure(mode=mode or "determinate", value=0)
+            if mode == "indeterminate":
+                progress.start(FRAME_MS)
+            progress_mode = mode
+        if mode == "determinate":
+            progress.configure(value=100 * fraction)
+
+    tasks = TaskRunner(root, on_busy=show_busy)
+
+    def show_batch(cards, outcome):
+        card_text, meaning_text, outcome_text, adv_text, xp_text = outcome_lines(outcome)
+        card_var.set(card_text)
+        interpretation_var.set(meaning_text)
+        outcome_var.set(outcome_text)
+        adv_var.set(adv_text)
+        xp_var.set(xp_text)
+        card_label.configure(foreground=card_text_color(outcome.rank, outcome.suit))
         draw_card_stack(
             card_canvas,
-            drawn_cards,
+            [CARDS[card] for card in cards],
             card_width,
             card_height,
             stack_offset=stack_offset,
             max_stack=8,
             allow_scale=False,
+            sprites=sprites,
         )
-        for token, color in drawn_this_press:
-            history.append((token, color, False))
-        history.append(("", "", True))
-        draw_batches.append(drawn_cards)
-        update_history()
 
-    def reshuffle():
-        nonlocal deck, history, draw_batches
-        deck = build_deck()
-        random.shuffle(deck)
-        history = []
-        draw_batches = []
+    def show_empty():
         card_var.set("Press the button to draw")
         interpretation_var.set("Suit Meaning: ")
         outcome_var.set("Outcome: ")
         adv_var.set("")
         xp_var.set("")
         card_label.configure(foreground="#1a1a1a")
-        card_canvas.delete("all")
-        update_history()
+        draw_card_stack(card_canvas, [], card_width, card_height)
+
+    def update_odds():
+        # Exact odds can take a few frames for an uncommon deck; the label
+        # keeps the previous deck's figures until they arrive.
+        tasks.submit("odds", odds_task, timeline.deck_mask(), on_done=odds_var.set)
+
+    def branch_label(idx, node):
+        if node.reshuffle:
+            return f"Branch {idx + 1}: reshuffled"
+        return f"Branch {idx + 1}: {node.depth} presses, {CARD_LABELS[node.cards[-1]]}"
+
+    def refresh_branches():
+        tips = timeline.branches()
+        branch_box.configure(values=[branch_label(idx, node) for idx, node in enumerate(tips)])
+        branch_var.set("")
+
+    def show_current():
+        trace = telemetry.tracer
+        node = timeline.current
+        if node.reshuffle:
+            with trace.span("view.render"):
+                show_empty()
+        else:
+            with trace.span("view.outcome"):
+                outcome = node.outcome
+            with trace.span("view.render"):
+                show_batch(node.cards, outcome)
+        with trace.span("view.history"):
+            history.sync(timeline.current)
+        with trace.span("view.odds"):
+            update_odds()
+        with trace.span("view.stats"):
+            session_stats.follow(timeline)
+            deck_panel.update(deck_fields(timeline.deck_mask()))
+            session_panel.update(session_stats.fields())
+        with trace.span("view.branches"):
+            refresh_branches()
+
+    def compact_history():
+        nonlocal compacted_at
+        if timeline.next_serial - compacted_at < history_window:
+            return
+        with telemetry.tracer.span("compact"):
+            if timeline.compact(archive, prune_before=compacted_at):
+                history.rebind(timeline.current)
+                session_stats.rebind(timeline.current)
+                refresh_branches()
+            compacted_at = timeline.next_serial
+
+    def draw_card():
+        trace = telemetry.tracer
+        with trace.span("draw"):
+            with trace.span("draw.deck"):
+                timeline.press()
+            show_current()
+        compact_history()
+
+    def reshuffle():
+        trace = telemetry.tracer
+        with trace.span("reshuffle"):
+            with trace.span("reshuffle.deck"):
+                timeline.reshuffle()
+            show_current()
 
     def go_back_one_draw():
-        nonlocal deck, history, draw_batches
-        if not draw_batches:
-            return
-        last_batch = draw_batches.pop()
-        # Return cards to the top of the deck in reverse draw order.
-        for rank, suit in reversed(last_batch):
-            deck.append((rank, suit))
-
-        # Remove history entries for the last batch plus its separator.
-        remove_count = len(last_batch) + 1
-        if remove_count <= len(history):
-            history = history[:-remove_count]
-        else:
-            history = []
-
-        # Update display to previous batch or reset.
-        if draw_batches:
-            prev_batch = draw_batches[-1]
-            prev_rank, prev_suit = prev_batch[-1]
-            if prev_rank == "Joker":
-                card_var.set(f"Joker ({prev_suit})")
-                interpretation_var.set("Suit Meaning: Joker")
-                outcome_var.set("Outcome: ")
-                adv_var.set("")
-                xp_var.set("")
-            else:
-                card_var.set(f"{prev_rank} of {prev_suit}")
-                interpretation_var.set(f"Suit Meaning: {suit_interpretation(prev_suit)}")
-                pip_color = suit_color_name(prev_rank, prev_suit)
-                face_matches = 0
-                face_mismatches = 0
-                face_count = 0
-                joker_count = 0
-                for rank, suit in prev_batch:
-                    if rank in {"J", "Q", "K"}:
-                        face_count += 1
-                        if suit_color_name(rank, suit) == pip_color:
-                            face_matches += 1
-                        else:
-                            face_mismatches += 1
-                    elif rank == "Joker":
-                        joker_count += 1
-                net_advantage = face_matches - face_mismatches
-                outcome_parts = []
-                adv_var.set("")
-                xp_var.set("")
-                if face_count > 0:
-                    if net_advantage > 0:
-                        adv_var.set(f"Advantage: +{net_advantage}")
-                        outcome_parts.append(f"Advantage +{net_advantage}")
-                    elif net_advantage < 0:
-                        adv_var.set(f"Disadvantage: {net_advantage}")
-                        outcome_parts.append(f"Disadvantage {net_advantage}")
-                    else:
-                        adv_var.set("Adv/Dis: Neutral (0)")
-                        outcome_parts.append("Neutral (0)")
-                xp_parts = []
-                if joker_count > 0:
-                    suit_counts = {"Clubs": 0, "Diamonds": 0, "Hearts": 0, "Spades": 0}
-                    for rank, suit in prev_batch:
-                        if rank in {"J", "Q", "K"}:
-                            suit_counts[suit] += 1
-                    for suit, count in suit_counts.items():
-                        if count > 0:
-                            xp_parts.append(f"+{count} {skill_aspect_for_suit(suit)}")
-                    xp_parts.append(
-                        f"+{joker_count} {skill_aspect_for_suit(prev_suit)} (Joker)"
-                    )
-                if xp_parts:
-                    xp_var.set("PoV XP: " + ", ".join(xp_parts))
-                    outcome_parts.append("PoV XP " + ", ".join(xp_parts))
-                if not outcome_parts:
-                    outcome_parts.append("Neutral (0)")
-                outcome_var.set("Outcome: " + " | ".join(outcome_parts))
-            card_label.configure(foreground=card_text_color(prev_rank, prev_suit))
-            draw_card_stack(
-                card_canvas,
-                prev_batch,
-                card_width,
-                card_height,
-                stack_offset=stack_offset,
-                max_stack=8,
-                allow_scale=False,
-            )
-        else:
-            card_var.set("Press the button to draw")
-            interpretation_var.set("Suit Meaning: ")
-            outcome_var.set("Outcome: ")
-            adv_var.set("")
-            xp_var.set("")
-            card_label.configure(foreground="#1a1a1a")
-            card_canvas.delete("all")
-        update_history()
+        trace = telemetry.tracer
+        with trace.span("undo"):
+            with trace.span("undo.deck"):
+                node = timeline.undo()
+            if node is not None:
+                show_current()
+
+    def redo_draw():
+        trace = telemetry.tracer
+        with trace.span("redo"):
+            with trace.span("redo.deck"):
+                node = timeline.redo()
+            if node is not None:
+                show_current()
+
+    def switch_branch(event=None):
+        idx = branch_box.current()
+        tips = timeline.branches()
+        if 0 <= idx < len(tips):
+            timeline.checkout(tips[idx])
+            show_current()
 
     draw_button = ttk.Button(container, text="Draw Card", command=draw_card)
     draw_button.pack(pady=(0, 6))
@@ -514,14 +803,52 @@ def main():
     go_back_button = ttk.Button(container, text="Go Back One Draw", command=go_back_one_draw)
     go_back_button.pack(pady=(6, 0))
 
+    redo_button = ttk.Button(container, text="Redo Draw", command=redo_draw)
+    redo_button.pack(pady=(6, 0))
+
     reshuffle_button = ttk.Button(container, text="Reshuffle Deck", command=reshuffle)
     reshuffle_button.pack(pady=(6, 0))
 
-    # Initial draw to show a card image
-    draw_card()
+    branch_var = tk.StringVar(value="")
+    branch_box = ttk.Combobox(container, textvariable=branch_var, state="readonly", width=40)
+    branch_box.pack(pady=(6, 0))
+    branch_box.bind("<<ComboboxSelected>>", switch_branch)
+
+    if journal is not None:
+
+        def sync_journal():
+            journal.sync()
+            root.after(1000, sync_journal)
+
+        root.after(1000, sync_journal)
+
+    if telemetry.tracer.enabled:
+
+        def report_telemetry():
+            print(telemetry.tracer.format_summary(), file=sys.stderr)
+            root.after(TELEMETRY_SUMMARY_MS, report_telemetry)
+
+        root.after(TELEMETRY_SUMMARY_MS, report_telemetry)
+
+    def close():
+        if journal is not None:
+            journal.close()
+        archive.close()
+        tasks.close()
+        if trace_path:
+            telemetry.tracer.write_chrome_trace(trace_path)
+        root.destroy()
+
+    root.protocol("WM_DELETE_WINDOW", close)
+
+    if timeline.current is timeline.root:
+        # Initial draw to show a card image
+        draw_card()
+    else:
+        show_current()
 
     root.mainloop()
 
 
 if __name__ == "__main__":
-    main()
+    main(journal_path=sys.argv[1] if len(sys.argv) > 1 else None)
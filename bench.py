@@ -0,0 +1,397 @@
+"""Regression benchmarks for the engine and the GUI drawing paths.
+
+    python3 bench.py                      # compare with bench_baseline.json
+    python3 bench.py --save bench_baseline.json
+    python3 bench.py --tk                 # also time a real Tk (Xvfb if needed)
+
+The GUI paths run against RecordingCanvas and RecordingText, stand-ins
+for tk.Canvas and tk.Text that count every widget call (each one is a
+Tcl round trip in real Tk), so they need no display. Every benchmark
+reports time per op, bytes allocated and retained per op (tracemalloc)
+and Tcl calls per op.
+
+The baseline comparison gates only on the deterministic metrics: Tcl
+call counts must not grow at all and allocations may grow by
+--alloc-tolerance. Times vary by more than a real regression from run
+to run, so they are reported but only checked with --time-tolerance.
+They are stored relative to a fixed pure-Python calibration loop timed
+in the same run, so a baseline recorded on one machine stays meaningful
+on another.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import app
+from engine import CARDS, Session, build_deck, resolve_press
+from timeline import Timeline
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+CARD_WIDTH = 250
+CARD_HEIGHT = 350
+
+
+class RecordingTk:
+    """Stands in for the Tcl interpreter behind tkinter.font.Font."""
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    def call(self, *args):
+        self.recorder.calls += 1
+        return ""
+
+    def splitlist(self, value):
+        return tuple(value) if isinstance(value, tuple) else tuple(str(value).split())
+
+
+class RecordingCanvas:
+    def __init__(self):
+        self.calls = 0
+        self.next_item = 0
+        self.tk = RecordingTk(self)
+
+    def _create(self, *args, **options):
+        self.calls += 1
+        self.next_item += 1
+        return self.next_item
+
+    create_rectangle = _create
+    create_text = _create
+    create_image = _create
+
+    def coords(self, item, *args):
+        self.calls += 1
+
+    def itemconfigure(self, tag_or_id, **options):
+        self.calls += 1
+
+
+class RecordingText:
+    """Tracks just enough of a Text widget to answer index("end-1c")."""
+
+    def __init__(self):
+        self.calls = 0
+        self.length = 0
+        self.tk = RecordingTk(self)
+
+    def config(self, **options):
+        self.calls += 1
+
+    configure = config
+
+    def tag_configure(self, tag, **options):
+        self.calls += 1
+
+    def index(self, index):
+        self.calls += 1
+        return f"1.{self.length}"
+
+    def insert(self, index, *chunks):
+        self.calls += 1
+        self.length += sum(len(chunk) for chunk in chunks[::2])
+
+    def delete(self, start, end=None):
+        self.calls += 1
+        first = int(start.partition(".")[2])
+        if end is None or end.startswith("end"):
+            self.length = first
+        else:
+            self.length -= int(end.partition(".")[2]) - first
+
+
+class FakeSprites:
+    def __init__(self):
+        self.images = {}
+
+    def get(self, rank, suit, scale=1.0):
+        key = (rank, suit, scale)
+        image = self.images.get(key)
+        if image is None:
+            image = self.images[key] = object()
+        return image
+
+
+def _presses(count=4096, seed=1):
+    session = Session(random.Random(seed))
+    return [session.draw_press() for _ in range(count)]
+
+
+def _display_presses(count=4096, seed=1):
+    return [[CARDS[card] for card in cards] for cards in _presses(count, seed)]
+
+
+# Each setup returns (op, recorder); recorder has a ``calls`` count or is None.
+
+
+def setup_build_deck():
+    return build_deck, None
+
+
+def setup_shoe_press():
+    session = Session(random.Random(1), decks=6)
+    draw_press = session.draw_press
+    return (lambda: resolve_press(draw_press())), None
+
+
+def setup_resolve_press():
+    presses = itertools.cycle(_presses())
+    return (lambda: resolve_press(next(presses))), None
+
+
+def setup_timeline_press():
+    timeline = Timeline(random.Random(1))
+    return timeline.press, None
+
+
+def setup_draw_card_image(canvas=None):
+    canvas = canvas or RecordingCanvas()
+    cards = itertools.cycle(CARDS)
+
+    def op():
+        rank, suit = next(cards)
+        app.draw_card_image(canvas, rank, suit, CARD_WIDTH, CARD_HEIGHT)
+
+    return op, canvas
+
+
+def setup_draw_card_stack(canvas=None, sprites=None):
+    canvas = canvas or RecordingCanvas()
+    presses = itertools.cycle(_display_presses())
+
+    def op():
+        app.draw_card_stack(
+            canvas,
+            next(presses),
+            CARD_WIDTH,
+            CARD_HEIGHT,
+            max_stack=8,
+            allow_scale=False,
+            sprites=sprites,
+        )
+
+    return op, canvas
+
+
+def setup_draw_card_stack_sprites():
+    return setup_draw_card_stack(sprites=FakeSprites())
+
+
+def setup_history_sync(text=None):
+    text = text or RecordingText()
+    pane = app.HistoryPane(text)
+    timeline = Timeline(random.Random(1))
+    # Mostly presses, with undo runs and the odd reshuffle, as in play.
+    actions = itertools.cycle(["press"] * 12 + ["undo"] * 3 + ["press"] * 20 + ["reshuffle"])
+    steps = {"press": timeline.press, "undo": timeline.undo, "reshuffle": timeline.reshuffle}
+
+    def op():
+        steps[next(actions)]()
+        pane.sync(timeline.current)
+
+    return op, text
+
+
+BENCHMARKS = {
+    "build_deck": setup_build_deck,
+    "shoe_press": setup_shoe_press,
+    "resolve_press": setup_resolve_press,
+    "timeline_press": setup_timeline_press,
+    "draw_card_image": setup_draw_card_image,
+    "draw_card_stack": setup_draw_card_stack,
+    "draw_card_stack_sprites": setup_draw_card_stack_sprites,
+    "history_sync": setup_history_sync,
+}
+
+
+def calibrate(number=20_000):
+    """ns for one run of a fixed pure-Python loop; the unit for ``relative``."""
+    values = list(range(100))
+
+    def loop():
+        total = 0
+        for value in values:
+            total += value
+        return total
+
+    return time_op(loop, number, repeat=5)
+
+
+def time_op(op, number, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            op()
+        elapsed = (time.perf_counter_ns() - start) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure_allocations(op, number):
+    """Return (peak bytes allocated, bytes retained) per op, averaged."""
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        allocated = 0
+        for _ in range(number):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            op()
+            allocated += tracemalloc.get_traced_memory()[1] - before
+        retained = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    return allocated / number, retained / number
+
+
+def run_benchmark(setup, number, alloc_number, unit):
+    op, recorder = setup()
+    for _ in range(min(number, 200)):
+        op()
+    calls = None
+    if recorder is not None:
+        before = recorder.calls
+        for _ in range(number):
+            op()
+        calls = (recorder.calls - before) / number
+    ns_per_op = time_op(op, number)
+    allocated, retained = measure_allocations(op, alloc_number)
+    return {
+        "ns_per_op": round(ns_per_op, 1),
+        "relative": round(ns_per_op / unit, 4),
+        "alloc_bytes_per_op": round(allocated, 1),
+        "retained_bytes_per_op": round(retained, 1),
+        "tcl_calls_per_op": calls,
+    }
+
+
+def tk_root():
+    """Return a Tk root, starting Xvfb when there is no display; or None."""
+    import tkinter as tk
+
+    try:
+        return tk.Tk(), None
+    except tk.TclError:
+        pass
+    xvfb = shutil.which("Xvfb")
+    if xvfb is None:
+        return None, None
+    display = ":97"
+    server = subprocess.Popen([xvfb, display, "-nolisten", "tcp"], stderr=subprocess.DEVNULL)
+    os.environ["DISPLAY"] = display
+    for _ in range(50):
+        try:
+            return tk.Tk(), server
+        except tk.TclError:
+            time.sleep(0.1)
+    server.terminate()
+    return None, None
+
+
+def run_tk_benchmarks(number, alloc_number, unit):
+    import tkinter as tk
+
+    root, server = tk_root()
+    if root is None:
+        print("no display and no Xvfb; skipping real Tk runs", file=sys.stderr)
+        return {}
+    try:
+        canvas = tk.Canvas(root, width=600, height=400)
+        text = tk.Text(root)
+        setups = {
+            "draw_card_stack.tk": lambda: (setup_draw_card_stack(canvas)[0], None),
+            "history_sync.tk": lambda: (setup_history_sync(text)[0], None),
+        }
+        results = {}
+        for name, setup in setups.items():
+            results[name] = run_benchmark(setup, number, alloc_number, unit)
+            root.update()
+        return results
+    finally:
+        root.destroy()
+        if server is not None:
+            server.terminate()
+
+
+def compare(results, baseline, alloc_tolerance, time_tolerance=None):
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if time_tolerance is not None and result["relative"] > base["relative"] * (1 + time_tolerance):
+            regressions.append(f"{name}: {result['relative']:.3f} vs {base['relative']:.3f} time units")
+        if result["alloc_bytes_per_op"] > base["alloc_bytes_per_op"] * (1 + alloc_tolerance) + 64:
+            regressions.append(
+                f"{name}: {result['alloc_bytes_per_op']:.0f} vs {base['alloc_bytes_per_op']:.0f} bytes allocated/op"
+            )
+        calls = result["tcl_calls_per_op"]
+        if calls is not None and base["tcl_calls_per_op"] is not None and calls > base["tcl_calls_per_op"]:
+            regressions.append(f"{name}: {calls:.3f} vs {base['tcl_calls_per_op']:.3f} Tcl calls/op")
+    return regressions
+
+
+def format_results(results, unit):
+    lines = [f"time unit (calibration loop): {unit:.0f} ns"]
+    for name, result in results.items():
+        calls = result["tcl_calls_per_op"]
+        lines.append(
+            f"{name:>24}: {result['ns_per_op']:>10.0f} ns/op  {result['relative']:>8.3f} units"
+            f"  {result['alloc_bytes_per_op']:>8.0f} B alloc  {result['retained_bytes_per_op']:>8.0f} B kept"
+            + (f"  {calls:.2f} Tcl calls" if calls is not None else "")
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the regression benchmarks.")
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default: all)")
+    parser.add_argument("--number", type=int, default=2000, help="ops per timing run")
+    parser.add_argument("--alloc-number", type=int, default=500, help="ops traced by tracemalloc")
+    parser.add_argument("--tk", action="store_true", help="also run against real Tk widgets")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save", metavar="FILE", help="write the results as a new baseline")
+    parser.add_argument(
+        "--time-tolerance",
+        type=float,
+        help="also fail when relative time grows by more than this fraction (off by default)",
+    )
+    parser.add_argument("--alloc-tolerance", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+    unit = calibrate()
+    results = {}
+    for name in args.names or BENCHMARKS:
+        results[name] = run_benchmark(BENCHMARKS[name], args.number, args.alloc_number, unit)
+    if args.tk:
+        results.update(run_tk_benchmarks(args.number, args.alloc_number, unit))
+    print(format_results(results, unit))
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2, sort_keys=True)
+            handle.write("\n")
+        return 0
+    if not os.path.exists(args.baseline):
+        return 0
+    with open(args.baseline, encoding="utf-8") as handle:
+        baseline = json.load(handle)
+    regressions = compare(results, baseline, args.alloc_tolerance, args.time_tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
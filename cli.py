@@ -0,0 +1,143 @@
+"""Headless batch presses, streamed as JSON Lines or CSV.
+
+    python3 cli.py 1000 --seed 7 --decks 2 --format csv > presses.csv
+
+Each press is resolved with the engine and written as soon as it is
+drawn, so memory stays flat however many presses are asked for. Nothing
+here imports tkinter.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+
+from engine import (
+    ASPECTS,
+    CARD_LABELS,
+    Session,
+    format_card_short,
+    outcome_lines,
+    resolve_press,
+    xp_totals,
+)
+from rngs import BACKENDS, SEEDABLE, make_rng
+
+CSV_FIELDS = (
+    "press",
+    "cards",
+    "pip",
+    "pip_suit",
+    "press_length",
+    "face_count",
+    "face_matches",
+    "face_mismatches",
+    "joker_count",
+    "advantage",
+) + tuple(f"xp_{aspect}" for aspect in ASPECTS) + ("joker_xp", "outcome")
+
+
+def iter_presses(presses, seed=None, decks=1, penetration=None, rng=None):
+    """Yield (cards, outcome) for ``presses`` presses of a fresh session."""
+    if rng is None:
+        rng = random.Random(seed)
+    session = Session(rng, decks, penetration)
+    draw_press = session.draw_press
+    for _ in range(presses):
+        # Presses are never undone here, so skip Session.batches.
+        cards = draw_press()
+        yield cards, resolve_press(cards)
+
+
+def press_record(index, cards, outcome):
+    return {
+        "press": index,
+        "cards": [CARD_LABELS[card] for card in cards],
+        "card_ids": list(cards),
+        "pip": format_card_short(outcome.rank, outcome.suit),
+        "pip_rank": outcome.rank,
+        "pip_suit": outcome.suit,
+        "press_length": outcome.press_length,
+        "face_count": outcome.face_count,
+        "face_matches": outcome.face_matches,
+        "face_mismatches": outcome.face_mismatches,
+        "joker_count": outcome.joker_count,
+        "advantage": outcome.net_advantage,
+        "outcome": outcome_lines(outcome)[2],
+        "xp": [
+            {"aspect": aspect, "amount": amount, "joker": from_joker}
+            for aspect, amount, from_joker in outcome.xp
+        ],
+    }
+
+
+def json_lines(presses):
+    for index, (cards, outcome) in enumerate(presses, 1):
+        yield json.dumps(press_record(index, cards, outcome), ensure_ascii=False) + "\n"
+
+
+def csv_rows(presses):
+    yield CSV_FIELDS
+    for index, (cards, outcome) in enumerate(presses, 1):
+        xp, joker_xp = xp_totals(outcome.xp)
+        yield (
+            index,
+            " ".join(CARD_LABELS[card] for card in cards),
+            format_card_short(outcome.rank, outcome.suit),
+            outcome.suit,
+            outcome.press_length,
+            outcome.face_count,
+            outcome.face_matches,
+            outcome.face_mismatches,
+            outcome.joker_count,
+            outcome.net_advantage,
+            *xp,
+            joker_xp,
+            outcome_lines(outcome)[2],
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Draw presses without the GUI.")
+    parser.add_argument("presses", type=int, nargs="?", default=1)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--decks", type=int, default=1, help="decks shuffled together")
+    parser.add_argument(
+        "--penetration",
+        type=float,
+        default=None,
+        help="reshuffle once this fraction of the shoe is dealt (e.g. 0.75)",
+    )
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+    parser.add_argument("--rng", choices=BACKENDS, default="random", help="shuffle generator")
+    args = parser.parse_args(argv)
+    if not 1 <= args.decks <= 64:
+        parser.error("--decks must be between 1 and 64")
+    if args.penetration is not None and not 0 < args.penetration <= 1:
+        parser.error("--penetration must be in (0, 1]")
+    if args.seed is not None and args.rng not in SEEDABLE:
+        parser.error(f"--rng {args.rng} cannot be seeded")
+
+    presses = iter_presses(
+        args.presses,
+        decks=args.decks,
+        penetration=args.penetration,
+        rng=make_rng(args.rng, args.seed),
+    )
+    try:
+        if args.format == "csv":
+            csv.writer(sys.stdout, lineterminator="\n").writerows(csv_rows(presses))
+        else:
+            sys.stdout.writelines(json_lines(presses))
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader went away (e.g. `| head`); stop quietly instead of
+        # failing again when the interpreter flushes stdout on exit.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
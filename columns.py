@@ -0,0 +1,433 @@
+"""Columnar session export and a NumPy reader for analysis.
+
+    python3 columns.py export ~/goe-session.goej sessions.goec
+    python3 columns.py draw 10000000 sessions.goec --seed 7 --decks 6
+    python3 columns.py summary sessions.goec
+
+An export file holds one typed column per field, written in chunks of
+up to CHUNK_PRESSES presses with every column of a chunk compressed
+with zlib on its own:
+
+    cards            uint8   card ids of all presses end to end
+    press_length     uint16  cards per press, so the press boundaries
+                             are the running sum
+    flags            uint8   FLAG_SESSION on the first press of each
+                             exported session, FLAG_RESHUFFLE on every
+                             press that starts a fresh deck or runs into one
+    advantage        int16   net advantage
+    face_matches,
+    face_mismatches,
+    jokers           uint16
+    xp_<aspect>      uint16  PoV XP per skill aspect (xp_focus, ...)
+    joker_xp         uint16  the part of that XP that came from Jokers
+
+The header names every column with its dtype and carries a fingerprint
+of the rules, as the journal's does: XP columns follow the rules' skill
+aspects, so an export written under one GOE_RULES variant refuses to
+open under another.
+
+ColumnWriter streams presses in and needs only the standard library, so
+exports can be appended to from the GUI's journal or from a headless
+run. ColumnReader needs NumPy: the first time a column is asked for it
+is inflated chunk by chunk into a raw file next to the export (about 22
+bytes per press over all columns), and from then on it is memory-mapped
+as a NumPy array, so aggregates are numpy reductions over the page cache
+with no copy and no parsing. ``ColumnReader(path, cache=False)`` (or
+``summary --no-cache``) inflates into memory instead, and ``clean``
+removes the cache.
+"""
+import argparse
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import zlib
+from array import array
+
+from engine import ASPECTS, DECK_SIZE, PIP_TABLE, RULES, Session, resolve_press, xp_totals
+from journal import load
+from rngs import BACKENDS, SEEDABLE, make_rng
+from rules import fingerprint
+
+# NumPy, imported by the first ColumnReader so writers never load it.
+np = None
+
+MAGIC = b"GOEC"
+# Version 1 headers had no rules fingerprint and cut names at 16 bytes.
+VERSION = 2
+HEADER = struct.Struct("<4sHH16s")
+# Name length and dtype; the UTF-8 name follows.
+COLUMN = struct.Struct("<H4s")
+RULES_FINGERPRINT = fingerprint(RULES)
+CHUNK = struct.Struct("<4sII")
+CHUNK_MAGIC = b"CHNK"
+CHUNK_COLUMN = struct.Struct("<I")
+CHUNK_PRESSES = 1 << 20
+
+FLAG_SESSION = 1
+FLAG_RESHUFFLE = 2
+
+XP_COLUMNS = tuple(f"xp_{aspect.lower()}" for aspect in ASPECTS)
+# (name, array typecode, NumPy dtype), in file order.
+COLUMNS = (
+    ("cards", "B", "<u1"),
+    ("press_length", "H", "<u2"),
+    ("flags", "B", "<u1"),
+    ("advantage", "h", "<i2"),
+    ("face_matches", "H", "<u2"),
+    ("face_mismatches", "H", "<u2"),
+    ("jokers", "H", "<u2"),
+) + tuple((name, "H", "<u2") for name in XP_COLUMNS) + (("joker_xp", "H", "<u2"),)
+COLUMN_NAMES = tuple(name for name, _, _ in COLUMNS)
+# Columns with one value per press, everything but ``cards``.
+PRESS_COLUMNS = COLUMN_NAMES[1:]
+
+
+def _header():
+    parts = [HEADER.pack(MAGIC, VERSION, len(COLUMNS), RULES_FINGERPRINT)]
+    for name, _, dtype in COLUMNS:
+        encoded = name.encode()
+        parts.append(COLUMN.pack(len(encoded), dtype.encode()))
+        parts.append(encoded)
+    return b"".join(parts)
+
+
+def check_header(data, path):
+    """Raise ValueError unless ``data`` is the header these rules write."""
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} is not a version {VERSION} session export")
+    magic, version, _, written = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} session export")
+    if written != RULES_FINGERPRINT:
+        raise ValueError(f"{path} was written under different rules than {RULES.source}")
+    if data != _header():
+        raise ValueError(f"{path} has different columns than this version writes")
+
+
+class ColumnWriter:
+    """Append presses to the export at ``path``, a chunk at a time."""
+
+    def __init__(self, path, chunk_presses=CHUNK_PRESSES, level=6):
+        self.path = path
+        self.chunk_presses = chunk_presses
+        self.level = level
+        self.presses = 0
+        header = _header()
+        self.handle = open(path, "ab")
+        if self.handle.tell() == 0:
+            self.handle.write(header)
+        else:
+            with open(path, "rb") as existing:
+                try:
+                    check_header(existing.read(len(header)), path)
+                except ValueError:
+                    self.handle.close()
+                    raise
+        self._reset()
+
+    def _reset(self):
+        self.columns = [array(typecode) for _, typecode, _ in COLUMNS]
+        self.pending = 0
+
+    def add(self, cards, flags=0, outcome=None):
+        """Add one press given its card ids; ``outcome`` if already resolved."""
+        if outcome is None:
+            outcome = resolve_press(cards)
+        columns = self.columns
+        columns[0].extend(cards)
+        columns[1].append(outcome.press_length)
+        columns[2].append(flags)
+        columns[3].append(outcome.net_advantage)
+        columns[4].append(outcome.face_matches)
+        columns[5].append(outcome.face_mismatches)
+        columns[6].append(outcome.joker_count)
+        # XP per aspect, then the Joker share.
+        xp, joker_xp = xp_totals(outcome.xp)
+        for column, amount in zip(columns[7:], xp):
+            column.append(amount)
+        columns[-1].append(joker_xp)
+        self.presses += 1
+        self.pending += 1
+        if self.pending == self.chunk_presses:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        parts = [CHUNK.pack(CHUNK_MAGIC, self.pending, len(self.columns[0]))]
+        for column in self.columns:
+            if sys.byteorder == "big":
+                column.byteswap()
+            data = zlib.compress(column, self.level)
+            parts.append(CHUNK_COLUMN.pack(len(data)))
+            parts.append(data)
+        self.handle.write(b"".join(parts))
+        self.handle.flush()
+        self._reset()
+
+    def close(self):
+        if self.handle.closed:
+            return
+        self.flush()
+        self.handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def export_timeline(timeline, writer):
+    """Write the presses from the root to ``timeline.current``."""
+    segments, back = timeline.line()
+    # The line runs on to the end of the redo chain; the undo steps past
+    # the current node (presses, and reshuffles between segments) are cut.
+    steps = sum(presses for _, _, _, presses in segments) + len(segments) - 1 - back
+    flags = FLAG_SESSION | FLAG_RESHUFFLE
+    for number, (_, stream, drawn, presses) in enumerate(segments):
+        if number:
+            if not steps:
+                break
+            steps -= 1
+            flags |= FLAG_RESHUFFLE
+        cards = bytes(stream[:drawn])
+        pips = cards.translate(PIP_TABLE)
+        start = 0
+        for _ in range(min(presses, steps)):
+            end = pips.index(1, start) + 1
+            # Segments run on into fresh decks when one is used up.
+            if start % DECK_SIZE == 0 or start // DECK_SIZE != (end - 1) // DECK_SIZE:
+                flags |= FLAG_RESHUFFLE
+            writer.add(cards[start:end], flags)
+            flags = 0
+            start = end
+        steps -= min(presses, steps)
+    return writer.presses
+
+
+def export_journal(path, writer):
+    """Write the current line of the session journal at ``path``."""
+    return export_timeline(load(path), writer)
+
+
+def export_draws(writer, presses, seed=None, decks=1, penetration=None, backend="random"):
+    """Draw ``presses`` presses from a fresh shoe, as cli.py does, and write them."""
+    session = Session(make_rng(backend, seed), decks, penetration)
+    deck = session.deck
+    draw_press = session.draw_press
+    add = writer.add
+    flags = FLAG_SESSION | FLAG_RESHUFFLE
+    cycle = deck.cycle
+    for _ in range(presses):
+        cards = draw_press()
+        if deck.cycle != cycle:
+            flags |= FLAG_RESHUFFLE
+            cycle = deck.cycle
+        add(cards, flags)
+        flags = 0
+    return writer.presses
+
+
+class ColumnReader:
+    """Memory-maps the columns of an export as NumPy arrays.
+
+    ``cache`` is the directory the inflated columns are kept in,
+    ``<path>.cols`` by default; it is rebuilt whenever the export has
+    changed since. With ``cache=False`` each column is inflated into
+    memory instead and nothing is written.
+    """
+
+    def __init__(self, path, cache=None):
+        global np
+        if np is None:
+            try:
+                import numpy as np
+            except ImportError:
+                raise RuntimeError("reading an export needs NumPy") from None
+        self.path = path
+        self.cache = f"{path}.cols" if cache is None else cache
+        self.arrays = {}
+        # (presses, cards, [(offset, length) per column]) per chunk.
+        self.chunks = []
+        with open(path, "rb") as handle:
+            header = _header()
+            check_header(handle.read(len(header)), path)
+            offset = len(header)
+            size = os.fstat(handle.fileno()).st_size
+            while offset < size:
+                handle.seek(offset)
+                magic, presses, cards = CHUNK.unpack(handle.read(CHUNK.size))
+                if magic != CHUNK_MAGIC:
+                    raise ValueError(f"{path}: bad chunk at byte {offset}")
+                offset += CHUNK.size
+                spans = []
+                for _ in COLUMNS:
+                    handle.seek(offset)
+                    (length,) = CHUNK_COLUMN.unpack(handle.read(CHUNK_COLUMN.size))
+                    offset += CHUNK_COLUMN.size
+                    spans.append((offset, length))
+                    offset += length
+                self.chunks.append((presses, cards, spans))
+            stat = os.fstat(handle.fileno())
+        self.stamp = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        self.presses = sum(presses for presses, _, _ in self.chunks)
+        self.card_count = sum(cards for _, cards, _ in self.chunks)
+
+    def __len__(self):
+        return self.presses
+
+    def iter_chunks(self, name):
+        """Each chunk of column ``name``, inflated, without the cache."""
+        slot = COLUMN_NAMES.index(name)
+        dtype = COLUMNS[slot][2]
+        with open(self.path, "rb") as handle:
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for _, _, spans in self.chunks:
+                        offset, length = spans[slot]
+                        yield np.frombuffer(zlib.decompress(view[offset : offset + length]), dtype=dtype)
+                finally:
+                    view.release()
+
+    def column(self, name):
+        """Column ``name`` as a read-only memory-mapped array."""
+        mapped = self.arrays.get(name)
+        if mapped is not None:
+            return mapped
+        dtype = np.dtype(COLUMNS[COLUMN_NAMES.index(name)][2])
+        length = self.card_count if name == "cards" else self.presses
+        if self.cache is False:
+            mapped = np.concatenate([np.zeros(0, dtype=dtype), *self.iter_chunks(name)])
+            mapped.flags.writeable = False
+            self.arrays[name] = mapped
+            return mapped
+        target = os.path.join(self.cache, f"{name}.raw")
+        stamp_path = os.path.join(self.cache, "stamp.json")
+        stamp = None
+        try:
+            with open(stamp_path, encoding="utf-8") as handle:
+                stamp = json.load(handle)
+        except (OSError, ValueError):
+            pass
+        if stamp != self.stamp:
+            os.makedirs(self.cache, exist_ok=True)
+            for stale in COLUMN_NAMES:
+                try:
+                    os.remove(os.path.join(self.cache, f"{stale}.raw"))
+                except FileNotFoundError:
+                    pass
+            with open(stamp_path, "w", encoding="utf-8") as handle:
+                json.dump(self.stamp, handle)
+        if not os.path.exists(target):
+            partial = f"{target}.tmp"
+            with open(partial, "wb") as handle:
+                for chunk in self.iter_chunks(name):
+                    handle.write(chunk)
+            os.replace(partial, target)
+        if not length:
+            mapped = np.zeros(0, dtype=dtype)
+        else:
+            mapped = np.memmap(target, dtype=dtype, mode="r", shape=(length,))
+        self.arrays[name] = mapped
+        return mapped
+
+    def remove_cache(self):
+        """Delete the inflated columns; they are rebuilt on next use."""
+        self.arrays.clear()
+        if self.cache is not False:
+            shutil.rmtree(self.cache, ignore_errors=True)
+
+    def offsets(self):
+        """Start of every press in ``cards``, plus the end of the last."""
+        offsets = np.zeros(self.presses + 1, dtype=np.int64)
+        np.cumsum(self.column("press_length"), out=offsets[1:])
+        return offsets
+
+    def summary(self):
+        """Totals and means over every press, as plain Python numbers."""
+        presses = self.presses
+        flags = self.column("flags")
+        lengths = self.column("press_length")
+        totals = {
+            "presses": presses,
+            "cards": self.card_count,
+            "sessions": int(np.count_nonzero(flags & FLAG_SESSION)),
+            "reshuffles": int(np.count_nonzero(flags & FLAG_RESHUFFLE)),
+        }
+        for name in PRESS_COLUMNS[2:]:
+            totals[name] = int(self.column(name).sum(dtype=np.int64))
+        if presses:
+            totals["mean_advantage"] = totals["advantage"] / presses
+            totals["mean_press_length"] = self.card_count / presses
+            totals["press_lengths"] = {
+                int(length): int(count) for length, count in enumerate(np.bincount(lengths)) if count
+            }
+        return totals
+
+
+def format_summary(totals):
+    lines = [f"{key}: {value}" for key, value in totals.items() if key != "press_lengths"]
+    if "press_lengths" in totals:
+        presses = totals["presses"]
+        lines.append(
+            "press_lengths: "
+            + "  ".join(f"{length}: {count / presses:.2%}" for length, count in totals["press_lengths"].items())
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export sessions to columns and summarize them.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="append a session journal's current line")
+    export.add_argument("journal")
+    export.add_argument("out")
+    draw = commands.add_parser("draw", help="append freshly drawn presses, as cli.py draws them")
+    draw.add_argument("presses", type=int)
+    draw.add_argument("out")
+    draw.add_argument("--seed", type=int, default=None)
+    draw.add_argument("--decks", type=int, default=1)
+    draw.add_argument("--penetration", type=float, default=None)
+    draw.add_argument("--rng", choices=BACKENDS, default="random")
+    for command in (export, draw):
+        command.add_argument("--chunk-presses", type=int, default=CHUNK_PRESSES)
+        command.add_argument("--level", type=int, default=6, help="zlib level")
+    summary = commands.add_parser("summary", help="aggregate every press (needs NumPy)")
+    summary.add_argument("path")
+    summary.add_argument("--json", action="store_true")
+    summary.add_argument("--no-cache", action="store_true", help="inflate into memory, not next to the export")
+    clean = commands.add_parser("clean", help="remove the inflated column cache of an export")
+    clean.add_argument("path")
+    args = parser.parse_args(argv)
+    if args.command == "draw" and args.seed is not None and args.rng not in SEEDABLE:
+        draw.error(f"--rng {args.rng} cannot be seeded")
+
+    if args.command == "clean":
+        shutil.rmtree(f"{args.path}.cols", ignore_errors=True)
+        return 0
+    if args.command == "summary":
+        totals = ColumnReader(args.path, cache=False if args.no_cache else None).summary()
+        try:
+            print(json.dumps(totals, indent=2) if args.json else format_summary(totals))
+            sys.stdout.flush()
+        except BrokenPipeError:
+            # As in cli.py: the reader went away (e.g. `| head`).
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return 1
+        return 0
+    with ColumnWriter(args.out, args.chunk_presses, args.level) as writer:
+        if args.command == "export":
+            export_journal(args.journal, writer)
+        else:
+            export_draws(writer, args.presses, args.seed, args.decks, args.penetration, args.rng)
+    print(f"{writer.presses} presses written to {args.out}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
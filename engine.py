@@ -0,0 +1,575 @@
+"""Draw-resolution engine shared by the GUIs and headless tools.
+
+Nothing in here imports tkinter, so it is safe to use from servers,
+simulations and scripts.
+
+Cards are integer ids 0-53 on the hot paths (see CARDS) and the lookup
+tables below answer class, suit and color questions by indexing; the
+``(rank, suit)`` tuples are only for display. A set of cards, such as
+the rest of a deck, is a mask with a bit per card id (54 bits).
+
+The deck and the suit meanings come from rules.load_rules() (built in,
+or a variant file named by GOE_RULES) and are compiled into these tables
+once, at import.
+"""
+import random
+import sys
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+
+from rngs import SEEDABLE, make_rng
+from rules import load_rules
+
+RULES = load_rules()
+SUITS = tuple(suit.name for suit in RULES.suits)
+RANKS = RULES.ranks
+PIP_RANKS = frozenset(RANKS) - RULES.faces
+FACE_RANKS = RULES.faces
+# Joker names, which are their "suit" in (rank, suit) tuples.
+JOKERS = tuple(joker.name for joker in RULES.jokers)
+
+_SUIT_SYMBOLS = {suit.name: suit.symbol for suit in RULES.suits}
+_SUIT_INTERPRETATIONS = {suit.name: suit.meaning for suit in RULES.suits}
+_SKILL_ASPECTS = {suit.name: suit.aspect for suit in RULES.suits}
+_SUIT_RED = {suit.name: suit.color == "red" for suit in RULES.suits}
+_JOKER_RED = {joker.name: joker.color == "red" for joker in RULES.jokers}
+_JOKER_SYMBOLS = {joker.name: joker.symbol for joker in RULES.jokers}
+_RED_TEXT = "#b00020"
+_BLACK_TEXT = "#1a1a1a"
+
+
+_JOKER_CARDS = tuple(("Joker", name) for name in JOKERS)
+
+
+def build_deck():
+    deck = [(rank, suit) for suit in SUITS for rank in RANKS]
+    deck.extend(_JOKER_CARDS)
+    return deck
+
+
+# Card ids are positions in build_deck(): by suit then rank, then the
+# Jokers; with the built-in rules 0-51, Red Joker 52 and Black Joker 53.
+CARDS = tuple(build_deck())
+CARD_IDS = {card: idx for idx, card in enumerate(CARDS)}
+CARD_COUNT = len(CARDS)
+# Every deck the shoe or timeline shuffles is one full set of card ids.
+DECK_SIZE = CARD_COUNT
+
+PIP = 0
+FACE = 1
+JOKER = 2
+# Suit index into SUITS; Jokers have no suit and use NO_SUIT.
+NO_SUIT = len(SUITS)
+
+
+def _card_class(rank):
+    if rank in PIP_RANKS:
+        return PIP
+    if rank in FACE_RANKS:
+        return FACE
+    return JOKER
+
+
+CARD_CLASS = bytes(_card_class(rank) for rank, _ in CARDS)
+CARD_SUIT = bytes(SUITS.index(suit) if rank != "Joker" else NO_SUIT for rank, suit in CARDS)
+CARD_RED = bytes(_JOKER_RED[suit] if rank == "Joker" else _SUIT_RED[suit] for rank, suit in CARDS)
+# Per suit index: 1 for red suits. A face matches a pip of its color.
+SUIT_RED = bytes(_SUIT_RED[suit] for suit in SUITS)
+# bytes.translate() table mapping a card id stream to 1 for pips, 0 else.
+PIP_TABLE = bytes(kind == PIP for kind in CARD_CLASS) + bytes(256 - CARD_COUNT)
+# One press ends at each pip, so a deck deals this many presses.
+PIPS_PER_DECK = CARD_CLASS.count(PIP)
+# Suits may share an aspect; each is listed once.
+ASPECTS = tuple(dict.fromkeys(_SKILL_ASPECTS[suit] for suit in SUITS))
+
+FULL_MASK = (1 << CARD_COUNT) - 1
+
+
+def mask_of(card_ids):
+    mask = 0
+    for card_id in card_ids:
+        mask |= 1 << card_id
+    return mask
+
+
+def mask_cards(mask):
+    """Yield the card ids in ``mask`` in ascending order."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+PIP_MASK = mask_of(idx for idx, kind in enumerate(CARD_CLASS) if kind == PIP)
+FACE_MASK = mask_of(idx for idx, kind in enumerate(CARD_CLASS) if kind == FACE)
+JOKER_MASK = mask_of(idx for idx, kind in enumerate(CARD_CLASS) if kind == JOKER)
+RED_MASK = mask_of(idx for idx, red in enumerate(CARD_RED) if red)
+SUIT_MASKS = tuple(
+    mask_of(idx for idx, suit in enumerate(CARD_SUIT) if suit == suit_index)
+    for suit_index in range(len(SUITS))
+)
+
+
+def card_suit_symbol(suit):
+    return _SUIT_SYMBOLS[suit]
+
+
+def card_suit_color(suit):
+    return _RED_TEXT if _SUIT_RED[suit] else _BLACK_TEXT
+
+
+def suit_interpretation(suit):
+    return _SUIT_INTERPRETATIONS[suit]
+
+
+def skill_aspect_for_suit(suit):
+    return _SKILL_ASPECTS[suit]
+
+
+def card_text_color(rank, suit):
+    if rank == "Joker":
+        return _RED_TEXT if _JOKER_RED[suit] else _BLACK_TEXT
+    return card_suit_color(suit)
+
+
+def suit_color_name(rank, suit):
+    red = _JOKER_RED[suit] if rank == "Joker" else _SUIT_RED[suit]
+    return "Red" if red else "Black"
+
+
+def joker_symbol(suit):
+    return _JOKER_SYMBOLS[suit]
+
+
+def format_card_short(rank, suit):
+    if rank == "Joker":
+        return joker_symbol(suit)
+    return f"{card_suit_symbol(suit)}{rank}"
+
+
+# Display strings per card id, for the history pane and other views.
+CARD_LABELS = tuple(format_card_short(rank, suit) for rank, suit in CARDS)
+CARD_TEXT_COLORS = tuple(card_text_color(rank, suit) for rank, suit in CARDS)
+
+
+# One press: the final (pip) card, the face/joker tallies and the PoV XP
+# awarded. ``face_suits`` holds face counts in SUITS order; ``xp`` is a
+# tuple of (aspect, amount, from_joker) entries and is empty without a Joker.
+Outcome = namedtuple(
+    "Outcome",
+    [
+        "rank",
+        "suit",
+        "press_length",
+        "face_count",
+        "face_matches",
+        "face_mismatches",
+        "joker_count",
+        "net_advantage",
+        "face_suits",
+        "xp",
+    ],
+)
+
+
+# Everything about an outcome except the pip's rank and the press length
+# follows from its signature: pip suit, faces per suit and Jokers.
+Evaluation = namedtuple(
+    "Evaluation",
+    [
+        "face_matches",
+        "face_mismatches",
+        "net_advantage",
+        "xp",
+        "outcome_text",
+        "adv_text",
+        "xp_text",
+    ],
+)
+
+_SUIT_INDEX = {suit: idx for idx, suit in enumerate(SUITS)}
+_PIP_LINES = {
+    (rank, suit): (
+        sys.intern(f"{rank} of {suit}"),
+        sys.intern(f"Suit Meaning: {suit_interpretation(suit)}"),
+    )
+    for rank, suit in CARDS
+    if rank in PIP_RANKS
+}
+_JOKER_LINES = {
+    suit: (f"Joker ({suit})", "Suit Meaning: Joker", "Outcome: ", "", "")
+    for suit in JOKERS
+}
+_EVALUATIONS = {}
+_XP_TOTALS = {}
+_NO_FACES = (0,) * len(SUITS)
+
+
+def evaluate(pip_suit, face_suits, joker_count):
+    """Return the shared Evaluation for a signature, building it once.
+
+    ``pip_suit`` is an index into SUITS and ``face_suits`` the faces drawn
+    per suit in SUITS order.
+    """
+    key = (pip_suit, face_suits, joker_count)
+    evaluation = _EVALUATIONS.get(key)
+    if evaluation is None:
+        evaluation = _EVALUATIONS[key] = _build_evaluation(pip_suit, face_suits, joker_count)
+    return evaluation
+
+
+def xp_totals(xp):
+    """(XP per aspect in ASPECTS order, the Joker's share) for Outcome.xp."""
+    totals = _XP_TOTALS.get(xp)
+    if totals is None:
+        amounts = dict.fromkeys(ASPECTS, 0)
+        joker_xp = 0
+        for aspect, amount, from_joker in xp:
+            amounts[aspect] += amount
+            if from_joker:
+                joker_xp += amount
+        totals = _XP_TOTALS[xp] = (tuple(amounts.values()), joker_xp)
+    return totals
+
+
+def _build_evaluation(pip_suit, face_suits, joker_count):
+    pip_red = SUIT_RED[pip_suit]
+    face_matches = sum(count for suit, count in enumerate(face_suits) if SUIT_RED[suit] == pip_red)
+    face_mismatches = sum(face_suits) - face_matches
+    net_advantage = face_matches - face_mismatches
+    xp = ()
+    if joker_count > 0:
+        xp = tuple(
+            (_SKILL_ASPECTS[suit], count, False)
+            for suit, count in zip(SUITS, face_suits)
+            if count > 0
+        ) + ((_SKILL_ASPECTS[SUITS[pip_suit]], joker_count, True),)
+
+    outcome_parts = []
+    adv_text = ""
+    xp_text = ""
+    if face_matches + face_mismatches > 0:
+        if net_advantage > 0:
+            adv_text = f"Advantage: +{net_advantage}"
+            outcome_parts.append(f"Advantage +{net_advantage}")
+        elif net_advantage < 0:
+            adv_text = f"Disadvantage: {net_advantage}"
+            outcome_parts.append(f"Disadvantage {net_advantage}")
+        else:
+            adv_text = "Adv/Dis: Neutral (0)"
+            outcome_parts.append("Neutral (0)")
+    xp_parts = [
+        f"+{amount} {aspect} (Joker)" if from_joker else f"+{amount} {aspect}"
+        for aspect, amount, from_joker in xp
+    ]
+    if xp_parts:
+        xp_text = "PoV XP: " + ", ".join(xp_parts)
+        outcome_parts.append("PoV XP " + ", ".join(xp_parts))
+    if not outcome_parts:
+        outcome_parts.append("Neutral (0)")
+    return Evaluation(
+        face_matches,
+        face_mismatches,
+        net_advantage,
+        xp,
+        sys.intern("Outcome: " + " | ".join(outcome_parts)),
+        sys.intern(adv_text),
+        sys.intern(xp_text),
+    )
+
+
+def resolve_press(cards):
+    """Resolve one press given its card ids, ending with the pip drawn."""
+    last = cards[-1]
+    last_rank, last_suit = CARDS[last]
+    if CARD_CLASS[last] == JOKER:
+        return Outcome(last_rank, last_suit, len(cards), 0, 0, 0, 0, 0, _NO_FACES, ())
+    card_class = CARD_CLASS
+    card_suit = CARD_SUIT
+    face_suits = [0] * NO_SUIT
+    joker_count = 0
+    for card in cards:
+        kind = card_class[card]
+        if kind == FACE:
+            face_suits[card_suit[card]] += 1
+        elif kind == JOKER:
+            joker_count += 1
+    face_suits = tuple(face_suits)
+    evaluation = evaluate(card_suit[last], face_suits, joker_count)
+    return Outcome(
+        last_rank,
+        last_suit,
+        len(cards),
+        evaluation.face_matches + evaluation.face_mismatches,
+        evaluation.face_matches,
+        evaluation.face_mismatches,
+        joker_count,
+        evaluation.net_advantage,
+        face_suits,
+        evaluation.xp,
+    )
+
+
+def outcome_lines(outcome):
+    """Return the (card, meaning, outcome, advantage, xp) display strings."""
+    if outcome.rank == "Joker":
+        return _JOKER_LINES[outcome.suit]
+    card_text, meaning_text = _PIP_LINES[outcome.rank, outcome.suit]
+    evaluation = evaluate(_SUIT_INDEX[outcome.suit], outcome.face_suits, outcome.joker_count)
+    return (card_text, meaning_text, evaluation.outcome_text, evaluation.adv_text, evaluation.xp_text)
+
+
+class Shoe:
+    """``decks`` shuffled decks dealt with an incremental Fisher-Yates.
+
+    Nothing is shuffled up front: ``cards[:remaining]`` is the unordered
+    pool and each draw swaps a random pick to the end of it, so draws and
+    reshuffles are O(1). Drawn cards collect above ``remaining`` with the
+    latest lowest, which lets restore() put a press back by moving the
+    boundary; the restored cards are then drawn again in the same order,
+    as if laid back on top of the deck.
+
+    With ``penetration`` (a fraction of the shoe) set, ``cut_reached`` is
+    true once that much of the shoe has been dealt. ``mask`` has a bit set
+    for every card id still in the pool.
+
+    Every shuffle starts a new cycle, numbered in ``cycle``. With ``seed``
+    set, each cycle deals from its own ``backend`` generator keyed by the
+    seed and the cycle number, starting from a sorted pool, so the cards a
+    cycle deals depend on nothing else and cycle_cards() can deal them
+    again on their own. Only the rngs.SEEDABLE backends can be seeded.
+    """
+
+    __slots__ = (
+        "rng",
+        "decks",
+        "penetration",
+        "seed",
+        "backend",
+        "cycle",
+        "cards",
+        "remaining",
+        "replay",
+        "copies",
+        "mask",
+    )
+
+    def __init__(self, rng=random, decks=1, penetration=None, seed=None, backend="random", cycle=0):
+        if seed is not None and backend not in SEEDABLE:
+            raise ValueError(f"the {backend} backend cannot be seeded, so its deals cannot be replayed")
+        self.rng = rng
+        self.decks = decks
+        self.penetration = penetration
+        self.seed = seed
+        self.backend = backend
+        self.cycle = cycle - 1
+        self.cards = bytearray(range(CARD_COUNT)) * decks
+        self.shuffle()
+
+    def __len__(self):
+        return self.remaining
+
+    @property
+    def dealt(self):
+        """Cards dealt so far in this cycle."""
+        return len(self.cards) - self.remaining
+
+    @property
+    def cut_reached(self):
+        if self.penetration is None:
+            return False
+        return len(self.cards) - self.remaining >= self.penetration * len(self.cards)
+
+    def shuffle(self):
+        self.cycle += 1
+        if self.seed is not None:
+            self.rng = make_rng(self.backend, f"{self.seed}:{self.cycle}")
+            self.cards[:] = bytes(range(CARD_COUNT)) * self.decks
+        self.remaining = len(self.cards)
+        # Restored cards left to deal back before picking at random again.
+        self.replay = 0
+        self.copies = bytearray([self.decks] * CARD_COUNT)
+        self.mask = FULL_MASK
+
+    def draw(self):
+        remaining = self.remaining
+        if not remaining:
+            self.shuffle()
+            remaining = self.remaining
+        remaining -= 1
+        self.remaining = remaining
+        cards = self.cards
+        if self.replay:
+            self.replay -= 1
+        else:
+            pick = self.rng.randrange(remaining + 1)
+            cards[pick], cards[remaining] = cards[remaining], cards[pick]
+        card = cards[remaining]
+        self.copies[card] -= 1
+        if not self.copies[card]:
+            self.mask &= ~(1 << card)
+        return card
+
+    def restore(self, cards):
+        """Put the last press drawn back, to be dealt again first.
+
+        Cards dealt before a reshuffle that happened mid-press are already
+        back in the pool, so only the ones drawn since then are restored.
+        """
+        count = min(len(cards), len(self.cards) - self.remaining)
+        for card in cards[len(cards) - count:]:
+            self.copies[card] += 1
+            self.mask |= 1 << card
+        self.remaining += count
+        self.replay += count
+
+
+def cycle_cards(seed, cycle, decks=1, backend="random"):
+    """Every card a seeded Shoe deals in cycle ``cycle``, in dealing order."""
+    shoe = Shoe(decks=decks, seed=seed, backend=backend, cycle=cycle)
+    draw = shoe.draw
+    return bytes(draw() for _ in range(len(shoe.cards)))
+
+
+# Press ``press`` rebuilt by seek(): its card ids and outcome, the shoe
+# cycle it ended in, how many cards of that cycle were dealt by then and
+# the rest of the cycle (card ids in dealing order).
+Seek = namedtuple("Seek", ["press", "cards", "outcome", "cycle", "position", "deck"])
+
+
+class Session:
+    """Shoe plus the batches of card ids drawn by each press.
+
+    A press starts with a fresh shoe once the cut card has been reached;
+    undoing presses from before that reshuffle gives their cards back to
+    the history only, as the shoe already holds them again.
+
+    A seeded session also keeps sparse checkpoints for seek(): the press
+    number, shoe cycle and position of every press that starts in a new
+    cycle or anywhere but where the press before it ended (after an undo
+    across a reshuffle, say). That is about one per cycle.
+
+    ``index``, if given, is told of every press as it is made and undone
+    (append(outcome), pop() and clear(), as stats.PressIndex has), so it
+    can answer range queries over the batches without scanning them.
+    """
+
+    __slots__ = ("deck", "batches", "checkpoints", "mark", "index")
+
+    def __init__(self, rng=random, decks=1, penetration=None, seed=None, backend="random", index=None):
+        self.deck = Shoe(rng, decks, penetration, seed, backend)
+        self.batches = []
+        self.index = index
+        # (press numbers, cycles, positions), or None when not seeded.
+        self.checkpoints = None if seed is None else (array("q"), array("q"), array("q"))
+        # (cycle, position) where the last press ended, if still valid.
+        self.mark = None
+
+    def draw_press(self):
+        if self.deck.cut_reached:
+            self.deck.shuffle()
+        draw = self.deck.draw
+        card_class = CARD_CLASS
+        cards = []
+        while True:
+            card = draw()
+            cards.append(card)
+            if card_class[card] == PIP:
+                return cards
+
+    def press(self):
+        if self.checkpoints is not None:
+            self._checkpoint()
+        cards = self.draw_press()
+        self.batches.append(bytes(cards))
+        if self.checkpoints is not None:
+            self.mark = (self.deck.cycle, self.deck.dealt)
+        outcome = resolve_press(cards)
+        if self.index is not None:
+            self.index.append(outcome)
+        return cards, outcome
+
+    def _checkpoint(self):
+        deck = self.deck
+        # Shuffle now if draw_press() would, to know where the press starts.
+        if deck.cut_reached or not deck.remaining:
+            deck.shuffle()
+        presses, cycles, positions = self.checkpoints
+        if not cycles or (deck.cycle, deck.dealt) != self.mark or cycles[-1] != deck.cycle:
+            presses.append(len(self.batches) + 1)
+            cycles.append(deck.cycle)
+            positions.append(deck.dealt)
+
+    def undo(self):
+        if not self.batches:
+            return None
+        cards = self.batches.pop()
+        if self.index is not None:
+            self.index.pop()
+        dealt = self.deck.dealt
+        self.deck.restore(cards)
+        if self.checkpoints is not None:
+            presses, cycles, positions = self.checkpoints
+            continued = True
+            while presses and presses[-1] > len(self.batches):
+                presses.pop()
+                cycles.pop()
+                positions.pop()
+                continued = False
+            # Only a press that carried on from the one before and is put
+            # back whole leaves the shoe where that one ended.
+            if continued and dealt - self.deck.dealt == len(cards):
+                self.mark = (self.deck.cycle, self.deck.dealt)
+            else:
+                self.mark = None
+        return cards
+
+    def reshuffle(self):
+        self.deck.shuffle()
+        self.batches = []
+        if self.index is not None:
+            self.index.clear()
+        if self.checkpoints is not None:
+            self.checkpoints = (array("q"), array("q"), array("q"))
+            self.mark = None
+
+    def last_outcome(self):
+        if not self.batches:
+            return None
+        return resolve_press(self.batches[-1])
+
+    def seek(self, press):
+        """Rebuild press ``press`` (1-based) and the shoe just after it.
+
+        A binary search finds the last checkpoint at or before the press
+        and only that cycle is dealt again, plus the next one if the press
+        runs into it, so the cost does not grow with the session.
+        """
+        if self.checkpoints is None:
+            raise ValueError("only a seeded session can seek")
+        if not 1 <= press <= len(self.batches):
+            raise IndexError(f"press {press} is not in this session")
+        presses, cycles, positions = self.checkpoints
+        idx = bisect_right(presses, press) - 1
+        number = presses[idx]
+        cycle = cycles[idx]
+        position = positions[idx]
+        deck = self.deck
+        dealt = cycle_cards(deck.seed, cycle, deck.decks, deck.backend)
+        card_class = CARD_CLASS
+        while True:
+            cards = []
+            while True:
+                if position == len(dealt):
+                    cycle += 1
+                    dealt = cycle_cards(deck.seed, cycle, deck.decks, deck.backend)
+                    position = 0
+                card = dealt[position]
+                position += 1
+                cards.append(card)
+                if card_class[card] == PIP:
+                    break
+            if number == press:
+                return Seek(press, tuple(cards), resolve_press(cards), cycle, position, dealt[position:])
+            number += 1
@@ -0,0 +1,281 @@
+"""Statistical fairness audit of the shuffles, on any rng backend.
+
+    python3 fairness.py 1000000 --rng pcg64 --source shoe --workers 4
+
+Decks are dealt by the code the game itself uses (``shoe``: Shoe.draw,
+as the CLI and server deal; ``timeline``: fresh_stack, as the GUI
+shuffles) and gathered into NumPy arrays, where every test is counted
+vectorized:
+
+    positions      card-by-position counts; every card equally likely
+                   at every position
+    pairs          ordered pairs of adjacent cards, one pair per deck at
+                   a rotating position; serial correlation within a deck
+    boundary       (last card of a deck, first card of the next) for
+                   disjoint pairs of decks; correlation across shuffles
+    press_length   length of each deck's first press, against the exact
+                   distribution from odds.outcome_weights()
+    jokers         Jokers in each deck's first press, likewise exact
+
+Each test is a chi-square goodness-of-fit test with its p-value; the run
+fails if any p-value is below ``--alpha``. Requires NumPy.
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+from math import exp, lgamma, log
+
+import numpy as np
+
+from engine import CARD_CLASS, DECK_SIZE, JOKER, PIP, Shoe
+from odds import FRESH_COUNTS, outcome_weights
+from rngs import BACKENDS, SEEDABLE, make_rng
+from timeline import fresh_stack, iter_stack
+
+SOURCES = ("shoe", "timeline")
+CARD_IS_PIP = np.frombuffer(CARD_CLASS, dtype=np.uint8) == PIP
+CARD_IS_JOKER = np.frombuffer(CARD_CLASS, dtype=np.uint8) == JOKER
+# Every non-pip card, then the first pip.
+MAX_FIRST_PRESS = DECK_SIZE - int(CARD_IS_PIP.sum()) + 1
+JOKER_COUNT = int(CARD_IS_JOKER.sum())
+# Cells expected to see fewer presses than this are pooled with the next.
+MIN_EXPECTED = 5.0
+# Enough decks for MIN_EXPECTED per cell of the boundary test.
+MIN_DECKS = int(2 * MIN_EXPECTED * DECK_SIZE * DECK_SIZE)
+
+
+def deal_decks(rng, count, source="shoe"):
+    """``count`` decks as a (count, DECK_SIZE) array, in dealing order."""
+    if source == "shoe":
+        draw = Shoe(rng).draw
+        dealt = bytes(draw() for _ in range(count * DECK_SIZE))
+    else:
+        dealt = b"".join(bytes(iter_stack(fresh_stack(rng))) for _ in range(count))
+    return np.frombuffer(dealt, dtype=np.uint8).reshape(count, DECK_SIZE)
+
+
+class FairnessCounts:
+    def __init__(self):
+        self.decks = 0
+        self.positions = np.zeros((DECK_SIZE, DECK_SIZE), dtype=np.int64)
+        self.pairs = np.zeros(DECK_SIZE * DECK_SIZE, dtype=np.int64)
+        self.boundary = np.zeros(DECK_SIZE * DECK_SIZE, dtype=np.int64)
+        self.press_length = np.zeros(MAX_FIRST_PRESS + 1, dtype=np.int64)
+        self.jokers = np.zeros(JOKER_COUNT + 1, dtype=np.int64)
+
+    def add(self, decks, first_index=0):
+        """Count ``decks``; ``first_index`` is the first one's deck number."""
+        count = decks.shape[0]
+        self.decks += count
+        cards = decks.astype(np.intp)
+        self.positions += np.bincount(
+            (np.arange(DECK_SIZE) * DECK_SIZE + cards).ravel(),
+            minlength=DECK_SIZE * DECK_SIZE,
+        ).reshape(DECK_SIZE, DECK_SIZE)
+        rows = np.arange(count)
+        offset = (first_index + rows) % (DECK_SIZE - 1)
+        self.pairs += np.bincount(
+            cards[rows, offset] * DECK_SIZE + cards[rows, offset + 1],
+            minlength=DECK_SIZE * DECK_SIZE,
+        )
+        self.boundary += np.bincount(
+            cards[0 : count - 1 : 2, -1] * DECK_SIZE + cards[1::2, 0],
+            minlength=DECK_SIZE * DECK_SIZE,
+        )
+        first_pip = CARD_IS_PIP[cards].argmax(axis=1)
+        self.press_length += np.bincount(first_pip + 1, minlength=MAX_FIRST_PRESS + 1)
+        before_pip = np.arange(DECK_SIZE) < first_pip[:, None]
+        self.jokers += np.bincount((CARD_IS_JOKER[cards] & before_pip).sum(axis=1), minlength=JOKER_COUNT + 1)
+
+    def merge(self, other):
+        self.decks += other.decks
+        self.positions += other.positions
+        self.pairs += other.pairs
+        self.boundary += other.boundary
+        self.press_length += other.press_length
+        self.jokers += other.jokers
+        return self
+
+
+def _count_chunk(count, first_index, backend, seed, source, batch_decks):
+    rng = make_rng(backend, seed)
+    counts = FairnessCounts()
+    done = 0
+    while done < count:
+        size = min(batch_decks, count - done)
+        counts.add(deal_decks(rng, size, source), first_index + done)
+        done += size
+    return counts
+
+
+def count_decks(decks, backend="random", seed=None, source="shoe", workers=1, batch_decks=8192):
+    """Deal ``decks`` decks across ``workers`` processes and count them.
+
+    Each worker's generator is seeded from a child of SeedSequence(seed),
+    so a seed and worker count always deal the same decks (except on the
+    secrets backend, which cannot be seeded).
+    """
+    children = np.random.SeedSequence(seed).spawn(workers)
+    seeds = [int.from_bytes(child.generate_state(4, np.uint32).tobytes(), "little") for child in children]
+    chunk, extra = divmod(decks, workers)
+    sizes = [chunk + (1 if idx < extra else 0) for idx in range(workers)]
+    starts = [sum(sizes[:idx]) for idx in range(workers)]
+    args = (sizes, starts, [backend] * workers, seeds, [source] * workers, [batch_decks] * workers)
+    if workers == 1:
+        return _count_chunk(*(column[0] for column in args))
+    counts = FairnessCounts()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for partial in pool.map(_count_chunk, *args):
+            counts.merge(partial)
+    return counts
+
+
+def chi2_sf(x, dof):
+    """P(X >= x) for X chi-square with ``dof`` degrees of freedom."""
+    a = dof / 2
+    x = x / 2
+    if x <= 0:
+        return 1.0
+    scale = exp(a * log(x) - x - lgamma(a))
+    if x < a + 1:
+        # Series for the lower regularized gamma function.
+        term = total = 1 / a
+        denominator = a
+        while term > total * 1e-15:
+            denominator += 1
+            term *= x / denominator
+            total += term
+        return max(0.0, 1.0 - scale * total)
+    # Continued fraction for the upper one (modified Lentz).
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    result = d
+    for step in range(1, 10_000):
+        an = -step * (step - a)
+        b += 2
+        d = an * d + b
+        d = 1 / (d if abs(d) > tiny else tiny)
+        c = b + an / c
+        if abs(c) < tiny:
+            c = tiny
+        delta = d * c
+        result *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return scale * result
+
+
+def _pooled(observed, expected):
+    """Pool adjacent cells until each expects at least MIN_EXPECTED."""
+    pooled_observed = []
+    pooled_expected = []
+    run_observed = run_expected = 0
+    for seen, wanted in zip(observed, expected):
+        run_observed += seen
+        run_expected += wanted
+        if run_expected >= MIN_EXPECTED:
+            pooled_observed.append(run_observed)
+            pooled_expected.append(run_expected)
+            run_observed = run_expected = 0
+    if (run_expected or run_observed) and pooled_expected:
+        pooled_observed[-1] += run_observed
+        pooled_expected[-1] += run_expected
+    return np.array(pooled_observed, dtype=float), np.array(pooled_expected, dtype=float)
+
+
+def _test(name, statistic, dof):
+    return {"test": name, "statistic": float(statistic), "dof": int(dof), "p": chi2_sf(float(statistic), dof)}
+
+
+def _goodness_of_fit(name, observed, probabilities, decks):
+    observed, expected = _pooled(observed, np.asarray(probabilities, dtype=float) * decks)
+    return _test(name, ((observed - expected) ** 2 / expected).sum(), observed.size - 1)
+
+
+def first_press_distributions():
+    """Exact (press length, Jokers) distributions of a fresh deck's first press."""
+    weights, denominator = outcome_weights(FRESH_COUNTS)
+    lengths = [Fraction(0)] * (MAX_FIRST_PRESS + 1)
+    jokers = [Fraction(0)] * (JOKER_COUNT + 1)
+    for (_, _, drawn_jokers, length), weight in weights:
+        lengths[length] += Fraction(weight, denominator)
+        jokers[drawn_jokers] += Fraction(weight, denominator)
+    return lengths, jokers
+
+
+def run_tests(counts):
+    decks = counts.decks
+    k = DECK_SIZE
+    results = []
+
+    # A uniform permutation matrix has covariance Π / (k - 1) with Π the
+    # projection onto the (k-1)^2 doubly centered matrices, so Pearson's
+    # statistic is k / (k-1) times a chi-square with (k-1)^2 dof.
+    expected = decks / k
+    positions = ((counts.positions - expected) ** 2).sum() / expected
+    results.append(_test("positions", positions * (k - 1) / k, (k - 1) ** 2))
+
+    # One pair per deck, uniform over the k(k-1) ordered distinct pairs;
+    # the diagonal cannot occur.
+    distinct = ~np.eye(k, dtype=bool).ravel()
+    expected = decks / (k * (k - 1))
+    pairs = ((counts.pairs[distinct] - expected) ** 2).sum() / expected
+    results.append(_test("pairs", pairs, k * (k - 1) - 1))
+
+    pairs_of_decks = counts.boundary.sum()
+    expected = pairs_of_decks / (k * k)
+    results.append(_test("boundary", ((counts.boundary - expected) ** 2).sum() / expected, k * k - 1))
+
+    lengths, jokers = first_press_distributions()
+    results.append(_goodness_of_fit("press_length", counts.press_length, lengths, decks))
+    results.append(_goodness_of_fit("jokers", counts.jokers, jokers, decks))
+    return results
+
+
+def format_results(results, counts, alpha):
+    lines = [f"Decks: {counts.decks}"]
+    for result in results:
+        verdict = "FAIL" if result["p"] < alpha else "ok"
+        lines.append(
+            f"{result['test']:>14}: chi2 {result['statistic']:12.1f}  dof {result['dof']:>5}"
+            f"  p {result['p']:.4f}  {verdict}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Audit shuffle fairness with chi-square tests.")
+    parser.add_argument("decks", type=int, nargs="?", default=1_000_000)
+    parser.add_argument("--rng", choices=BACKENDS, default="random")
+    parser.add_argument("--source", choices=SOURCES, default="shoe")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-decks", type=int, default=8192)
+    parser.add_argument("--alpha", type=float, default=0.001, help="fail a test below this p-value")
+    parser.add_argument("--json", metavar="FILE", help="also write the results as JSON")
+    args = parser.parse_args(argv)
+    if args.decks < MIN_DECKS:
+        parser.error(f"need at least {MIN_DECKS} decks for the boundary test")
+    if args.seed is not None and args.rng not in SEEDABLE:
+        parser.error(f"--rng {args.rng} cannot be seeded")
+
+    counts = count_decks(args.decks, args.rng, args.seed, args.source, args.workers, args.batch_decks)
+    results = run_tests(counts)
+    print(format_results(results, counts, args.alpha))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(
+                {"decks": counts.decks, "rng": args.rng, "source": args.source, "seed": args.seed, "tests": results},
+                handle,
+                indent=2,
+            )
+    return 1 if any(result["p"] < args.alpha for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,453 @@
+"""Append-only binary session journal.
+
+Every press, undo, redo, reshuffle and branch switch is one fixed-width
+32-byte record: kind, count and up to 30 payload bytes, with cards stored
+as single-byte card ids (see engine.CARDS). A press of more than 30
+cards, which only variant rules with many faces and Jokers allow, leads
+with PRESS_PART records holding its first cards. Every freshly shuffled
+deck is logged first as DECK records in draw order, so replay never needs
+the original RNG. Card ids only mean something under the rules they were
+dealt with, so the header record carries a fingerprint of the rules and
+a journal cannot be opened under others.
+
+Records are buffered and written with one fsync per batch. Every
+``snapshot_every`` events the current line is compacted (see
+Timeline.compact()), so describing it only walks the presses since the
+last compaction, and written to ``<path>.snap`` (see Timeline.line()).
+load() starts from that snapshot and replays
+only the records after it, read through mmap. A snapshot keeps the
+current line and its redo chain but not side branches. If a later record
+switches to a branch the snapshot does not have, load() falls back to
+replaying from event zero.
+
+With SessionStats attached, a snapshot also holds the session totals,
+and the PressIndex rows go to ``<path>.index``, where only the rows
+popped or added since the previous snapshot are written. Its header
+names the snapshot it matches, so a crash between the two writes makes
+load() recount rather than trust stale rows.
+"""
+import mmap
+import os
+import random
+import struct
+from array import array
+from collections import deque
+
+from engine import ASPECTS, CARD_COUNT, RULES
+from rules import compile_rules, fingerprint
+from stats import RANGE_METRICS, PressIndex
+from timeline import Timeline
+
+RECORD = struct.Struct("<BB30s")
+PAYLOAD = RECORD.size - 2
+KIND_HEADER = 0
+KIND_DECK = 1
+KIND_PRESS = 2
+KIND_UNDO = 3
+KIND_REDO = 4
+KIND_RESHUFFLE = 5
+KIND_CHECKOUT = 6
+KIND_PRESS_PART = 7
+
+MAGIC = b"GOEJ"
+SNAPSHOT_MAGIC = b"GOES"
+INDEX_MAGIC = b"GOEI"
+# Version 1 headers have no rules fingerprint; they predate variant rules.
+VERSION = 2
+# Version 1 snapshots have no session totals.
+SNAPSHOT_VERSION = 2
+INDEX_VERSION = 1
+RULES_FINGERPRINT = fingerprint(RULES)
+_BUILT_IN_FINGERPRINT = fingerprint(compile_rules({}))
+# magic, version, records, back, tip serial, next serial, segments and
+# the size of the totals block that follows.
+SNAPSHOT_HEADER = struct.Struct("<4sHQQQQII")
+SNAPSHOT_SEGMENT = struct.Struct("<BIII")
+# presses, advantage, Joker XP and lengths, then XP per aspect and
+# (length, presses) pairs as int64.
+SNAPSHOT_TOTALS = struct.Struct("<QqqH")
+# magic, version, records of the snapshot the rows match (0 while they
+# are being written) and rows.
+INDEX_HEADER = struct.Struct("<4sHQQ")
+INDEX_ROW = 8 * len(RANGE_METRICS)
+
+
+def snapshot_path(path):
+    return f"{path}.snap"
+
+
+def index_path(path):
+    return f"{path}.index"
+
+
+def check_header(record, path):
+    """Raise ValueError unless ``record`` heads a journal for these rules."""
+    kind, _, payload = RECORD.unpack(record)
+    if kind != KIND_HEADER or payload[:4] != MAGIC or payload[4] not in (1, VERSION):
+        raise ValueError(f"{path} is not a session journal")
+    written = payload[5:21] if payload[4] == VERSION else _BUILT_IN_FINGERPRINT
+    if written != RULES_FINGERPRINT:
+        raise ValueError(f"{path} was written under different rules than {RULES.source}")
+
+
+class Journal:
+    def __init__(self, path, sync_every=256, snapshot_every=25_000):
+        self.path = path
+        self.sync_every = sync_every
+        self.snapshot_every = snapshot_every
+        self.timeline = None
+        self.stats = None
+        # Rows of <path>.index that match the start of the stats' index.
+        self.index_rows = 0
+        self.pending = bytearray()
+        self.pending_records = 0
+        self.since_snapshot = 0
+        self.file = open(path, "ab")
+        size = self.file.tell()
+        if size % RECORD.size:
+            # Drop a record torn by a crash mid-write.
+            size -= size % RECORD.size
+            self.file.truncate(size)
+        self.records = size // RECORD.size
+        if self.records:
+            with open(path, "rb") as handle:
+                check_header(handle.read(RECORD.size), path)
+        else:
+            self._append(KIND_HEADER, MAGIC + bytes([VERSION]) + RULES_FINGERPRINT, 0)
+            self.sync()
+
+    def attach(self, timeline, stats=None):
+        """Log ``timeline``'s events; snapshots also save ``stats``, if given.
+
+        ``stats`` must follow the timeline, as load() leaves it.
+        """
+        timeline.journal = self
+        self.timeline = timeline
+        self.stats = stats
+        if stats is not None:
+            self.index_rows = read_index_header(index_path(self.path))[1]
+        return self
+
+    def _append(self, kind, payload=b"", count=0):
+        self.pending += RECORD.pack(kind, count, payload)
+        self.pending_records += 1
+        if self.pending_records >= self.sync_every:
+            self.sync()
+
+    def _event(self):
+        self.since_snapshot += 1
+        if self.snapshot_every and self.since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def log_deck(self, cards):
+        ids = bytes(cards)
+        for start in range(0, len(ids), PAYLOAD):
+            chunk = ids[start:start + PAYLOAD]
+            self._append(KIND_DECK, chunk, len(chunk))
+
+    def log_press(self, cards):
+        ids = bytes(cards)
+        while len(ids) > PAYLOAD:
+            self._append(KIND_PRESS_PART, ids[:PAYLOAD], PAYLOAD)
+            ids = ids[PAYLOAD:]
+        self._append(KIND_PRESS, ids, len(ids))
+        self._event()
+
+    def log_undo(self):
+        self._append(KIND_UNDO)
+        self._event()
+
+    def log_redo(self):
+        self._append(KIND_REDO)
+        self._event()
+
+    def log_reshuffle(self):
+        self._append(KIND_RESHUFFLE)
+        self._event()
+
+    def log_checkout(self, serial):
+        self._append(KIND_CHECKOUT, serial.to_bytes(8, "little"))
+        self._event()
+
+    def sync(self):
+        if not self.pending:
+            return
+        self.file.write(self.pending)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.records += self.pending_records
+        self.pending.clear()
+        self.pending_records = 0
+
+    def snapshot(self):
+        self.sync()
+        self.since_snapshot = 0
+        if self.timeline is None:
+            return
+        stats = self.stats
+        if stats is not None:
+            # The snapshot is taken mid-event, before a view catches up.
+            stats.follow(self.timeline)
+        # Does nothing while there are side branches; line() then walks
+        # the presses built since the last compaction.
+        self.timeline.compact()
+        if stats is not None:
+            self.index_rows = write_index(index_path(self.path), stats.index, self.records, self.index_rows)
+        write_snapshot(snapshot_path(self.path), self.timeline, self.records, stats)
+
+    def close(self):
+        self.sync()
+        self.file.close()
+
+
+def write_snapshot(path, timeline, records, stats=None):
+    segments, back = timeline.line()
+    tip = timeline.current
+    while tip.redo is not None:
+        tip = tip.redo
+    totals = b""
+    if stats is not None:
+        presses, advantage, xp, joker_xp, lengths = stats.totals()
+        totals = (
+            SNAPSHOT_TOTALS.pack(presses, advantage, joker_xp, len(lengths))
+            + array("q", xp).tobytes()
+            + array("q", [value for pair in sorted(lengths.items()) for value in pair]).tobytes()
+        )
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as handle:
+        handle.write(
+            SNAPSHOT_HEADER.pack(
+                SNAPSHOT_MAGIC,
+                SNAPSHOT_VERSION,
+                records,
+                back,
+                tip.serial if tip.serial is not None else 0,
+                timeline.next_serial,
+                len(segments),
+                len(totals),
+            )
+        )
+        handle.write(totals)
+        for reshuffle, stream, drawn, presses in segments:
+            handle.write(SNAPSHOT_SEGMENT.pack(reshuffle, len(stream), drawn, presses))
+            handle.write(stream)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path):
+    """Return (records, back, tip_serial, next_serial, segments, totals) or None.
+
+    ``totals`` is as SessionStats.totals() returns, or None when the
+    snapshot was written without stats.
+    """
+    try:
+        with open(path, "rb") as handle:
+            data = handle.read()
+    except FileNotFoundError:
+        return None
+    if len(data) < SNAPSHOT_HEADER.size:
+        return None
+    magic, version, records, back, tip_serial, next_serial, count, totals_size = SNAPSHOT_HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        return None
+    offset = SNAPSHOT_HEADER.size
+    totals = None
+    if totals_size:
+        presses, advantage, joker_xp, length_count = SNAPSHOT_TOTALS.unpack_from(data, offset)
+        values = array("q", data[offset + SNAPSHOT_TOTALS.size : offset + totals_size])
+        xp = tuple(values[: len(ASPECTS)])
+        pairs = values[len(ASPECTS) :]
+        lengths = dict(zip(pairs[::2], pairs[1::2]))
+        totals = (presses, advantage, xp, joker_xp, lengths)
+        offset += totals_size
+    segments = []
+    for _ in range(count):
+        reshuffle, length, drawn, presses = SNAPSHOT_SEGMENT.unpack_from(data, offset)
+        offset += SNAPSHOT_SEGMENT.size
+        segments.append((bool(reshuffle), data[offset:offset + length], drawn, presses))
+        offset += length
+    return records, back, tip_serial, next_serial, segments, totals
+
+
+def read_index_header(path):
+    """(records, rows) of the index at ``path``; (0, 0) if it has none."""
+    try:
+        with open(path, "rb") as handle:
+            header = handle.read(INDEX_HEADER.size)
+    except FileNotFoundError:
+        return 0, 0
+    if len(header) < INDEX_HEADER.size:
+        return 0, 0
+    magic, version, records, rows = INDEX_HEADER.unpack(header)
+    if magic != INDEX_MAGIC or version != INDEX_VERSION:
+        return 0, 0
+    return records, rows
+
+
+def write_index(path, index, records, saved=0):
+    """Save ``index`` to ``path`` for the snapshot at ``records``; return its rows.
+
+    The first ``saved`` rows on disk are known to match and only the rows
+    after them, or after the first one popped since, are written.
+    """
+    keep = min(saved, index.unchanged)
+    mode = "r+b" if os.path.exists(path) else "w+b"
+    with open(path, mode) as handle:
+        # No snapshot matches the rows while they change.
+        handle.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, 0, keep))
+        handle.seek(INDEX_HEADER.size + keep * INDEX_ROW)
+        handle.write(index.rows(keep).tobytes())
+        handle.truncate()
+        handle.flush()
+        os.fsync(handle.fileno())
+        handle.seek(0)
+        handle.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, records, len(index)))
+        handle.flush()
+        os.fsync(handle.fileno())
+    index.unchanged = len(index)
+    return len(index)
+
+
+def read_index(path, records, presses):
+    """The PressIndex saved for the snapshot at ``records``, or None."""
+    if read_index_header(path) != (records, presses):
+        return None
+    with open(path, "rb") as handle:
+        handle.seek(INDEX_HEADER.size)
+        data = handle.read(presses * INDEX_ROW)
+    if len(data) != presses * INDEX_ROW:
+        return None
+    return PressIndex.from_rows(array("q", data))
+
+
+class RecordedDecks:
+    """Stands in for the RNG during replay, dealing the logged decks."""
+
+    def __init__(self):
+        self.decks = deque()
+
+    def shuffle(self, cards):
+        # Logged decks are in draw order; the stack's top is the list's end.
+        cards[:] = reversed(self.decks.popleft())
+
+
+class UnknownNodeError(LookupError):
+    pass
+
+
+def replay(timeline, view, known=None, stats=None):
+    """Apply the records in ``view`` to ``timeline``, moving ``stats`` along."""
+    saved_rng = timeline.rng
+    decks = RecordedDecks()
+    timeline.rng = decks
+    nodes = dict(known or {})
+    deck_parts = []
+    deck_size = 0
+    press_parts = []
+    try:
+        for kind, count, payload in RECORD.iter_unpack(view):
+            if kind == KIND_PRESS:
+                cards = payload[:count]
+                if press_parts:
+                    press_parts.append(cards)
+                    cards = b"".join(press_parts)
+                    press_parts = []
+                node = timeline.press()
+                if bytes(node.cards) != cards:
+                    raise ValueError("journal press does not match replayed deck")
+                nodes[node.serial] = node
+            elif kind == KIND_PRESS_PART:
+                press_parts.append(payload[:count])
+            elif kind == KIND_DECK:
+                deck_parts.append(payload[:count])
+                deck_size += count
+                if deck_size == CARD_COUNT:
+                    decks.decks.append(b"".join(deck_parts))
+                    deck_parts = []
+                    deck_size = 0
+            elif kind == KIND_UNDO:
+                timeline.undo()
+            elif kind == KIND_REDO:
+                timeline.redo()
+            elif kind == KIND_RESHUFFLE:
+                node = timeline.reshuffle()
+                nodes[node.serial] = node
+            elif kind == KIND_CHECKOUT:
+                serial = int.from_bytes(payload[:8], "little")
+                node = nodes.get(serial)
+                if node is None:
+                    raise UnknownNodeError(serial)
+                timeline.checkout(node)
+            else:
+                continue
+            if stats is not None:
+                stats.follow(timeline)
+    finally:
+        timeline.rng = saved_rng
+    return timeline
+
+
+def load(path, rng=random, use_snapshot=True, stats=None):
+    """Rebuild a Timeline from the journal at ``path``.
+
+    ``stats``, a SessionStats, is left following the timeline: taken from
+    the snapshot when it has totals and a matching index, and otherwise
+    counted as the records are replayed.
+    """
+    timeline = Timeline(rng)
+    if stats is not None:
+        stats.__init__()
+        stats.rebind(timeline.current)
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        return timeline
+    records = size // RECORD.size
+    if not records:
+        return timeline
+    with open(path, "rb") as handle:
+        check_header(handle.read(RECORD.size), path)
+    if records == 1:
+        return timeline
+    start = 1
+    if use_snapshot:
+        snapshot = read_snapshot(snapshot_path(path))
+        if snapshot is not None and snapshot[0] <= records:
+            start, back, tip_serial, next_serial, segments, totals = snapshot
+            timeline.restore_line(segments, back, tip_serial, next_serial)
+            if stats is not None:
+                index = None
+                if totals is not None:
+                    index = read_index(index_path(path), start, totals[0])
+                if index is not None:
+                    stats.restore(timeline.current, totals, index)
+                else:
+                    stats.__init__()
+                    stats.follow(timeline)
+    with open(path, "rb") as handle:
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)[start * RECORD.size:records * RECORD.size]
+            try:
+                replay(timeline, view, {node.serial: node for node in timeline.branches()}, stats)
+            except UnknownNodeError:
+                if start == 1:
+                    raise
+                timeline = None
+            finally:
+                view.release()
+    if timeline is None:
+        return load(path, rng, use_snapshot=False, stats=stats)
+    return timeline
+
+
+def open_session(path, rng=random, sync_every=256, snapshot_every=25_000, stats=None):
+    """Load the journal at ``path`` and keep logging new events to it.
+
+    With ``stats``, a SessionStats, it is loaded along with the timeline
+    and saved with each snapshot.
+    """
+    timeline = load(path, rng, stats=stats)
+    journal = Journal(path, sync_every=sync_every, snapshot_every=snapshot_every)
+    return timeline, journal.attach(timeline, stats)
@@ -0,0 +1,347 @@
+"""Load generator for the table server, with latency histograms.
+
+    python3 loadgen.py --players 500 --duration 30 --out run.json
+    python3 loadgen.py --players 500 --duration 30 --baseline run.json
+
+Simulated players sit at tables, wait an exponentially distributed think
+time and then draw, undo or reshuffle. Every action is timed with
+perf_counter_ns into an HDR-style log-linear histogram. The report has
+p50/p95/p99/p99.9 per action and the completed actions per interval.
+
+``--mode http`` (the default) starts server.GameServer on a local port
+in this process and talks HTTP to it. ``--mode direct`` calls
+GameServer.act() without sockets, so only the draw/undo/reshuffle logic
+is measured. ``--connect host:port`` drives a server that is already
+running. A fixed ``--seed`` reproduces the same players, think times and
+decks (every table is seeded from it and its name), so reports from two
+commits can be compared with ``--baseline``. The comparison fails on new
+errors; throughput and latency vary too much from run to run to gate on
+unless ``--time-tolerance`` is given.
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+
+from server import GameServer
+
+ACTIONS = ("draw", "undo", "reshuffle")
+DEFAULT_MIX = (0.88, 0.1, 0.02)
+PERCENTILES = (50.0, 95.0, 99.0, 99.9)
+
+
+class LatencyHistogram:
+    """Log-linear histogram of nanosecond values, HDR style.
+
+    Values below 2**SUB_BITS are counted exactly; above that each power of
+    two is split into 2**(SUB_BITS - 1) buckets, so every recorded value
+    is kept to within 0.1%.
+    """
+
+    SUB_BITS = 11
+    HALF = 1 << (SUB_BITS - 1)
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        shift = value.bit_length() - self.SUB_BITS
+        if shift < 0:
+            shift = 0
+        index = shift * self.HALF + (value >> shift)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        return self
+
+    def _highest(self, index):
+        shift = max(0, index // self.HALF - 1)
+        return ((index - shift * self.HALF + 1) << shift) - 1
+
+    def percentile(self, percent):
+        if not self.total:
+            return 0
+        rank = max(1, round(self.total * percent / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._highest(index), self.max)
+        return self.max
+
+    def summary(self):
+        stats = {f"p{percent:g}": self.percentile(percent) / 1e6 for percent in PERCENTILES}
+        stats["max"] = self.max / 1e6
+        stats["count"] = self.total
+        return stats
+
+
+class DirectClient:
+    def __init__(self, game):
+        self.game = game
+
+    async def request(self, table, action):
+        self.game.act(self.game.table(table), action)
+
+    def close(self):
+        pass
+
+
+class HttpClient:
+    """One keep-alive connection per player."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, table, action):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(
+            f"POST /tables/{table}/{action} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: 0\r\n\r\n".encode()
+        )
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        length = 0
+        for line in head.split(b"\r\n"):
+            if line[:15].lower() == b"content-length:":
+                length = int(line[15:])
+        await self.reader.readexactly(length)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class LoadRun:
+    def __init__(self, players, tables, duration, warmup, think, mix, interval, seed):
+        self.players = players
+        self.tables = tables
+        self.duration = duration
+        self.warmup = warmup
+        self.think = think
+        self.mix = mix
+        self.interval = interval
+        self.seed = seed
+        self.histograms = {action: LatencyHistogram() for action in ACTIONS}
+        self.throughput = []
+        self.errors = 0
+
+    async def player(self, index, client, start, stop):
+        rng = random.Random(f"{self.seed}:{index}")
+        table = f"t{index % self.tables}"
+        loop = asyncio.get_running_loop()
+        histograms = self.histograms
+        throughput = self.throughput
+        interval = self.interval
+        measure_from = start + self.warmup
+        try:
+            while True:
+                # Always yield, so direct mode without think time still
+                # interleaves the players.
+                await asyncio.sleep(rng.expovariate(1 / self.think) if self.think else 0)
+                now = loop.time()
+                if now >= stop:
+                    return
+                action = rng.choices(ACTIONS, self.mix)[0]
+                began = time.perf_counter_ns()
+                try:
+                    await client.request(table, action)
+                except (OSError, asyncio.IncompleteReadError):
+                    self.errors += 1
+                    return
+                elapsed = time.perf_counter_ns() - began
+                if now >= measure_from:
+                    histograms[action].record(elapsed)
+                    slot = int((now - measure_from) / interval)
+                    while len(throughput) <= slot:
+                        throughput.append(0)
+                    throughput[slot] += 1
+        finally:
+            client.close()
+
+    async def run(self, make_client):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        stop = start + self.warmup + self.duration
+        await asyncio.gather(
+            *(self.player(index, make_client(), start, stop) for index in range(self.players))
+        )
+        # Drop the last slot if the run ended part way through it.
+        measured = int(self.duration / self.interval)
+        del self.throughput[measured:]
+
+    def report(self, config):
+        total = LatencyHistogram()
+        for histogram in self.histograms.values():
+            total.merge(histogram)
+        return {
+            "config": config,
+            "commit": current_commit(),
+            "errors": self.errors,
+            "actions_per_second": total.total / self.duration if self.duration else 0.0,
+            "latency_ms": total.summary(),
+            "latency_ms_by_action": {action: h.summary() for action, h in self.histograms.items()},
+            "throughput": {"interval": self.interval, "counts": self.throughput},
+        }
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_load(args):
+    run = LoadRun(
+        args.players,
+        args.tables,
+        args.duration,
+        args.warmup,
+        args.think,
+        args.mix,
+        args.interval,
+        args.seed,
+    )
+    if args.connect:
+        host, _, port = args.connect.rpartition(":")
+        await run.run(lambda: HttpClient(host or "127.0.0.1", int(port)))
+    else:
+        game = GameServer(decks=args.decks, max_tables=max(args.tables, 1), backend="random", seed=args.seed)
+        if args.mode == "direct":
+            client = DirectClient(game)
+            await run.run(lambda: client)
+        else:
+            server = await asyncio.start_server(game.handle, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            await run.run(lambda: HttpClient("127.0.0.1", port))
+            server.close()
+            await server.wait_closed()
+    return run
+
+
+def format_report(report):
+    latency = report["latency_ms"]
+    lines = [
+        f"commit {report['commit']}  {report['config']['mode']}  "
+        f"players {report['config']['players']}  tables {report['config']['tables']}",
+        f"actions/s {report['actions_per_second']:.0f}  errors {report['errors']}",
+        "latency ms  "
+        + "  ".join(f"{name} {latency[name]:.3f}" for name in ("p50", "p95", "p99", "p99.9", "max")),
+    ]
+    for action, stats in report["latency_ms_by_action"].items():
+        if stats["count"]:
+            lines.append(
+                f"  {action:>9}: n {stats['count']}  p50 {stats['p50']:.3f}"
+                f"  p99 {stats['p99']:.3f}  max {stats['max']:.3f}"
+            )
+    counts = report["throughput"]["counts"]
+    if counts:
+        interval = report["throughput"]["interval"]
+        lines.append(
+            f"throughput per {interval:g}s: "
+            + " ".join(str(count) for count in counts)
+        )
+    return "\n".join(lines)
+
+
+def compare(report, baseline, time_tolerance=None):
+    """Return lines describing regressions against ``baseline``.
+
+    Failed actions always count; throughput and latency only with
+    ``time_tolerance``, the fraction they may get worse by.
+    """
+    regressions = []
+    if report["errors"] > baseline["errors"]:
+        regressions.append(f"errors {report['errors']} vs {baseline['errors']}")
+    if time_tolerance is None:
+        return regressions
+    base_rate = baseline["actions_per_second"]
+    if base_rate and report["actions_per_second"] < base_rate * (1 - time_tolerance):
+        regressions.append(
+            f"throughput {report['actions_per_second']:.0f}/s vs {base_rate:.0f}/s"
+        )
+    for name in ("p50", "p99"):
+        old = baseline["latency_ms"][name]
+        new = report["latency_ms"][name]
+        if old and new > old * (1 + time_tolerance):
+            regressions.append(f"{name} {new:.3f} ms vs {old:.3f} ms")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the table server.")
+    parser.add_argument("--mode", choices=("http", "direct"), default="http")
+    parser.add_argument("--connect", metavar="HOST:PORT", help="use a running server instead")
+    parser.add_argument("--players", type=int, default=200)
+    parser.add_argument("--tables", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=1.0)
+    parser.add_argument("--think", type=float, default=0.05, help="mean think time in seconds; 0 for none")
+    parser.add_argument(
+        "--mix",
+        type=float,
+        nargs=3,
+        default=DEFAULT_MIX,
+        metavar=("DRAW", "UNDO", "RESHUFFLE"),
+        help="relative weights of the actions",
+    )
+    parser.add_argument("--interval", type=float, default=1.0, help="throughput report interval")
+    parser.add_argument("--decks", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument(
+        "--time-tolerance",
+        type=float,
+        default=None,
+        help="also fail when throughput or p50/p99 latency is worse by more than this fraction",
+    )
+    args = parser.parse_args(argv)
+    if args.connect:
+        args.mode = "http"
+
+    run = asyncio.run(run_load(args))
+    config = {
+        key: getattr(args, key)
+        for key in ("mode", "connect", "players", "tables", "duration", "warmup", "think", "decks", "seed")
+    }
+    config["mix"] = list(args.mix)
+    report = run.report(config)
+    print(format_report(report))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        if baseline["config"] != config:
+            print("warning: baseline was recorded with a different configuration", file=sys.stderr)
+        regressions = compare(report, baseline, args.time_tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
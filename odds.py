@@ -0,0 +1,278 @@
+"""Exact outcome probabilities for the next press.
+
+A press only depends on how many cards of each class are left, so the
+deck is compressed to a count tuple: pips by suit, faces by suit (which
+also fixes their color) and Jokers. For a given count tuple the chance of
+drawing a particular set of non-pip cards and then a pip of a given suit
+has a closed form, so every outcome is enumerated with exact integer
+weights over a common denominator. The enumeration runs to hundreds of
+kilobytes per count tuple, so only the fresh deck's is kept.
+
+press_odds() does not walk that enumeration. Advantage, press length and
+the face and Joker chances only depend on faces by color, Jokers and pips
+by color, so they are summed over those few classes and memoized on the
+reduced counts, which many count tuples share. Only the XP outcomes need
+faces by suit; they are summed over faces drawn per suit and Jokers
+drawn, without the per-pip-suit expansion.
+"""
+from collections import namedtuple
+from fractions import Fraction
+from functools import lru_cache
+from itertools import product
+from math import comb, factorial, prod
+from operator import mul
+
+from engine import (
+    CARD_CLASS,
+    CARD_SUIT,
+    FACE,
+    FACE_MASK,
+    FULL_MASK,
+    JOKER_MASK,
+    PIP,
+    PIP_MASK,
+    SUIT_MASKS,
+    SUIT_RED,
+    SUITS,
+)
+
+# Count tuple layout: pips in SUITS order, faces in SUITS order, jokers;
+# (10, 10, 10, 10, 3, 3, 3, 3, 2) for a fresh deck with the built-in rules.
+_SUIT_COUNT = len(SUITS)
+_JOKER_SLOT = 2 * _SUIT_COUNT
+# Count tuple slot per card id, and the card mask each slot counts.
+_COUNT_SLOT = bytes(
+    suit if kind == PIP else _SUIT_COUNT + suit if kind == FACE else _JOKER_SLOT
+    for kind, suit in zip(CARD_CLASS, CARD_SUIT)
+)
+_SLOT_MASKS = tuple(PIP_MASK & mask for mask in SUIT_MASKS) + tuple(
+    FACE_MASK & mask for mask in SUIT_MASKS
+) + (JOKER_MASK,)
+_NO_XP = (0,) * _SUIT_COUNT
+_RED_SIGNS = tuple(1 if red else -1 for red in SUIT_RED)
+_RED_SUITS = tuple(idx for idx, red in enumerate(SUIT_RED) if red)
+_BLACK_SUITS = tuple(idx for idx, red in enumerate(SUIT_RED) if not red)
+# (face balance, faces, jokers, cards) drawn before a mid-press reshuffle.
+_NOTHING_CARRIED = (0, 0, 0, 0)
+
+# ``advantage`` maps net advantage to probability, ``xp`` maps a per-suit
+# PoV XP tuple (SUITS order) to probability, ``press_length`` maps cards
+# drawn to probability and ``pip_suit`` maps the deciding suit to
+# probability. ``face_probability`` is the chance the press shows any
+# face, which is when the GUI reports advantage at all.
+PressOdds = namedtuple(
+    "PressOdds",
+    ["advantage", "xp", "press_length", "pip_suit", "face_probability", "joker_probability"],
+)
+
+
+def deck_counts(cards):
+    counts = [0] * (_JOKER_SLOT + 1)
+    slot = _COUNT_SLOT
+    for card in cards:
+        counts[slot[card]] += 1
+    return tuple(counts)
+
+
+def mask_counts(mask):
+    """Count tuple for the set of card ids in ``mask``."""
+    return tuple((mask & slot_mask).bit_count() for slot_mask in _SLOT_MASKS)
+
+
+FRESH_COUNTS = mask_counts(FULL_MASK)
+
+
+@lru_cache(maxsize=1)
+def _fresh_weights():
+    return _enumerate_weights(FRESH_COUNTS)
+
+
+def outcome_weights(counts):
+    """Enumerate the outcomes of one press from ``counts``.
+
+    Returns (weights, denominator); ``weights`` is a tuple of
+    ((pip_suit, faces, jokers, press_length), numerator) pairs where
+    ``faces`` counts drawn faces per suit.
+    """
+    if counts == FRESH_COUNTS:
+        return _fresh_weights()
+    return _enumerate_weights(counts)
+
+
+def _enumerate_weights(counts):
+    pips = counts[:_SUIT_COUNT]
+    faces = counts[_SUIT_COUNT:_JOKER_SLOT]
+    jokers = counts[_JOKER_SLOT]
+    total = sum(counts)
+    pip_total = sum(pips)
+    if pip_total == 0:
+        # The rest of the deck is drawn, then the press carries on into a
+        # freshly shuffled deck.
+        fresh_weights, denominator = _fresh_weights()
+        weights = tuple(
+            (
+                (
+                    pip_suit,
+                    tuple(drawn + left for drawn, left in zip(drawn_faces, faces)),
+                    drawn_jokers + jokers,
+                    length + total,
+                ),
+                weight,
+            )
+            for (pip_suit, drawn_faces, drawn_jokers, length), weight in fresh_weights
+        )
+        return weights, denominator
+
+    # P(a given multiset of k non-pips, then a pip of suit s)
+    #   = prod C(available, drawn) * k! * (N - k - 1)! * pips_s / N!
+    weights = []
+    for drawn in product(*(range(count + 1) for count in faces), range(jokers + 1)):
+        drawn_cards = sum(drawn)
+        ways = factorial(drawn_cards) * factorial(total - drawn_cards - 1)
+        for count, available in zip(drawn, counts[_SUIT_COUNT:]):
+            ways *= comb(available, count)
+        drawn_faces = drawn[:_SUIT_COUNT]
+        for pip_suit, pip_count in enumerate(pips):
+            if pip_count:
+                weights.append(
+                    ((pip_suit, drawn_faces, drawn[_SUIT_COUNT], drawn_cards + 1), ways * pip_count)
+                )
+    return tuple(weights), factorial(total)
+
+
+def _press_ways(total, non_pips):
+    # k! * (N - k - 1)! for each k non-pips drawn before the pip; times a
+    # product of comb()s and the pip count it is a weight over N!.
+    return [factorial(drawn) * factorial(total - drawn - 1) for drawn in range(non_pips + 1)]
+
+
+@lru_cache(maxsize=1024)
+def _class_weights(red_faces, black_faces, jokers, red_pips, black_pips, carried):
+    """Integer weights over N! for the outcomes that ignore suits.
+
+    Returns (advantage, press_length, face weight, joker weight, N!).
+    ``carried`` is what a press drew from the previous deck before it ran
+    out of pips (see _NOTHING_CARRIED).
+    """
+    carried_balance, carried_faces, carried_jokers, carried_cards = carried
+    pips = red_pips + black_pips
+    non_pips = red_faces + black_faces + jokers
+    total = non_pips + pips
+    ways = _press_ways(total, non_pips)
+    joker_ways = [comb(jokers, drawn) for drawn in range(jokers + 1)]
+    advantage = {}
+    for red in range(red_faces + 1):
+        red_ways = comb(red_faces, red)
+        for black in range(black_faces + 1):
+            faces = red + black
+            weight = red_ways * comb(black_faces, black) * sum(map(mul, joker_ways, ways[faces:]))
+            # Red faces minus black ones, flipped for a black pip.
+            balance = red - black + carried_balance
+            if red_pips:
+                advantage[balance] = advantage.get(balance, 0) + weight * red_pips
+            if black_pips:
+                advantage[-balance] = advantage.get(-balance, 0) + weight * black_pips
+    press_length = {
+        carried_cards + drawn + 1: comb(non_pips, drawn) * ways[drawn] * pips for drawn in range(non_pips + 1)
+    }
+    denominator = factorial(total)
+    face_weight = denominator
+    if not carried_faces:
+        face_weight -= sum(map(mul, joker_ways, ways)) * pips
+    joker_weight = denominator
+    if not carried_jokers:
+        faces = red_faces + black_faces
+        joker_weight -= sum(comb(faces, drawn) * ways[drawn] for drawn in range(faces + 1)) * pips
+    return dict(sorted(advantage.items())), press_length, face_weight, joker_weight, denominator
+
+
+def _xp_weights(counts, carried_faces, carried_jokers):
+    """PoV XP tuple -> integer weight over N!, from faces drawn per suit."""
+    pips = counts[:_SUIT_COUNT]
+    faces = counts[_SUIT_COUNT:_JOKER_SLOT]
+    jokers = counts[_JOKER_SLOT]
+    pip_total = sum(pips)
+    ways = _press_ways(sum(counts), sum(faces) + jokers)
+    joker_ways = [comb(jokers, drawn) for drawn in range(jokers + 1)]
+    pip_suits = [(suit, count) for suit, count in enumerate(pips) if count]
+    xp = {}
+    no_joker = 0
+    for drawn in product(*(range(count + 1) for count in faces)):
+        face_ways = prod(map(comb, faces, drawn))
+        first = sum(drawn)
+        xp_faces = list(map(sum, zip(drawn, carried_faces)))
+        for joker_count, joker_way in enumerate(joker_ways):
+            weight = face_ways * joker_way * ways[first + joker_count]
+            joker_count += carried_jokers
+            if not joker_count:
+                no_joker += weight * pip_total
+                continue
+            for pip_suit, pip_count in pip_suits:
+                # The Jokers' XP goes to the pip's aspect.
+                xp_faces[pip_suit] += joker_count
+                key = tuple(xp_faces)
+                xp_faces[pip_suit] -= joker_count
+                xp[key] = xp.get(key, 0) + weight * pip_count
+    if no_joker:
+        xp[_NO_XP] = no_joker
+    return xp
+
+
+@lru_cache(maxsize=1024)
+def press_odds(counts):
+    carried = _NOTHING_CARRIED
+    carried_faces = _NO_XP
+    carried_jokers = 0
+    if not any(counts[:_SUIT_COUNT]):
+        # The rest of the deck is drawn, then the press carries on into a
+        # freshly shuffled deck.
+        carried_faces = counts[_SUIT_COUNT:_JOKER_SLOT]
+        carried_jokers = counts[_JOKER_SLOT]
+        carried = (
+            sum(map(mul, carried_faces, _RED_SIGNS)),
+            sum(carried_faces),
+            carried_jokers,
+            sum(counts),
+        )
+        counts = FRESH_COUNTS
+    pips = counts[:_SUIT_COUNT]
+    faces = counts[_SUIT_COUNT:_JOKER_SLOT]
+    advantage, press_length, face_weight, joker_weight, denominator = _class_weights(
+        sum(faces[suit] for suit in _RED_SUITS),
+        sum(faces[suit] for suit in _BLACK_SUITS),
+        counts[_JOKER_SLOT],
+        sum(pips[suit] for suit in _RED_SUITS),
+        sum(pips[suit] for suit in _BLACK_SUITS),
+        carried,
+    )
+    xp = _xp_weights(counts, carried_faces, carried_jokers)
+    pip_total = sum(pips)
+    return PressOdds(
+        {key: Fraction(value, denominator) for key, value in advantage.items()},
+        {key: Fraction(value, denominator) for key, value in xp.items()},
+        {key: Fraction(value, denominator) for key, value in press_length.items()},
+        {SUITS[suit]: Fraction(count, pip_total) for suit, count in enumerate(pips) if count},
+        Fraction(face_weight, denominator),
+        Fraction(joker_weight, denominator),
+    )
+
+
+def next_press_odds(deck_cards):
+    """Odds for the next press drawn from ``deck_cards`` (the live deck)."""
+    return press_odds(deck_counts(deck_cards))
+
+
+def mask_press_odds(mask):
+    """Odds for the next press from a deck given as a card mask."""
+    return press_odds(mask_counts(mask))
+
+
+def odds_summary(odds):
+    advantage = sum((p for net, p in odds.advantage.items() if net > 0), Fraction(0))
+    disadvantage = sum((p for net, p in odds.advantage.items() if net < 0), Fraction(0))
+    return (
+        f"Next press: Advantage {float(advantage):.1%}"
+        f" | Disadvantage {float(disadvantage):.1%}"
+        f" | Joker XP {float(odds.joker_probability):.1%}"
+    )
+
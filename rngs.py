@@ -0,0 +1,199 @@
+"""Random number generators the shuffles can run on.
+
+Everything that shuffles (Timeline's fresh decks, the engine's Shoe)
+only calls shuffle() and randrange() on the rng it is handed, so any
+random.Random will do. make_rng() builds one by backend name:
+
+    random    Mersenne Twister, random.Random; the default
+    pcg64     NumPy's PCG64 (needs NumPy)
+    secrets   the operating system's CSPRNG, as the secrets module uses;
+              cannot be seeded or replayed
+
+The pcg64 and secrets backends are random.Random subclasses that take
+64-bit words from a buffer refilled in blocks, so the per-call cost of
+NumPy or os.urandom is paid once per block rather than per card. Neither
+is faster than random through Shoe.draw():
+
+    pcg64     a Shoe asks for randrange(n), randrange(n - 1), ... as it
+              deals, and pcg64 draws such a run of bounds with one NumPy
+              call; about 1.2 times random per card. A seeded Shoe builds
+              a generator every cycle and NumPy's seeding is slow, so
+              single-deck cycles cost about twice what random's do.
+    secrets   each pick is a Python multiply-shift over buffered words;
+              about 1.7 times random per card.
+"""
+import hashlib
+import os
+import random
+from array import array
+
+# NumPy, imported by the first PCG64Random so other backends never load it.
+np = None
+
+BACKENDS = ("random", "pcg64", "secrets")
+# Backends whose generators a seed fully determines, so deals can be replayed.
+SEEDABLE = ("random", "pcg64")
+BLOCK_WORDS = 4096
+# Most bounded picks PCG64Random draws ahead for a descending run.
+PICK_BLOCK = 1024
+_TWO_TO_MINUS_53 = 2.0 ** -53
+_WORD_MASK = (1 << 64) - 1
+# Fisher-Yates bounds per list length, for PCG64Random.shuffle().
+_SHUFFLE_BOUNDS = {}
+
+
+class _BufferedRandom(random.Random):
+    """random.Random over a block-refilled buffer of 64-bit words.
+
+    Overriding random() and getrandbits() is enough for the rest of the
+    random.Random API to use these words; randrange(n) and shuffle(),
+    which the decks call per card, take them directly instead. Subclasses
+    supply the words with _refill().
+    """
+
+    def __init__(self, seed=None):
+        self._words = []
+        self._index = 0
+        super().__init__(seed)
+
+    def _refill(self):
+        """Return the next block of words as a list of ints below 2**64."""
+        raise NotImplementedError(f"{type(self).__name__} does not define _refill()")
+
+    def _word(self):
+        index = self._index
+        words = self._words
+        if index == len(words):
+            words = self._words = self._refill()
+            index = 0
+        self._index = index + 1
+        return words[index]
+
+    def _below(self, n):
+        # Lemire's multiply-shift: an unbiased pick from range(n) that
+        # usually takes a single word.
+        product = self._word() * n
+        low = product & _WORD_MASK
+        if low < n:
+            threshold = (_WORD_MASK + 1 - n) % n
+            while low < threshold:
+                product = self._word() * n
+                low = product & _WORD_MASK
+        return product >> 64
+
+    def randrange(self, start, stop=None, step=1):
+        if stop is None and step == 1 and 0 < start <= _WORD_MASK:
+            return self._below(start)
+        return super().randrange(start, stop, step)
+
+    def shuffle(self, x):
+        below = self._below
+        for i in range(len(x) - 1, 0, -1):
+            j = below(i + 1)
+            x[i], x[j] = x[j], x[i]
+
+    def random(self):
+        return (self._word() >> 11) * _TWO_TO_MINUS_53
+
+    def getrandbits(self, k):
+        if k < 0:
+            raise ValueError("number of bits must be non-negative")
+        if k <= 64:
+            return self._word() >> (64 - k)
+        value = 0
+        for _ in range((k + 63) // 64):
+            value = value << 64 | self._word()
+        return value >> (-k % 64)
+
+
+class PCG64Random(_BufferedRandom):
+    """random.Random driven by NumPy's PCG64 bit generator."""
+
+    def seed(self, a=None, version=2):
+        global np
+        if np is None:
+            try:
+                import numpy as np
+            except ImportError:
+                raise RuntimeError("the pcg64 backend needs NumPy") from None
+        if isinstance(a, str):
+            a = a.encode()
+        if isinstance(a, (bytes, bytearray)):
+            # As random.Random does for string seeds.
+            a = int.from_bytes(a + hashlib.sha512(a).digest(), "big")
+        self._bit_generator = np.random.PCG64(a)
+        self._generator = np.random.Generator(self._bit_generator)
+        self._words = []
+        self._index = 0
+        # Picks drawn ahead for randrange(), last first, and the bound the
+        # next of them answers.
+        self._picks = []
+        self._pick_bound = 0
+        self.gauss_next = None
+
+    def _refill(self):
+        return self._bit_generator.random_raw(BLOCK_WORDS).tolist()
+
+    def randrange(self, start, stop=None, step=1):
+        if stop is None and step == 1 and 0 < start <= _WORD_MASK:
+            picks = self._picks
+            if not picks or start != self._pick_bound:
+                # Draw picks for start, start - 1, ... in one call; a
+                # call off that run drops the rest.
+                count = min(start, PICK_BLOCK)
+                picks = self._generator.integers(0, np.arange(start, start - count, -1)).tolist()
+                picks.reverse()
+                self._picks = picks
+            self._pick_bound = start - 1
+            return picks.pop()
+        return super().randrange(start, stop, step)
+
+    def shuffle(self, x):
+        # One vectorized call picks every swap (NumPy's bounded integers
+        # are unbiased too), which beats a Python call per card.
+        n = len(x)
+        if n < 2:
+            return
+        bounds = _SHUFFLE_BOUNDS.get(n)
+        if bounds is None:
+            bounds = _SHUFFLE_BOUNDS[n] = np.arange(n, 1, -1)
+        for i, j in zip(range(n - 1, 0, -1), self._generator.integers(0, bounds).tolist()):
+            x[i], x[j] = x[j], x[i]
+
+    def getstate(self):
+        return self._bit_generator.state, list(self._words[self._index:]), list(self._picks), self._pick_bound
+
+    def setstate(self, state):
+        bit_state, words, picks, pick_bound = state
+        self._bit_generator.state = bit_state
+        self._words = list(words)
+        self._index = 0
+        self._picks = list(picks)
+        self._pick_bound = pick_bound
+
+
+class SecretsRandom(_BufferedRandom):
+    """random.Random over os.urandom, like random.SystemRandom but buffered."""
+
+    def seed(self, a=None, version=2):
+        # Like SystemRandom: there is no state to seed.
+        self.gauss_next = None
+
+    def _refill(self):
+        return array("Q", os.urandom(8 * BLOCK_WORDS)).tolist()
+
+    def getstate(self):
+        raise NotImplementedError("the secrets backend has no state")
+
+    setstate = getstate
+
+
+def make_rng(backend="random", seed=None):
+    """A fresh generator for ``backend``; ``seed`` is ignored by secrets."""
+    if backend == "random":
+        return random.Random(seed)
+    if backend == "pcg64":
+        return PCG64Random(seed)
+    if backend == "secrets":
+        return SecretsRandom()
+    raise ValueError(f"unknown rng backend {backend!r}; expected one of {', '.join(BACKENDS)}")
@@ -0,0 +1,143 @@
+"""Deck composition and press rules, loaded once at startup.
+
+The built-in rules are the standard deck: four suits of A-10 pips and
+J, Q, K faces plus a Red and a Black Joker. A campaign variant is a JSON
+file named by the GOE_RULES environment variable, read when engine is
+first imported:
+
+    GOE_RULES=~/campaigns/blue-joker.json python3 app.py
+
+    {
+      "suits": [
+        {"name": "Clubs", "symbol": "♣", "color": "black",
+         "meaning": "Intuition/Motivation (Internal State)", "aspect": "Focus"},
+        ...
+      ],
+      "ranks": ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"],
+      "faces": ["J", "Q", "K"],
+      "jokers": [
+        {"name": "Red", "color": "red", "symbol": "🃟"},
+        {"name": "Black", "color": "black", "symbol": "🃏"}
+      ]
+    }
+
+Every key is optional and falls back to the built-in value. Ranks not
+listed in ``faces`` are pips (``"faces": []`` plays faces as pips), a
+face matches a pip of the same color, and each suit names the skill
+aspect its XP goes to (suits may share one). engine compiles the rules
+into its card tables on import, so the draw and outcome paths index
+flat tables and a variant runs exactly as fast as the built-in rules.
+"""
+import hashlib
+import json
+import os
+from collections import namedtuple
+
+ENV_VAR = "GOE_RULES"
+COLORS = ("red", "black")
+# Card ids are single bytes in journals and exports.
+MAX_CARDS = 255
+
+Suit = namedtuple("Suit", ["name", "symbol", "color", "meaning", "aspect"])
+Joker = namedtuple("Joker", ["name", "color", "symbol"])
+Rules = namedtuple("Rules", ["suits", "ranks", "faces", "jokers", "source"])
+
+DEFAULT_RULES = {
+    "suits": [
+        {
+            "name": "Clubs",
+            "symbol": "♣",
+            "color": "black",
+            "meaning": "Intuition/Motivation (Internal State)",
+            "aspect": "Focus",
+        },
+        {
+            "name": "Diamonds",
+            "symbol": "♦",
+            "color": "red",
+            "meaning": "Perception/Actions (Performance)",
+            "aspect": "Technique",
+        },
+        {
+            "name": "Hearts",
+            "symbol": "♥",
+            "color": "red",
+            "meaning": "Relationship/Manuver (Tactics)",
+            "aspect": "Tactics",
+        },
+        {
+            "name": "Spades",
+            "symbol": "♠",
+            "color": "black",
+            "meaning": "Understanding/Planning (Stratgy)",
+            "aspect": "Strategy",
+        },
+    ],
+    "ranks": ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"],
+    "faces": ["J", "Q", "K"],
+    "jokers": [
+        {"name": "Red", "color": "red", "symbol": "🃟"},
+        {"name": "Black", "color": "black", "symbol": "🃏"},
+    ],
+}
+
+
+def _entries(config, key, fields, source):
+    entries = config[key]
+    if not isinstance(entries, list):
+        raise ValueError(f"{source}: {key!r} must be a list")
+    parsed = []
+    for entry in entries:
+        if not isinstance(entry, dict) or set(entry) != set(fields):
+            raise ValueError(f"{source}: each of {key!r} needs exactly {', '.join(fields)}")
+        if not all(isinstance(entry[field], str) for field in fields):
+            raise ValueError(f"{source}: {key!r} fields must be strings")
+        if entry["color"] not in COLORS:
+            raise ValueError(f"{source}: color must be one of {', '.join(COLORS)}, not {entry['color']!r}")
+        parsed.append(tuple(entry[field] for field in fields))
+    names = [entry[0] for entry in parsed]
+    if len(set(names)) != len(names):
+        raise ValueError(f"{source}: {key!r} names must be unique")
+    return parsed
+
+
+def compile_rules(config, source="<rules>"):
+    """Validate ``config`` over the built-in rules and return Rules."""
+    unknown = set(config) - set(DEFAULT_RULES)
+    if unknown:
+        raise ValueError(f"{source}: unknown keys {', '.join(sorted(unknown))}")
+    config = {**DEFAULT_RULES, **config}
+    suits = tuple(Suit(*entry) for entry in _entries(config, "suits", Suit._fields, source))
+    jokers = tuple(Joker(*entry) for entry in _entries(config, "jokers", Joker._fields, source))
+    ranks = config["ranks"]
+    faces = config["faces"]
+    if not isinstance(ranks, list) or not all(isinstance(rank, str) for rank in ranks):
+        raise ValueError(f"{source}: 'ranks' must be a list of strings")
+    if len(set(ranks)) != len(ranks) or "Joker" in ranks:
+        raise ValueError(f"{source}: ranks must be unique and not 'Joker'")
+    if not isinstance(faces, list) or not set(faces) <= set(ranks):
+        raise ValueError(f"{source}: 'faces' must list some of the ranks")
+    if not suits or set(faces) == set(ranks):
+        raise ValueError(f"{source}: a deck needs at least one suit and one pip rank")
+    if len(suits) * len(ranks) + len(jokers) > MAX_CARDS:
+        raise ValueError(f"{source}: a deck holds at most {MAX_CARDS} cards")
+    return Rules(suits, tuple(ranks), frozenset(faces), jokers, source)
+
+
+def fingerprint(rules):
+    """Digest of the deck and press rules, without where they came from."""
+    data = json.dumps([rules.suits, rules.ranks, sorted(rules.faces), rules.jokers])
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).digest()
+
+
+def load_rules(path=None):
+    """Rules from ``path``, else from $GOE_RULES, else the built-in ones."""
+    if path is None:
+        path = os.environ.get(ENV_VAR)
+    if not path:
+        return compile_rules({}, "built-in rules")
+    with open(path, encoding="utf-8") as handle:
+        config = json.load(handle)
+    if not isinstance(config, dict):
+        raise ValueError(f"{path}: rules must be a JSON object")
+    return compile_rules(config, path)
@@ -0,0 +1,406 @@
+"""Multi-table game server: HTTP for actions, WebSocket for live updates.
+
+    python3 server.py --port 8765
+
+Every table has its own deck, press history and set of WebSocket
+clients. A table is created the first time it is used.
+
+    POST /tables/<name>/draw        press and return the outcome
+    POST /tables/<name>/undo        put the last press back on the deck
+    POST /tables/<name>/reshuffle   new deck, history cleared
+    GET  /tables/<name>             cards left, presses and last outcome
+    GET  /tables/<name>/presses/<n> press n rebuilt from the table's seed,
+                                    with the cards left in the shoe after
+                                    it (sorted, so the order of cards
+                                    still to come is not given away)
+    GET  /tables/<name>/presses/<a>-<b>
+                                    sums over presses a to b: advantage,
+                                    face matches and mismatches, Jokers,
+                                    press length and XP per aspect
+    GET  /tables/<name>/ws          WebSocket; every draw, undo and
+                                    reshuffle at the table is pushed as
+                                    one JSON text message. Clients may
+                                    also send "draw", "undo" or
+                                    "reshuffle" as text messages.
+    GET  /tables                    table count
+
+Only the standard library is used: HTTP/1.1 with keep-alive and a
+minimal RFC 6455 WebSocket. Put a real proxy in front of it for TLS.
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import re
+import secrets
+import struct
+
+from cli import press_record
+from engine import CARD_LABELS, Session
+from rngs import BACKENDS, SEEDABLE, make_rng
+from stats import PressIndex
+
+WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC11B65"
+TABLE_NAME = re.compile(r"[A-Za-z0-9_-]{1,64}")
+MAX_BODY = 64 * 1024
+# A WebSocket client this far behind on pushes is dropped.
+MAX_CLIENT_BUFFER = 1 << 20
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    413: "Payload Too Large",
+    503: "Service Unavailable",
+}
+
+
+class Table:
+    __slots__ = ("name", "session", "clients")
+
+    def __init__(self, name, rng, decks=1, penetration=None, seed=None, backend="random"):
+        self.name = name
+        self.session = Session(rng, decks, penetration, seed, backend, PressIndex())
+        # WebSocket StreamWriters; created on first subscription.
+        self.clients = None
+
+    def state(self):
+        session = self.session
+        last = session.last_outcome()
+        return {
+            "table": self.name,
+            "remaining": len(session.deck),
+            "presses": len(session.batches),
+            "last": press_record(len(session.batches), session.batches[-1], last) if last else None,
+        }
+
+    def draw(self):
+        cards, outcome = self.session.press()
+        event = press_record(len(self.session.batches), cards, outcome)
+        event["event"] = "draw"
+        event["table"] = self.name
+        return event
+
+    def undo(self):
+        cards = self.session.undo()
+        if cards is None:
+            return None
+        return {
+            "event": "undo",
+            "table": self.name,
+            "cards": [CARD_LABELS[card] for card in cards],
+            "presses": len(self.session.batches),
+        }
+
+    def reshuffle(self):
+        self.session.reshuffle()
+        return {"event": "reshuffle", "table": self.name, "remaining": len(self.session.deck)}
+
+    def seek(self, press):
+        found = self.session.seek(press)
+        record = press_record(press, found.cards, found.outcome)
+        record["table"] = self.name
+        record["cycle"] = found.cycle
+        record["position"] = found.position
+        record["deck"] = [CARD_LABELS[card] for card in sorted(found.deck)]
+        return record
+
+    def totals(self, first, last):
+        totals = self.session.index.range(first, last)
+        totals["table"] = self.name
+        totals["first"] = first
+        totals["last"] = last
+        return totals
+
+    def broadcast(self, message):
+        if not self.clients:
+            return
+        frame = ws_frame(message.encode())
+        for writer in list(self.clients):
+            if writer.transport.get_write_buffer_size() > MAX_CLIENT_BUFFER:
+                self.clients.discard(writer)
+                writer.close()
+                continue
+            writer.write(frame)
+
+
+def ws_accept_key(key):
+    return base64.b64encode(hashlib.sha1(key.encode() + WS_GUID).digest()).decode()
+
+
+def ws_frame(payload, opcode=0x1):
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+async def ws_read(reader):
+    """Read one client frame; returns (opcode, payload)."""
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        (length,) = struct.unpack("!H", await reader.readexactly(2))
+    elif length == 127:
+        (length,) = struct.unpack("!Q", await reader.readexactly(8))
+    if length > MAX_BODY:
+        raise ValueError("frame too large")
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask:
+        payload = bytes(byte ^ mask[idx & 3] for idx, byte in enumerate(payload))
+    return first & 0x0F, payload
+
+
+class GameServer:
+    """Tables by name.
+
+    Every table gets its own seeded ``backend`` session: the seed is
+    ``seed`` and the table name when a seed is given and random
+    otherwise, so a table's deals do not depend on play at other tables
+    and any press can be rebuilt with Session.seek(). A backend that
+    cannot be seeded (secrets) gives each table its own unseeded
+    generator instead, and seeking answers 409. With ``backend=None``
+    all tables share ``rng`` unseeded.
+    """
+
+    def __init__(self, rng=random, decks=1, max_tables=10_000, penetration=None, backend="random", seed=None):
+        self.rng = rng
+        self.backend = backend
+        self.seed = seed
+        self.decks = decks
+        self.penetration = penetration
+        self.max_tables = max_tables
+        self.tables = {}
+
+    def table(self, name):
+        table = self.tables.get(name)
+        if table is None:
+            if len(self.tables) >= self.max_tables:
+                return None
+            if self.backend is None:
+                table = Table(name, self.rng, self.decks, self.penetration)
+            elif self.backend not in SEEDABLE:
+                table = Table(name, make_rng(self.backend), self.decks, self.penetration)
+            else:
+                seed = secrets.token_hex(16) if self.seed is None else f"{self.seed}:{name}"
+                table = Table(name, self.rng, self.decks, self.penetration, seed, self.backend)
+            self.tables[name] = table
+        return table
+
+    def act(self, table, action):
+        """Run ``action`` at ``table`` and push it; returns the event or None."""
+        if action == "draw":
+            event = table.draw()
+        elif action == "undo":
+            event = table.undo()
+        elif action == "reshuffle":
+            event = table.reshuffle()
+        else:
+            return None
+        if event is not None:
+            table.broadcast(json.dumps(event, ensure_ascii=False))
+        return event
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ")
+                except ValueError:
+                    respond(writer, 400, {"error": "bad request line"}, close=True)
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    respond(writer, 400, {"error": "bad content-length"}, close=True)
+                    return
+                if length > MAX_BODY:
+                    respond(writer, 413, {"error": "body too large"}, close=True)
+                    return
+                if length:
+                    await reader.readexactly(length)
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+
+                path = target.partition("?")[0].rstrip("/")
+                parts = path.split("/")[1:]
+                if headers.get("upgrade", "").lower() == "websocket":
+                    if len(parts) == 3 and parts[0] == "tables" and parts[2] == "ws":
+                        await self.websocket(reader, writer, parts[1], headers)
+                    else:
+                        respond(writer, 404, {"error": "not found"}, close=True)
+                    return
+                status, body = self.route(method, parts)
+                respond(writer, status, body, close=not keep_alive)
+                if not keep_alive:
+                    return
+                if writer.transport.get_write_buffer_size() > MAX_CLIENT_BUFFER:
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            # The client went away mid-body.
+            pass
+        finally:
+            writer.close()
+
+    def route(self, method, parts):
+        if parts == ["tables"]:
+            return 200, {"tables": len(self.tables)}
+        if not parts or parts[0] != "tables" or len(parts) not in (2, 3, 4):
+            return 404, {"error": "not found"}
+        name = parts[1]
+        if not TABLE_NAME.fullmatch(name):
+            return 400, {"error": "bad table name"}
+        if len(parts) == 4:
+            return self.route_seek(method, name, parts)
+        if len(parts) == 2:
+            if method != "GET":
+                return 405, {"error": "use GET"}
+            table = self.tables.get(name)
+            if table is None:
+                return 404, {"error": "no such table"}
+            return 200, table.state()
+        if method != "POST":
+            return 405, {"error": "use POST"}
+        action = parts[2]
+        if action not in ("draw", "undo", "reshuffle"):
+            return 404, {"error": "not found"}
+        table = self.table(name)
+        if table is None:
+            return 503, {"error": "table limit reached"}
+        event = self.act(table, action)
+        if event is None:
+            return 409, {"error": "nothing to undo"}
+        return 200, event
+
+    def route_seek(self, method, name, parts):
+        if parts[2] != "presses":
+            return 404, {"error": "not found"}
+        if method != "GET":
+            return 405, {"error": "use GET"}
+        table = self.tables.get(name)
+        if table is None:
+            return 404, {"error": "no such table"}
+        first, dash, last = parts[3].partition("-")
+        if dash:
+            try:
+                return 200, table.totals(int(first), int(last))
+            except (ValueError, IndexError):
+                return 404, {"error": "no such presses"}
+        if table.session.checkpoints is None:
+            return 409, {"error": "table is not seeded"}
+        try:
+            return 200, table.seek(int(first))
+        except (ValueError, IndexError):
+            return 404, {"error": "no such press"}
+
+    async def websocket(self, reader, writer, name, headers):
+        key = headers.get("sec-websocket-key")
+        if not key or not TABLE_NAME.fullmatch(name):
+            respond(writer, 400, {"error": "bad WebSocket request"}, close=True)
+            return
+        table = self.table(name)
+        if table is None:
+            respond(writer, 503, {"error": "table limit reached"}, close=True)
+            return
+        writer.write(
+            (
+                "HTTP/1.1 101 Switching Protocols\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Accept: {ws_accept_key(key)}\r\n\r\n"
+            ).encode()
+        )
+        writer.write(ws_frame(json.dumps(dict(table.state(), event="state"), ensure_ascii=False).encode()))
+        if table.clients is None:
+            table.clients = set()
+        table.clients.add(writer)
+        try:
+            while True:
+                opcode, payload = await ws_read(reader)
+                if opcode == 0x8:
+                    writer.write(ws_frame(payload[:2], 0x8))
+                    return
+                if opcode == 0x9:
+                    writer.write(ws_frame(payload, 0xA))
+                elif opcode == 0x1:
+                    self.act(table, payload.decode("utf-8", "replace").strip())
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            table.clients.discard(writer)
+            if not table.clients:
+                table.clients = None
+
+
+def respond(writer, status, body, close=False):
+    payload = json.dumps(body, ensure_ascii=False).encode()
+    writer.write(
+        (
+            f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n"
+        ).encode()
+        + payload
+    )
+
+
+async def serve(
+    host="127.0.0.1",
+    port=8765,
+    seed=None,
+    decks=1,
+    max_tables=10_000,
+    penetration=None,
+    backend="random",
+):
+    game = GameServer(decks=decks, max_tables=max_tables, penetration=penetration, backend=backend, seed=seed)
+    server = await asyncio.start_server(game.handle, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve many card tables over HTTP and WebSocket.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--decks", type=int, default=1, help="decks per table shoe")
+    parser.add_argument("--penetration", type=float, default=None, help="cut card, as a fraction of the shoe")
+    parser.add_argument("--max-tables", type=int, default=10_000)
+    parser.add_argument("--rng", choices=BACKENDS, default="random", help="shuffle generator, one per table")
+    args = parser.parse_args(argv)
+    if not 1 <= args.decks <= 64:
+        parser.error("--decks must be between 1 and 64")
+    if args.penetration is not None and not 0 < args.penetration <= 1:
+        parser.error("--penetration must be in (0, 1]")
+    if args.seed is not None and args.rng not in SEEDABLE:
+        parser.error(f"--rng {args.rng} cannot be seeded")
+    try:
+        asyncio.run(
+            serve(args.host, args.port, args.seed, args.decks, args.max_tables, args.penetration, args.rng)
+        )
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
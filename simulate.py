@@ -0,0 +1,250 @@
+"""Vectorized Monte Carlo simulation of press outcomes.
+
+Decks are integer arrays of card ids in build_deck() order (0-51 by suit
+then rank, 52 = Red Joker, 53 = Black Joker with the built-in rules). Each batch shuffles many
+decks at once and lays them end to end, which is exactly what a long
+session sees: presses run across reshuffles, and the cards left over at
+the end of one batch open the first press of the next.
+
+Requires NumPy; the GUI and engine do not.
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from engine import (
+    CARD_CLASS,
+    CARD_SUIT as ENGINE_CARD_SUIT,
+    DECK_SIZE,
+    FACE,
+    JOKER,
+    PIP,
+    SUIT_RED,
+    SUITS,
+    skill_aspect_for_suit,
+)
+
+_SUIT_FACES = tuple(
+    sum(kind == FACE and suit == idx for kind, suit in zip(CARD_CLASS, ENGINE_CARD_SUIT))
+    for idx in range(len(SUITS))
+)
+# A press can straddle one reshuffle, so it holds at most the non-pip
+# cards of two decks plus the pip: 2 * (12 faces + 2 jokers) + 1 with
+# the built-in rules.
+MAX_FACES = 2 * sum(_SUIT_FACES)
+MAX_JOKERS = 2 * CARD_CLASS.count(JOKER)
+MAX_PRESS_LENGTH = MAX_FACES + MAX_JOKERS + 1
+MAX_SUIT_XP = 2 * max(_SUIT_FACES) + MAX_JOKERS
+
+
+def _card_tables():
+    card_class = np.frombuffer(CARD_CLASS, dtype=np.uint8)
+    suit = np.frombuffer(ENGINE_CARD_SUIT, dtype=np.uint8).astype(np.int8)
+    # Columns: faces per suit in SUITS order, then jokers.
+    counts = np.zeros((DECK_SIZE, len(SUITS) + 1), dtype=np.int32)
+    faces = np.flatnonzero(card_class == FACE)
+    counts[faces, suit[faces]] = 1
+    counts[card_class == JOKER, len(SUITS)] = 1
+    # Jokers are never a pip, so their NO_SUIT index is never looked up.
+    return card_class == PIP, suit, counts
+
+
+CARD_IS_PIP, CARD_SUIT, CARD_COUNTS = _card_tables()
+# A face matches a pip of the same color.
+SUIT_IS_RED = np.frombuffer(SUIT_RED, dtype=np.uint8).astype(bool)
+
+
+class SimulationResult:
+    """Histograms of press outcomes, indexed by value.
+
+    ``advantage`` is offset by MAX_FACES so index 0 is -MAX_FACES; ``xp``
+    holds one PoV XP histogram per suit in SUITS order.
+    """
+
+    def __init__(self):
+        self.presses = 0
+        self.advantage = np.zeros(2 * MAX_FACES + 1, dtype=np.int64)
+        self.face_count = np.zeros(MAX_FACES + 1, dtype=np.int64)
+        self.joker_count = np.zeros(MAX_JOKERS + 1, dtype=np.int64)
+        self.press_length = np.zeros(MAX_PRESS_LENGTH + 1, dtype=np.int64)
+        self.xp = np.zeros((len(SUITS), MAX_SUIT_XP + 1), dtype=np.int64)
+
+    def add(self, advantage, face_count, joker_count, press_length, xp):
+        self.presses += len(advantage)
+        self.advantage += np.bincount(advantage + MAX_FACES, minlength=self.advantage.size)
+        self.face_count += np.bincount(face_count, minlength=self.face_count.size)
+        self.joker_count += np.bincount(joker_count, minlength=self.joker_count.size)
+        self.press_length += np.bincount(press_length, minlength=self.press_length.size)
+        for idx in range(len(SUITS)):
+            self.xp[idx] += np.bincount(xp[:, idx], minlength=self.xp.shape[1])
+
+    def merge(self, other):
+        self.presses += other.presses
+        self.advantage += other.advantage
+        self.face_count += other.face_count
+        self.joker_count += other.joker_count
+        self.press_length += other.press_length
+        self.xp += other.xp
+        return self
+
+    def summary(self):
+        stats = {
+            "presses": self.presses,
+            "advantage": _histogram_stats(self.advantage, -MAX_FACES),
+            "face_count": _histogram_stats(self.face_count),
+            "joker_count": _histogram_stats(self.joker_count),
+            "press_length": _histogram_stats(self.press_length),
+        }
+        aspects = [skill_aspect_for_suit(suit) for suit in SUITS]
+        for idx, (suit, aspect) in enumerate(zip(SUITS, aspects)):
+            # Per suit; suits sharing an aspect are told apart by name.
+            key = f"xp_{aspect}" if aspects.count(aspect) == 1 else f"xp_{aspect}_{suit}"
+            stats[key] = _histogram_stats(self.xp[idx])
+        return stats
+
+
+def _histogram_stats(hist, offset=0):
+    total = int(hist.sum())
+    if total == 0:
+        return {"mean": 0.0, "std": 0.0, "min": None, "max": None}
+    values = np.arange(hist.size) + offset
+    mean = float((values * hist).sum() / total)
+    var = float((((values - mean) ** 2) * hist).sum() / total)
+    nonzero = np.flatnonzero(hist)
+    return {
+        "mean": mean,
+        "std": var ** 0.5,
+        "min": int(values[nonzero[0]]),
+        "max": int(values[nonzero[-1]]),
+    }
+
+
+def shuffled_decks(rng, count):
+    decks = np.broadcast_to(np.arange(DECK_SIZE, dtype=np.uint8), (count, DECK_SIZE))
+    return rng.permuted(decks, axis=1)
+
+
+def resolve_stream(stream):
+    """Resolve every complete press in a card stream.
+
+    Returns (advantage, face_count, joker_count, press_length, xp, tail)
+    where ``xp`` has one column per suit and ``tail`` holds the cards after
+    the last pip.
+    """
+    ends = np.flatnonzero(CARD_IS_PIP[stream])
+    tail = stream[ends[-1] + 1:] if ends.size else stream
+    cumulative = np.zeros((stream.size + 1, len(SUITS) + 1), dtype=np.int32)
+    np.cumsum(CARD_COUNTS[stream], axis=0, out=cumulative[1:])
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    counts = cumulative[ends + 1] - cumulative[starts]
+    faces = counts[:, : len(SUITS)]
+    jokers = counts[:, len(SUITS)]
+
+    pip_suit = CARD_SUIT[stream[ends]]
+    pip_red = SUIT_IS_RED[pip_suit]
+    red_faces = faces[:, SUIT_IS_RED].sum(axis=1)
+    black_faces = faces[:, ~SUIT_IS_RED].sum(axis=1)
+    face_count = red_faces + black_faces
+    matches = np.where(pip_red, red_faces, black_faces)
+    advantage = 2 * matches - face_count
+
+    # With a Joker in the press every face earns its suit's aspect and each
+    # Joker earns the pip suit's aspect.
+    xp = faces * (jokers > 0)[:, None]
+    xp[np.arange(ends.size), pip_suit] += jokers
+    press_length = ends - starts + 1
+    return advantage, face_count, jokers, press_length, xp, tail
+
+
+def simulate(presses, seed=None, batch_decks=4096, rng=None):
+    if rng is None:
+        rng = np.random.default_rng(seed)
+    result = SimulationResult()
+    tail = np.empty(0, dtype=np.uint8)
+    while result.presses < presses:
+        stream = np.concatenate((tail, shuffled_decks(rng, batch_decks).ravel()))
+        advantage, face_count, jokers, press_length, xp, tail = resolve_stream(stream)
+        keep = presses - result.presses
+        if keep < advantage.size:
+            advantage = advantage[:keep]
+            face_count = face_count[:keep]
+            jokers = jokers[:keep]
+            press_length = press_length[:keep]
+            xp = xp[:keep]
+        result.add(advantage, face_count, jokers, press_length, xp)
+    return result
+
+
+def _simulate_chunk(presses, seed_sequence, batch_decks):
+    return simulate(presses, batch_decks=batch_decks, rng=np.random.default_rng(seed_sequence))
+
+
+def simulate_parallel(presses, seed=None, workers=None, batch_decks=4096):
+    """Split ``presses`` across a process pool and merge the histograms.
+
+    Every worker gets its own child of ``SeedSequence(seed)``, so the same
+    seed and worker count always reproduce the same result.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    children = seed.spawn(workers)
+    chunk, extra = divmod(presses, workers)
+    chunks = [chunk + (1 if idx < extra else 0) for idx in range(workers)]
+    if workers == 1:
+        return _simulate_chunk(chunks[0], children[0], batch_decks)
+    result = SimulationResult()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for partial in pool.map(
+            _simulate_chunk, chunks, children, [batch_decks] * workers
+        ):
+            result.merge(partial)
+    return result
+
+
+def format_summary(result):
+    lines = [f"Presses: {result.presses}"]
+    for name, stats in result.summary().items():
+        if name == "presses":
+            continue
+        lines.append(
+            f"{name:>14}: mean {stats['mean']:+.4f}  std {stats['std']:.4f}"
+            f"  range {stats['min']}..{stats['max']}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate press outcomes.")
+    parser.add_argument("presses", type=int, nargs="?", default=1_000_000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--batch-decks", type=int, default=4096)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="worker processes; results are reproducible per (seed, workers)",
+    )
+    args = parser.parse_args(argv)
+    if args.presses < 0:
+        parser.error("presses must not be negative")
+    if args.batch_decks < 1:
+        parser.error("--batch-decks must be at least 1")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    result = simulate_parallel(
+        args.presses,
+        seed=args.seed,
+        workers=args.workers,
+        batch_decks=args.batch_decks,
+    )
+    print(format_summary(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Pre-rendered card face sprites.
+
+Tk cannot rasterize canvas text into a PhotoImage, so faces are rendered
+with Pillow 10.1 or later when it is installed; older releases cannot
+size the default font that stands in when DejaVu Sans is missing.
+Without Pillow (or with an older one), SpriteCache.create() returns None
+and the GUI keeps drawing cards from canvas primitives.
+"""
+import threading
+from collections import OrderedDict
+
+from engine import CARDS, card_suit_color, card_suit_symbol, card_text_color, joker_symbol
+
+MIN_PILLOW = (10, 1)
+
+try:
+    from PIL import Image, ImageDraw, ImageFont, ImageTk, __version__ as _PILLOW_VERSION
+except ImportError:
+    Image = None
+else:
+    if tuple(int(part) for part in _PILLOW_VERSION.split(".")[:2]) < MIN_PILLOW:
+        Image = None
+
+_font_cache = {}
+_font_lock = threading.Lock()
+
+
+def available():
+    return Image is not None
+
+
+def all_faces():
+    return list(CARDS)
+
+
+def _font(size):
+    with _font_lock:
+        font = _font_cache.get(size)
+        if font is None:
+            try:
+                font = ImageFont.truetype("DejaVuSans-Bold.ttf", size)
+            except OSError:
+                font = ImageFont.load_default(size)
+            _font_cache[size] = font
+        return font
+
+
+def render_card_face(rank, suit, card_width, card_height, scale=1.0, pixels_per_point=1.0):
+    """Render one face as an RGBA image matching draw_card_image().
+
+    The image is two pixels wider and taller than the card so the
+    2px border sits where Tk would draw it; place it one pixel up and
+    left of the card's corner.
+    """
+    width = round(card_width * scale)
+    height = round(card_height * scale)
+    image = Image.new("RGBA", (width + 2, height + 2), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, width + 1, height + 1), outline="#2b2b2b", width=2, fill="#f8f7f4")
+
+    left, top = 1, 1
+    right, bottom = left + width, top + height
+    center_x = (left + right) / 2
+    center_y = (top + bottom) / 2
+
+    def text(x, y, value, points, fill):
+        size = max(1, round(int(points * scale) * pixels_per_point))
+        draw.text((x, y), value, font=_font(size), fill=fill, anchor="mm")
+
+    if rank == "Joker":
+        accent = card_text_color(rank, suit)
+        symbol = joker_symbol(suit)
+        text(left + 16, top + 18, symbol, 21, accent)
+        text(right - 16, bottom - 18, symbol, 21, accent)
+        text(center_x, center_y - 12, symbol, 84, accent)
+        text(center_x, center_y + 30, f"JOKER ({suit})", 18, accent)
+        return image
+
+    symbol = card_suit_symbol(suit)
+    color = card_suit_color(suit)
+    text(left + 16, top + 18, rank, 21, color)
+    text(left + 16, top + 36, symbol, 18, color)
+    text(right - 16, bottom - 36, symbol, 18, color)
+    text(right - 16, bottom - 18, rank, 21, color)
+    text(center_x, center_y, symbol, 78, color)
+    return image
+
+
+class SpriteCache:
+    """LRU cache of card PhotoImages keyed by (rank, suit, scale).
+
+    Pillow rendering is thread-safe, so warm() can render faces on a
+    background thread; the PhotoImage conversion always happens on the Tk
+    thread when a sprite is first requested.
+    """
+
+    def __init__(self, root, card_width, card_height, maxsize=108):
+        self.root = root
+        self.card_width = card_width
+        self.card_height = card_height
+        self.maxsize = maxsize
+        self.pixels_per_point = root.winfo_fpixels("1p")
+        self.images = OrderedDict()
+        self.rendered = {}
+        self.lock = threading.Lock()
+        self.warm_thread = None
+
+    @classmethod
+    def create(cls, root, card_width, card_height, maxsize=108):
+        if not available():
+            return None
+        return cls(root, card_width, card_height, maxsize=maxsize)
+
+    def render(self, rank, suit, scale):
+        return render_card_face(
+            rank,
+            suit,
+            self.card_width,
+            self.card_height,
+            scale=scale,
+            pixels_per_point=self.pixels_per_point,
+        )
+
+    def get(self, rank, suit, scale=1.0):
+        key = (rank, suit, scale)
+        photo = self.images.get(key)
+        if photo is not None:
+            self.images.move_to_end(key)
+            return photo
+        with self.lock:
+            image = self.rendered.pop(key, None)
+        if image is None:
+            image = self.render(rank, suit, scale)
+        photo = ImageTk.PhotoImage(image, master=self.root)
+        self.images[key] = photo
+        if len(self.images) > self.maxsize:
+            self.images.popitem(last=False)
+        return photo
+
+    def promote(self, count=8):
+        """Turn up to ``count`` warmed images into PhotoImages.
+
+        Call from the Tk thread (e.g. via ``root.after``); returns True
+        while warming is still in progress or images are left to convert.
+        """
+        with self.lock:
+            keys = list(self.rendered)[:count]
+        for rank, suit, scale in keys:
+            self.get(rank, suit, scale)
+        warming = self.warm_thread is not None and self.warm_thread.is_alive()
+        with self.lock:
+            return warming or bool(self.rendered)
+
+    def warm(self, scales=(1.0,), background=True):
+        keys = [(rank, suit, scale) for scale in scales for rank, suit in all_faces()]
+        keys = keys[: self.maxsize]
+
+        def run():
+            for key in keys:
+                with self.lock:
+                    if key in self.rendered or key in self.images:
+                        continue
+                image = self.render(*key)
+                with self.lock:
+                    self.rendered[key] = image
+
+        if not background:
+            run()
+            return
+        self.warm_thread = threading.Thread(target=run, name="sprite-warm", daemon=True)
+        self.warm_thread.start()
@@ -0,0 +1,272 @@
+"""What is left in the deck and running totals for the presses so far.
+
+deck_fields() reads the remaining deck straight off its card mask (nine
+popcounts), so it costs the same however far into the deck the current
+press is. SessionStats keeps the totals for the presses from the root
+to the current node and is moved along with the timeline: a press, redo
+or reshuffle adds one node's outcome and an undo takes one away, so an
+ordinary move is O(1). Jumping to another branch walks back only to
+where the two lines meet.
+
+Both return their figures as {field: text} so a view can update only
+the fields whose text changed.
+
+PressIndex answers sums over any run of presses (Jokers in presses
+1,000-5,000, advantage over the last 200) with a Fenwick tree per
+metric. Appending or popping the newest press is amortized O(1), so it
+follows draws and undos as cheaply as the totals do, and a range sum
+reads O(log n) tree nodes however long the session is. For the same
+reason the trees only ever change at the end, so a journal saves them a
+row per press and rewrites only the rows popped since it last did.
+"""
+from array import array
+
+from engine import ASPECTS, SUIT_RED, SUITS, card_suit_symbol, resolve_press, xp_totals
+from odds import mask_counts
+
+# Count tuple slots (see odds.mask_counts) of each color's suits.
+_RED = tuple(idx for idx, red in enumerate(SUIT_RED) if red)
+_BLACK = tuple(idx for idx, red in enumerate(SUIT_RED) if not red)
+_SYMBOLS = tuple(card_suit_symbol(suit) for suit in SUITS)
+# Press lengths shown in the distribution; longer ones share the last.
+SHOWN_LENGTHS = 6
+
+DECK_FIELDS = ("left", "jokers", "faces", "pips")
+SESSION_FIELDS = ("presses", "advantage", "xp", "joker_xp", "lengths")
+# What PressIndex sums; the skill aspects are the XP earned in each.
+RANGE_METRICS = (
+    ("advantage", "face_matches", "face_mismatches", "jokers", "press_length") + ASPECTS + ("joker_xp",)
+)
+
+
+def _by_suit(counts, slots):
+    return " ".join(f"{_SYMBOLS[slot]}{counts[slot]}" for slot in slots)
+
+
+def deck_fields(mask):
+    counts = mask_counts(mask)
+    suits = len(SUITS)
+    pips = counts[:suits]
+    faces = counts[suits : 2 * suits]
+    return {
+        "left": f"Cards left: {sum(counts)}",
+        "jokers": f"Jokers: {counts[-1]}",
+        "faces": (
+            f"Faces: red {sum(faces[slot] for slot in _RED)} ({_by_suit(faces, _RED)})"
+            f" | black {sum(faces[slot] for slot in _BLACK)} ({_by_suit(faces, _BLACK)})"
+        ),
+        "pips": f"Pips: {_by_suit(pips, range(suits))}",
+    }
+
+
+class PressIndex:
+    """Fenwick trees over the press sequence, one column per metric.
+
+    Node i (1-based) of a column holds the sum over presses
+    (i - lowbit(i), i]. It depends on no later press, so popping the
+    newest press just drops its nodes, and building a node adds up the
+    nodes just below it, which is one on average.
+    """
+
+    __slots__ = ("columns", "unchanged")
+
+    def __init__(self):
+        self.columns = tuple(array("q") for _ in RANGE_METRICS)
+        # Rows not popped since the index was last saved.
+        self.unchanged = 0
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    def append(self, outcome):
+        xp, joker_xp = xp_totals(outcome.xp)
+        row = (
+            outcome.net_advantage,
+            outcome.face_matches,
+            outcome.face_mismatches,
+            outcome.joker_count,
+            outcome.press_length,
+            *xp,
+            joker_xp,
+        )
+        node = len(self) + 1
+        below = []
+        child = node - 1
+        start = node - (node & -node)
+        while child > start:
+            below.append(child - 1)
+            child &= child - 1
+        for column, value in zip(self.columns, row):
+            for slot in below:
+                value += column[slot]
+            column.append(value)
+
+    def pop(self):
+        for column in self.columns:
+            column.pop()
+        self.unchanged = min(self.unchanged, len(self))
+
+    def clear(self):
+        self.__init__()
+
+    def rows(self, first=0):
+        """Tree nodes from press ``first`` (0-based) on, one row per press."""
+        width = len(self.columns)
+        flat = array("q", bytes(8 * width * (len(self) - first)))
+        for slot, column in enumerate(self.columns):
+            flat[slot::width] = column[first:]
+        return flat
+
+    @classmethod
+    def from_rows(cls, flat):
+        """Rebuild an index from its rows(); they count as saved."""
+        index = cls()
+        width = len(index.columns)
+        index.columns = tuple(flat[slot::width] for slot in range(width))
+        index.unchanged = len(index)
+        return index
+
+    def _prefix(self, column, end):
+        total = 0
+        while end:
+            total += column[end - 1]
+            end &= end - 1
+        return total
+
+    def sum(self, metric, first, last):
+        """Sum of ``metric`` over presses ``first`` to ``last`` (1-based)."""
+        if not 1 <= first <= last <= len(self):
+            raise IndexError(f"presses {first}-{last} are not in this session")
+        column = self.columns[RANGE_METRICS.index(metric)]
+        return self._prefix(column, last) - self._prefix(column, first - 1)
+
+    def range(self, first, last):
+        """{metric: sum} over presses ``first`` to ``last``, plus "presses"."""
+        if not 1 <= first <= last <= len(self):
+            raise IndexError(f"presses {first}-{last} are not in this session")
+        prefix = self._prefix
+        totals = {"presses": last - first + 1}
+        for metric, column in zip(RANGE_METRICS, self.columns):
+            totals[metric] = prefix(column, last) - prefix(column, first - 1)
+        return totals
+
+
+class SessionStats:
+    def __init__(self):
+        # Node the totals run up to; None until the first follow().
+        self.node = None
+        self.presses = 0
+        self.advantage = 0
+        self.xp = dict.fromkeys(ASPECTS, 0)
+        self.joker_xp = 0
+        # Press length -> presses of that length.
+        self.lengths = {}
+        # The same presses, oldest first, for range sums.
+        self.index = PressIndex()
+
+    def add(self, outcome, sign=1):
+        self.presses += sign
+        self.advantage += sign * outcome.net_advantage
+        if outcome.xp:
+            amounts, joker_xp = xp_totals(outcome.xp)
+            xp = self.xp
+            for aspect, amount in zip(ASPECTS, amounts):
+                xp[aspect] += sign * amount
+            self.joker_xp += sign * joker_xp
+        lengths = self.lengths
+        count = lengths.get(outcome.press_length, 0) + sign
+        if count:
+            lengths[outcome.press_length] = count
+        else:
+            del lengths[outcome.press_length]
+        if sign > 0:
+            self.index.append(outcome)
+        else:
+            self.index.pop()
+
+    def follow(self, timeline):
+        """Move the totals to ``timeline.current``."""
+        current = timeline.current
+        node = self.node
+        if current is node:
+            return
+        if node is not None and current.parent is node:
+            if current.cards:
+                self.add(current.outcome)
+        elif node is not None and node.parent is current:
+            if node.cards:
+                self.add(node.outcome, -1)
+        elif node is not None:
+            self.switch(timeline, node, current)
+        else:
+            self.recount(timeline)
+        self.node = current
+
+    def switch(self, timeline, node, current):
+        """Move the totals from ``node`` to ``current`` on another branch.
+
+        Only the presses after the two lines' common ancestor change: the
+        old line's are subtracted newest first and the new line's added
+        oldest first, so the index stays in line order.
+        """
+        old_steps = timeline.steps_from_root(node)
+        new_steps = timeline.steps_from_root(current)
+        added = []
+        while new_steps > old_steps:
+            added.append(current)
+            current = current.parent
+            new_steps -= 1
+        while old_steps > new_steps:
+            if node.cards:
+                self.add(node.outcome, -1)
+            node = node.parent
+            old_steps -= 1
+        while node is not current:
+            if node.cards:
+                self.add(node.outcome, -1)
+            node = node.parent
+            added.append(current)
+            current = current.parent
+        for node in reversed(added):
+            if node.cards:
+                self.add(node.outcome)
+
+    def recount(self, timeline):
+        self.__init__()
+        # line_presses() runs newest first; the index wants oldest first.
+        for cards in reversed(list(timeline.line_presses())):
+            self.add(resolve_press(cards))
+
+    def rebind(self, node):
+        """Take over ``node`` as the current node of an equal line."""
+        self.node = node
+
+    def totals(self):
+        """(presses, advantage, XP per aspect, Joker XP, lengths), for restore()."""
+        return self.presses, self.advantage, tuple(self.xp.values()), self.joker_xp, dict(self.lengths)
+
+    def restore(self, node, totals, index):
+        """Take over totals() and the PressIndex saved for the line up to ``node``."""
+        self.presses, self.advantage, xp, self.joker_xp, lengths = totals
+        self.xp = dict(zip(ASPECTS, xp))
+        self.lengths = dict(lengths)
+        self.index = index
+        self.node = node
+
+    def fields(self):
+        presses = self.presses
+        if not presses:
+            return dict.fromkeys(SESSION_FIELDS, "")
+        lengths = self.lengths
+        shown = [
+            f"{length}: {lengths.get(length, 0) / presses:.0%}" for length in range(1, SHOWN_LENGTHS)
+        ]
+        longer = sum(count for length, count in lengths.items() if length >= SHOWN_LENGTHS)
+        shown.append(f"{SHOWN_LENGTHS}+: {longer / presses:.0%}")
+        return {
+            "presses": f"Presses: {presses}",
+            "advantage": f"Mean advantage: {self.advantage / presses:+.2f}",
+            "xp": "XP: " + ", ".join(f"{aspect} {amount}" for aspect, amount in self.xp.items()),
+            "joker_xp": f"Joker XP: {self.joker_xp}",
+            "lengths": "Press length: " + "  ".join(shown),
+        }
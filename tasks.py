@@ -0,0 +1,151 @@
+"""Background tasks for the GUI, delivered back on the Tk thread.
+
+    runner = TaskRunner(root, on_busy=show_progress)
+    runner.submit("odds", compute_odds, mask, on_done=show_odds)
+
+Work runs on a thread pool and results come back through a queue that
+the Tk thread drains with root.after, at most once per frame (16 ms) and
+only while something is in flight, so the mainloop never waits on a
+task. Every task has a key and submitting a new task under a key cancels
+the one before it: a draw makes the odds for the previous deck stale, so
+its result is dropped even if it is already running.
+
+The task function is called as fn(task, *args). Long work should call
+task.report(fraction) now and then; report() raises Cancelled once the
+task is stale, which is how running work stops early. Within one frame
+only a task's latest progress (or its result) is delivered.
+
+Pure Python work holds the GIL, so a worker thread slows the Tk thread
+by at most a switch interval (5 ms) at a time; work big enough to matter
+more than that belongs in a process pool, as simulate.py does.
+"""
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+import telemetry
+
+FRAME_MS = 16
+
+_PROGRESS = 0
+_DONE = 1
+_ERROR = 2
+
+
+class Cancelled(Exception):
+    """Raised inside a task by report() once the task has gone stale."""
+
+
+class Task:
+    __slots__ = ("key", "results", "cancelled", "progress", "future", "on_done", "on_error")
+
+    def __init__(self, key, results, on_done=None, on_error=None):
+        self.key = key
+        self.results = results
+        self.cancelled = False
+        # Last fraction reported, or None if the task reports none.
+        self.progress = None
+        self.future = None
+        self.on_done = on_done
+        self.on_error = on_error
+
+    def cancel(self):
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+    def report(self, fraction):
+        """Publish progress from the worker; raises Cancelled if stale."""
+        if self.cancelled:
+            raise Cancelled
+        self.results.put((self, _PROGRESS, fraction))
+
+
+def _run(task, fn, args):
+    if task.cancelled:
+        return
+    try:
+        with telemetry.tracer.span(f"task.{task.key}"):
+            value = fn(task, *args)
+    except Cancelled:
+        return
+    except Exception as exc:
+        task.results.put((task, _ERROR, exc))
+    else:
+        task.results.put((task, _DONE, value))
+
+
+class TaskRunner:
+    def __init__(self, root, workers=1, on_busy=None, frame_ms=FRAME_MS):
+        self.root = root
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="goe-task")
+        self.results = queue.SimpleQueue()
+        # The live task per key; anything else still running is stale.
+        self.tasks = {}
+        # on_busy(count, progress) after each delivery: tasks in flight and
+        # their mean reported progress (None if none has reported).
+        self.on_busy = on_busy
+        self.frame_ms = frame_ms
+        self.poll_id = None
+
+    def submit(self, key, fn, *args, on_done=None, on_error=None):
+        """Run fn(task, *args) in the background, replacing ``key``'s task."""
+        self.cancel(key)
+        task = Task(key, self.results, on_done, on_error)
+        self.tasks[key] = task
+        task.future = self.executor.submit(_run, task, fn, args)
+        # on_busy first hears of it a frame later, so work that finishes
+        # within a frame never flashes the progress indicator.
+        if self.poll_id is None:
+            self.poll_id = self.root.after(self.frame_ms, self.poll)
+        return task
+
+    def cancel(self, key):
+        task = self.tasks.pop(key, None)
+        if task is not None:
+            task.cancel()
+
+    def busy(self):
+        if self.on_busy is None:
+            return
+        reported = [task.progress for task in self.tasks.values() if task.progress is not None]
+        self.on_busy(len(self.tasks), sum(reported) / len(reported) if reported else None)
+
+    def poll(self):
+        self.poll_id = None
+        # Coalesce everything queued since the last frame: a result
+        # supersedes progress and later progress supersedes earlier.
+        latest = {}
+        while True:
+            try:
+                task, kind, value = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if self.tasks.get(task.key) is not task:
+                continue
+            if kind == _PROGRESS:
+                task.progress = value
+            else:
+                latest[task] = (kind, value)
+        for task, (kind, value) in latest.items():
+            # An earlier callback may have replaced this task already.
+            if self.tasks.get(task.key) is not task:
+                continue
+            del self.tasks[task.key]
+            if kind == _DONE:
+                if task.on_done is not None:
+                    task.on_done(value)
+            elif task.on_error is not None:
+                task.on_error(value)
+            else:
+                self.root.report_callback_exception(type(value), value, value.__traceback__)
+        if self.tasks and self.poll_id is None:
+            self.poll_id = self.root.after(self.frame_ms, self.poll)
+        self.busy()
+
+    def close(self):
+        for key in list(self.tasks):
+            self.cancel(key)
+        if self.poll_id is not None:
+            self.root.after_cancel(self.poll_id)
+            self.poll_id = None
+        self.executor.shutdown(wait=False, cancel_futures=True)
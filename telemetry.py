@@ -0,0 +1,190 @@
+"""Opt-in timing spans and counters for the hot paths.
+
+Off by default: ``tracer`` is a NullTracer whose span() hands back one
+shared do-nothing context manager, so instrumented code pays for a
+method call and nothing else. enable() (or GOE_TRACE=path in the
+environment, see from_environment()) swaps in a Tracer.
+
+A Tracer keeps the last ``capacity`` spans in a preallocated ring. A slot
+is claimed with next() on an itertools.count, which is atomic under the
+GIL, so any thread can record without a lock; a reader racing a writer
+may see one half-written slot. summary() aggregates the ring per span
+name and write_chrome_trace() exports it as Chrome trace-event JSON for
+chrome://tracing or Perfetto.
+
+Callers look up ``telemetry.tracer`` at call time, not at import, so
+enabling later takes effect everywhere.
+"""
+import itertools
+import json
+import os
+import threading
+from array import array
+from time import perf_counter_ns
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class NullTracer:
+    enabled = False
+
+    def span(self, name):
+        return _NULL_SPAN
+
+    def count(self, name, amount=1):
+        pass
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "start")
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.start, perf_counter_ns())
+        return False
+
+
+class Tracer:
+    enabled = True
+
+    def __init__(self, capacity=65_536):
+        self.capacity = capacity
+        self.names = [None] * capacity
+        self.starts = array("q", bytes(8 * capacity))
+        self.durations = array("q", bytes(8 * capacity))
+        self.threads = array("q", bytes(8 * capacity))
+        self._slots = itertools.count()
+        self.written = 0
+        self.counters = {}
+        # (timestamp, counters) pairs taken by summary() for the trace.
+        self.counter_samples = []
+        self.epoch = perf_counter_ns()
+
+    def span(self, name):
+        return _Span(self, name)
+
+    def record(self, name, start, end):
+        seq = next(self._slots)
+        idx = seq % self.capacity
+        self.names[idx] = name
+        self.starts[idx] = start
+        self.durations[idx] = end - start
+        self.threads[idx] = threading.get_native_id()
+        self.written = seq + 1
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def spans(self):
+        """Yield (name, start_ns, duration_ns, thread) oldest first."""
+        written = self.written
+        first = max(0, written - self.capacity)
+        for seq in range(first, written):
+            idx = seq % self.capacity
+            yield self.names[idx], self.starts[idx], self.durations[idx], self.threads[idx]
+
+    def summary(self):
+        """Per span name: count, total, mean, p50, p99 and max in ns."""
+        durations = {}
+        for name, _, duration, _ in self.spans():
+            durations.setdefault(name, []).append(duration)
+        stats = {}
+        for name, values in durations.items():
+            values.sort()
+            total = sum(values)
+            stats[name] = {
+                "count": len(values),
+                "total": total,
+                "mean": total // len(values),
+                "p50": values[len(values) // 2],
+                "p99": values[min(len(values) - 1, len(values) * 99 // 100)],
+                "max": values[-1],
+            }
+        self.counter_samples.append((perf_counter_ns(), dict(self.counters)))
+        return stats
+
+    def format_summary(self):
+        lines = []
+        for name, stat in sorted(self.summary().items()):
+            lines.append(
+                f"{name:>24}: n {stat['count']:>6}  mean {stat['mean'] / 1e3:9.1f}us"
+                f"  p50 {stat['p50'] / 1e3:9.1f}us  p99 {stat['p99'] / 1e3:9.1f}us"
+                f"  max {stat['max'] / 1e3:9.1f}us"
+            )
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name:>24}: {value}")
+        return "\n".join(lines)
+
+    def chrome_trace(self):
+        pid = os.getpid()
+        events = [
+            {
+                "name": name,
+                "ph": "X",
+                "ts": (start - self.epoch) / 1e3,
+                "dur": duration / 1e3,
+                "pid": pid,
+                "tid": thread,
+            }
+            for name, start, duration, thread in self.spans()
+        ]
+        samples = self.counter_samples + [(perf_counter_ns(), dict(self.counters))]
+        for timestamp, counters in samples:
+            for name, value in counters.items():
+                events.append(
+                    {
+                        "name": name,
+                        "ph": "C",
+                        "ts": (timestamp - self.epoch) / 1e3,
+                        "pid": pid,
+                        "args": {name: value},
+                    }
+                )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(self.chrome_trace(), handle)
+        os.replace(tmp_path, path)
+
+
+tracer = NullTracer()
+
+
+def enable(capacity=65_536):
+    global tracer
+    if not tracer.enabled:
+        tracer = Tracer(capacity)
+    return tracer
+
+
+def disable():
+    global tracer
+    tracer = NullTracer()
+
+
+def from_environment():
+    """Enable tracing if GOE_TRACE names a trace file; returns that path."""
+    path = os.environ.get("GOE_TRACE")
+    if path:
+        enable(int(os.environ.get("GOE_TRACE_CAPACITY", 65_536)))
+    return path
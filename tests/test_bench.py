@@ -0,0 +1,18 @@
+from bench import compare
+
+BASE = {"op": {"relative": 1.0, "alloc_bytes_per_op": 600.0, "tcl_calls_per_op": 4.0}}
+
+
+def result(relative=1.0, alloc=600.0, calls=4.0):
+    return {"op": {"relative": relative, "alloc_bytes_per_op": alloc, "tcl_calls_per_op": calls}}
+
+
+def test_times_are_only_gated_on_request():
+    assert compare(result(relative=3.0), BASE, 0.1) == []
+    assert compare(result(relative=3.0), BASE, 0.1, time_tolerance=0.5)
+
+
+def test_allocations_and_tcl_calls_are_gated():
+    assert compare(result(alloc=620.0), BASE, 0.1) == []
+    assert compare(result(alloc=900.0), BASE, 0.1)
+    assert compare(result(calls=4.5), BASE, 0.1)
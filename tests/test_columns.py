@@ -0,0 +1,104 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import columns
+from engine import Session, resolve_press
+from rngs import make_rng
+
+np = pytest.importorskip("numpy")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The built-in deck with one skill aspect renamed past the 16 bytes the
+# version 1 header had for a column name.
+LONG_ASPECT_RULES = {
+    "suits": [
+        {"name": "Clubs", "symbol": "♣", "color": "black", "meaning": "Intuition", "aspect": "Focus"},
+        {"name": "Diamonds", "symbol": "♦", "color": "red", "meaning": "Perception", "aspect": "Technique"},
+        {"name": "Hearts", "symbol": "♥", "color": "red", "meaning": "Relationship", "aspect": "Tactics"},
+        {"name": "Spades", "symbol": "♠", "color": "black", "meaning": "Planning", "aspect": "Understanding and Planning"},
+    ],
+}
+
+
+def _expected(presses, seed, decks, penetration):
+    session = Session(make_rng("random", seed), decks, penetration)
+    return [session.draw_press() for _ in range(presses)]
+
+
+@pytest.mark.parametrize("cache", [None, False])
+def test_draws_round_trip(tmp_path, cache):
+    path = str(tmp_path / "draws.goec")
+    for _ in range(2):
+        with columns.ColumnWriter(path, chunk_presses=700) as writer:
+            columns.export_draws(writer, 2000, seed=3, decks=2, penetration=0.75)
+    presses = _expected(2000, 3, 2, 0.75) * 2
+    outcomes = [resolve_press(cards) for cards in presses]
+    reader = columns.ColumnReader(path, cache=cache)
+    assert len(reader) == len(presses)
+    assert reader.column("cards").tobytes() == b"".join(bytes(cards) for cards in presses)
+    assert reader.column("press_length").tolist() == [len(cards) for cards in presses]
+    assert reader.column("advantage").tolist() == [outcome.net_advantage for outcome in outcomes]
+    assert reader.column("jokers").tolist() == [outcome.joker_count for outcome in outcomes]
+    joker_xp = [sum(amount for _, amount, from_joker in outcome.xp if from_joker) for outcome in outcomes]
+    assert reader.column("joker_xp").tolist() == joker_xp
+    offsets = reader.offsets()
+    assert offsets[-1] == reader.card_count
+    totals = reader.summary()
+    assert totals["sessions"] == 2
+    assert totals["advantage"] == sum(outcome.net_advantage for outcome in outcomes)
+    assert os.path.isdir(f"{path}.cols") == (cache is None)
+    reader.remove_cache()
+    assert not os.path.exists(f"{path}.cols")
+
+
+def _run_with_rules(rules, tmp_path, *args):
+    rules_path = tmp_path / "rules.json"
+    rules_path.write_text(json.dumps(rules))
+    env = {**os.environ, "GOE_RULES": str(rules_path), "PYTHONPATH": ROOT}
+    subprocess.run(
+        [sys.executable, os.path.join(ROOT, "columns.py"), *args],
+        env=env,
+        cwd=ROOT,
+        capture_output=True,
+        check=True,
+    )
+
+
+def test_long_column_names_and_rules_fingerprint(tmp_path):
+    path = tmp_path / "variant.goec"
+    _run_with_rules(LONG_ASPECT_RULES, tmp_path, "draw", "50", str(path), "--seed", "1")
+    data = path.read_bytes()
+    _, _, count, _ = columns.HEADER.unpack_from(data)
+    offset = columns.HEADER.size
+    names = []
+    for _ in range(count):
+        length, _ = columns.COLUMN.unpack_from(data, offset)
+        offset += columns.COLUMN.size
+        names.append(data[offset : offset + length].decode())
+        offset += length
+    assert "xp_understanding and planning" in names
+    with pytest.raises(ValueError, match="different rules"):
+        columns.ColumnReader(str(path))
+    with pytest.raises(ValueError, match="different rules"):
+        columns.ColumnWriter(str(path))
+
+
+def test_summary_piped_to_a_closed_reader(tmp_path):
+    path = str(tmp_path / "draws.goec")
+    with columns.ColumnWriter(path) as writer:
+        columns.export_draws(writer, 100, seed=1)
+    summary = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "columns.py"), "summary", path, "--json", "--no-cache"],
+        cwd=ROOT,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    summary.stdout.close()
+    assert b"Traceback" not in summary.stderr.read()
+    summary.wait()
+    assert not os.path.exists(f"{path}.cols")
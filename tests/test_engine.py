@@ -0,0 +1,143 @@
+import random
+
+import pytest
+
+from engine import CARD_IDS, CARDS, Session, outcome_lines, resolve_press
+
+# The resolution rules as they stood in the original Tk draw_card()
+# closure, on (rank, suit) strings, kept as the reference the id-based
+# engine must reproduce.
+_SUITS = ["Clubs", "Diamonds", "Hearts", "Spades"]
+_RANKS = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]
+_PIP_RANKS = {"A", "2", "3", "4", "5", "6", "7", "8", "9", "10"}
+_MEANINGS = {
+    "Clubs": "Intuition/Motivation (Internal State)",
+    "Diamonds": "Perception/Actions (Performance)",
+    "Hearts": "Relationship/Manuver (Tactics)",
+    "Spades": "Understanding/Planning (Stratgy)",
+}
+_ASPECTS = {"Clubs": "Focus", "Diamonds": "Technique", "Hearts": "Tactics", "Spades": "Strategy"}
+
+
+def _original_deck():
+    deck = [(rank, suit) for suit in _SUITS for rank in _RANKS]
+    deck.append(("Joker", "Red"))
+    deck.append(("Joker", "Black"))
+    return deck
+
+
+def _color(rank, suit):
+    if rank == "Joker":
+        return "Red" if suit == "Red" else "Black"
+    return "Red" if suit in ("Hearts", "Diamonds") else "Black"
+
+
+def _original_lines(drawn_cards):
+    last_rank, last_suit = drawn_cards[-1]
+    pip_color = _color(last_rank, last_suit)
+    face_matches = 0
+    face_mismatches = 0
+    face_count = 0
+    joker_count = 0
+    for rank, suit in drawn_cards:
+        if rank in {"J", "Q", "K"}:
+            face_count += 1
+            if _color(rank, suit) == pip_color:
+                face_matches += 1
+            else:
+                face_mismatches += 1
+        elif rank == "Joker":
+            joker_count += 1
+    net_advantage = face_matches - face_mismatches
+    outcome_parts = []
+    adv = ""
+    xp = ""
+    if face_count > 0:
+        if net_advantage > 0:
+            adv = f"Advantage: +{net_advantage}"
+            outcome_parts.append(f"Advantage +{net_advantage}")
+        elif net_advantage < 0:
+            adv = f"Disadvantage: {net_advantage}"
+            outcome_parts.append(f"Disadvantage {net_advantage}")
+        else:
+            adv = "Adv/Dis: Neutral (0)"
+            outcome_parts.append("Neutral (0)")
+    xp_parts = []
+    if joker_count > 0:
+        suit_counts = {"Clubs": 0, "Diamonds": 0, "Hearts": 0, "Spades": 0}
+        for rank, suit in drawn_cards:
+            if rank in {"J", "Q", "K"}:
+                suit_counts[suit] += 1
+        for suit, count in suit_counts.items():
+            if count > 0:
+                xp_parts.append(f"+{count} {_ASPECTS[suit]}")
+        xp_parts.append(f"+{joker_count} {_ASPECTS[last_suit]} (Joker)")
+    if xp_parts:
+        xp = "PoV XP: " + ", ".join(xp_parts)
+        outcome_parts.append("PoV XP " + ", ".join(xp_parts))
+    if not outcome_parts:
+        outcome_parts.append("Neutral (0)")
+    return (
+        f"{last_rank} of {last_suit}",
+        f"Suit Meaning: {_MEANINGS[last_suit]}",
+        "Outcome: " + " | ".join(outcome_parts),
+        adv,
+        xp,
+    )
+
+
+def _original_presses(rng, count):
+    # draw_card()'s loop: pop until a pip, reshuffling an empty deck.
+    deck = []
+    for _ in range(count):
+        drawn_cards = []
+        while True:
+            if not deck:
+                deck = _original_deck()
+                rng.shuffle(deck)
+            rank, suit = deck.pop()
+            drawn_cards.append((rank, suit))
+            if rank in _PIP_RANKS:
+                break
+        yield drawn_cards
+
+
+def test_unreplayable_backend_cannot_be_seeded():
+    with pytest.raises(ValueError):
+        Session(seed=1, backend="secrets")
+
+
+@pytest.mark.skipif(CARDS != tuple(_original_deck()), reason="GOE_RULES names a variant deck")
+def test_resolution_matches_the_original_string_cards():
+    for seed in range(5):
+        for drawn_cards in _original_presses(random.Random(seed), 20000):
+            outcome = resolve_press([CARD_IDS[card] for card in drawn_cards])
+            assert outcome_lines(outcome) == _original_lines(drawn_cards), drawn_cards
+            assert outcome.press_length == len(drawn_cards)
+
+
+def test_seek_matches_a_full_replay():
+    moves = random.Random(6)
+    session = Session(decks=2, penetration=0.75, seed=21)
+    # (cards, cycle, position) of each press still in the session, as
+    # the shoe stood right after it was drawn.
+    played = []
+    for _ in range(2000):
+        if played and moves.random() < 0.2:
+            session.undo()
+            played.pop()
+        else:
+            cards, _ = session.press()
+            played.append((tuple(cards), session.deck.cycle, session.deck.dealt))
+    assert len(played) == len(session.batches)
+    for number, (cards, cycle, position) in enumerate(played, 1):
+        found = session.seek(number)
+        assert (found.cards, found.cycle, found.position) == (cards, cycle, position)
+        assert found.outcome == resolve_press(cards)
+    # The rest of the shoe is what seek() reports after the last press.
+    deck = session.deck
+    rest = bytes(deck.draw() for _ in range(deck.remaining))
+    assert rest == bytes(session.seek(len(played)).deck)
+    for number in (0, len(played) + 1):
+        with pytest.raises(IndexError):
+            session.seek(number)
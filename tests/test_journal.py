@@ -0,0 +1,190 @@
+import json
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+import journal
+from stats import SessionStats
+from timeline import MATERIALIZE_CHUNK, TimelineNode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Two suits of one pip and twelve faces each, plus the Jokers: 26 of a
+# deck's 28 cards are non-pips, so presses often run past one record.
+LONG_PRESS_RULES = {
+    "suits": [
+        {"name": "Hearts", "symbol": "♥", "color": "red", "meaning": "Tactics", "aspect": "Tactics"},
+        {"name": "Spades", "symbol": "♠", "color": "black", "meaning": "Strategy", "aspect": "Strategy"},
+    ],
+    "ranks": ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"],
+    "faces": ["2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"],
+}
+
+LONG_PRESS_SCRIPT = """
+import random, sys
+import journal
+timeline, log = journal.open_session(sys.argv[1], random.Random(5))
+longest = 0
+while longest <= journal.PAYLOAD:
+    longest = max(longest, len(timeline.press().cards))
+log.close()
+line = timeline.line()
+loaded = journal.load(sys.argv[1], use_snapshot=False)
+print(loaded.line() == line)
+"""
+
+
+def line_bytes(timeline):
+    segments, back = timeline.line()
+    return [(reshuffle, bytes(stream), drawn, presses) for reshuffle, stream, drawn, presses in segments], back
+
+
+def play(timeline, moves, steps):
+    for _ in range(steps):
+        roll = moves.random()
+        if roll < 0.6:
+            timeline.press()
+        elif roll < 0.65:
+            timeline.reshuffle()
+        elif roll < 0.8:
+            timeline.undo()
+        elif roll < 0.9:
+            timeline.redo()
+        else:
+            timeline.checkout(moves.choice(timeline.branches()))
+
+
+@pytest.mark.parametrize("use_snapshot", [True, False])
+def test_journal_round_trip(tmp_path, use_snapshot):
+    path = str(tmp_path / "session.goej")
+    moves = random.Random(8)
+    timeline, log = journal.open_session(path, random.Random(8), sync_every=16, snapshot_every=100)
+    play(timeline, moves, 700)
+    log.close()
+    loaded = journal.load(path, use_snapshot=use_snapshot)
+    assert line_bytes(loaded) == line_bytes(timeline)
+    assert loaded.current.serial == timeline.current.serial
+    if not use_snapshot:
+        # A full replay rebuilds the side branches as well.
+        assert sorted(node.serial for node in loaded.branches()) == sorted(
+            node.serial for node in timeline.branches()
+        )
+
+    # Reopening carries on logging to the same journal.
+    timeline, log = journal.open_session(path, random.Random(9), sync_every=16, snapshot_every=100)
+    play(timeline, moves, 300)
+    log.close()
+    assert line_bytes(journal.load(path, use_snapshot=use_snapshot)) == line_bytes(timeline)
+
+
+def test_snapshots_fold_the_line(tmp_path):
+    path = str(tmp_path / "session.goej")
+    timeline, log = journal.open_session(path, random.Random(3), snapshot_every=500)
+    for _ in range(5000):
+        timeline.press()
+    log.close()
+    # Each snapshot compacted the line first, so only the presses since
+    # the one before the last are still nodes for line() to walk.
+    node = timeline.current
+    built = 0
+    while type(node) is TimelineNode:
+        built += 1
+        node = node._parent
+    assert built <= MATERIALIZE_CHUNK + 500
+    assert line_bytes(journal.load(path)) == line_bytes(timeline)
+    assert line_bytes(journal.load(path, use_snapshot=False)) == line_bytes(timeline)
+
+
+def stats_totals(stats):
+    return stats.totals(), stats.index.columns
+
+
+def recounted(timeline):
+    stats = SessionStats()
+    stats.recount(timeline)
+    return stats_totals(stats)
+
+
+def test_snapshot_restores_session_stats_without_a_recount(tmp_path, monkeypatch):
+    path = str(tmp_path / "session.goej")
+    moves = random.Random(11)
+
+    def play_line(timeline, steps):
+        # No branch switches, so load() never falls back to a full replay.
+        for _ in range(steps):
+            roll = moves.random()
+            if roll < 0.7:
+                timeline.press()
+            elif roll < 0.73:
+                timeline.reshuffle()
+            elif roll < 0.9:
+                timeline.undo()
+            else:
+                timeline.redo()
+
+    stats = SessionStats()
+    timeline, log = journal.open_session(path, random.Random(11), snapshot_every=300, stats=stats)
+    play_line(timeline, 1000)
+    log.close()
+    stats.follow(timeline)
+    expected = recounted(timeline)
+    assert stats_totals(stats) == expected
+
+    def no_recount(self, timeline):
+        raise AssertionError("recounted every press")
+
+    with monkeypatch.context() as patched:
+        patched.setattr(SessionStats, "recount", no_recount)
+        loaded_stats = SessionStats()
+        loaded = journal.load(path, stats=loaded_stats)
+        assert loaded_stats.node is loaded.current
+        assert stats_totals(loaded_stats) == expected
+
+        # Reopening rewrites only the index rows that changed since.
+        stats = SessionStats()
+        timeline, log = journal.open_session(path, random.Random(12), snapshot_every=300, stats=stats)
+        play_line(timeline, 1000)
+        log.close()
+        stats.follow(timeline)
+        loaded_stats = SessionStats()
+        journal.load(path, stats=loaded_stats)
+    assert stats_totals(loaded_stats) == stats_totals(stats) == recounted(timeline)
+
+    # An index the snapshot does not match, as after a crash between
+    # the two writes, is recounted instead.
+    with open(journal.index_path(path), "r+b") as handle:
+        handle.write(journal.INDEX_HEADER.pack(journal.INDEX_MAGIC, journal.INDEX_VERSION, 0, 0))
+    loaded_stats = SessionStats()
+    journal.load(path, stats=loaded_stats)
+    assert stats_totals(loaded_stats) == stats_totals(stats)
+
+
+def run_with_rules(rules, path, *args):
+    rules_path = path.with_suffix(".rules.json")
+    rules_path.write_text(json.dumps(rules))
+    env = {**os.environ, "GOE_RULES": str(rules_path), "PYTHONPATH": ROOT}
+    return subprocess.run(
+        [sys.executable, "-c", LONG_PRESS_SCRIPT, *args],
+        env=env,
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+
+
+def test_presses_longer_than_a_record_round_trip(tmp_path):
+    path = tmp_path / "long.goej"
+    assert run_with_rules(LONG_PRESS_RULES, path, str(path)).strip() == "True"
+
+
+def test_journal_cannot_be_opened_under_other_rules(tmp_path):
+    path = tmp_path / "variant.goej"
+    run_with_rules(LONG_PRESS_RULES, path, str(path))
+    with pytest.raises(ValueError, match="different rules"):
+        journal.load(str(path))
+    with pytest.raises(ValueError, match="different rules"):
+        journal.Journal(str(path))
@@ -0,0 +1,17 @@
+from loadgen import compare
+
+
+def _report(errors=0, rate=1000.0, p50=1.0, p99=5.0):
+    return {"errors": errors, "actions_per_second": rate, "latency_ms": {"p50": p50, "p99": p99}}
+
+
+def test_timings_only_gate_with_a_tolerance():
+    slow = _report(rate=500.0, p50=3.0, p99=20.0)
+    assert compare(slow, _report()) == []
+    assert len(compare(slow, _report(), time_tolerance=0.1)) == 3
+    assert compare(_report(rate=950.0, p50=1.05), _report(), time_tolerance=0.1) == []
+
+
+def test_new_errors_always_fail():
+    assert compare(_report(errors=2), _report(errors=1)) == ["errors 2 vs 1"]
+    assert compare(_report(errors=1), _report(errors=1)) == []
@@ -0,0 +1,62 @@
+import random
+from fractions import Fraction
+
+from engine import CARD_CLASS, CARD_COUNT, CARD_SUIT, FACE, FULL_MASK, JOKER, PIP, PIP_MASK, SUIT_RED, SUITS
+from odds import FRESH_COUNTS, mask_counts, mask_press_odds, outcome_weights
+
+
+def test_weights_sum_to_the_denominator():
+    # A fresh deck, a part-drawn one and one with no pips left, which
+    # carries on into a fresh deck.
+    first_pip = CARD_CLASS.index(PIP)
+    for mask in (FULL_MASK, FULL_MASK & ~(1 << first_pip), FULL_MASK & ~PIP_MASK):
+        weights, denominator = outcome_weights(mask_counts(mask))
+        assert sum(weight for _, weight in weights) == denominator
+
+
+def test_only_the_fresh_enumeration_is_kept():
+    assert outcome_weights(FRESH_COUNTS) is outcome_weights(FRESH_COUNTS)
+    odds = mask_press_odds(FULL_MASK)
+    assert sum(odds.press_length.values()) == 1
+    assert mask_press_odds(FULL_MASK) is odds
+
+
+def _enumerated_odds(mask):
+    # The odds summed straight off the full outcome enumeration.
+    weights, denominator = outcome_weights(mask_counts(mask))
+    sums = ({}, {}, {}, {}, [0], [0])
+    for (pip_suit, faces, jokers, length), weight in weights:
+        balance = sum(count if red else -count for count, red in zip(faces, SUIT_RED))
+        xp = (0,) * len(SUITS)
+        if jokers:
+            xp = tuple(count + jokers * (suit == pip_suit) for suit, count in enumerate(faces))
+        keys = (balance if SUIT_RED[pip_suit] else -balance, xp, length, SUITS[pip_suit])
+        for total, key in zip(sums, keys):
+            total[key] = total.get(key, 0) + weight
+        sums[4][0] += weight * any(faces)
+        sums[5][0] += weight * bool(jokers)
+    return tuple(
+        {key: Fraction(value, denominator) for key, value in total.items()}
+        if isinstance(total, dict)
+        else Fraction(total[0], denominator)
+        for total in sums
+    )
+
+
+def test_class_sums_match_the_enumeration():
+    rng = random.Random(3)
+    jokers = sum(1 << card for card in range(CARD_COUNT) if CARD_CLASS[card] == JOKER)
+    red_faces = sum(
+        1 << card for card in range(CARD_COUNT) if CARD_CLASS[card] == FACE and SUIT_RED[CARD_SUIT[card]]
+    )
+    # Part-drawn decks, and ones with no pips left, with and without
+    # Jokers, whose press carries on into a fresh deck.
+    masks = [FULL_MASK & ~PIP_MASK, FULL_MASK & ~PIP_MASK & ~jokers, red_faces, red_faces | jokers]
+    for _ in range(40):
+        mask = FULL_MASK
+        for card in rng.sample(range(CARD_COUNT), rng.randrange(1, CARD_COUNT)):
+            mask &= ~(1 << card)
+        masks.append(mask)
+    masks.append(mask & ~PIP_MASK or jokers)
+    for mask in masks:
+        assert tuple(mask_press_odds(mask)) == _enumerated_odds(mask)
@@ -0,0 +1,51 @@
+import pytest
+
+import cli
+import columns
+from rngs import BACKENDS, SEEDABLE, _BufferedRandom, make_rng
+
+
+def test_buffered_random_needs_a_refill():
+    with pytest.raises(NotImplementedError, match="_refill"):
+        _BufferedRandom().random()
+
+
+def test_pcg64_bulk_picks_replay_and_stay_in_bounds():
+    # Descending runs as a shoe deals them, broken by off-run calls and
+    # a state save part way through.
+    bounds = list(range(300, 0, -1)) + [7, 6, 1000, 999, 998] + list(range(2000, 1, -1))
+    first = make_rng("pcg64", 4)
+    picks = []
+    for idx, bound in enumerate(bounds):
+        if idx == 150:
+            saved = first.getstate()
+        picks.append(first.randrange(bound))
+    assert all(0 <= pick < bound for pick, bound in zip(picks, bounds))
+    replay = make_rng("pcg64", 4)
+    assert [replay.randrange(bound) for bound in bounds] == picks
+    restored = make_rng("pcg64", 9)
+    restored.setstate(saved)
+    assert [restored.randrange(bound) for bound in bounds[150:]] == picks[150:]
+
+
+@pytest.mark.parametrize("backend", SEEDABLE)
+def test_seeded_backends_replay(backend):
+    decks = []
+    for _ in range(2):
+        cards = list(range(54))
+        make_rng(backend, 11).shuffle(cards)
+        decks.append(cards)
+    assert decks[0] == decks[1] and sorted(decks[0]) == list(range(54))
+
+
+@pytest.mark.parametrize("backend", sorted(set(BACKENDS) - set(SEEDABLE)))
+def test_seed_with_an_unseedable_backend_is_an_argument_error(backend, tmp_path, capsys):
+    runs = (
+        (cli.main, ["3", "--seed", "1", "--rng", backend]),
+        (columns.main, ["draw", "3", str(tmp_path / "out.goec"), "--seed", "1", "--rng", backend]),
+    )
+    for main, argv in runs:
+        with pytest.raises(SystemExit) as exited:
+            main(argv)
+        assert exited.value.code == 2
+        assert "cannot be seeded" in capsys.readouterr().err
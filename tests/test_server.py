@@ -0,0 +1,84 @@
+import asyncio
+
+from server import GameServer
+
+
+def _route(game, method, path):
+    return game.route(method, path.strip("/").split("/"))
+
+
+def test_draw_undo_and_state():
+    game = GameServer(seed=3)
+    status, event = _route(game, "POST", "/tables/a/draw")
+    assert status == 200 and event["event"] == "draw" and event["press"] == 1
+    status, state = _route(game, "GET", "/tables/a")
+    assert status == 200 and state["presses"] == 1 and state["last"]["cards"] == event["cards"]
+    status, undone = _route(game, "POST", "/tables/a/undo")
+    assert status == 200 and undone["cards"] == event["cards"] and undone["presses"] == 0
+    assert _route(game, "POST", "/tables/a/undo") == (409, {"error": "nothing to undo"})
+    assert _route(game, "GET", "/tables") == (200, {"tables": 1})
+
+
+def test_tables_are_seeded_by_default():
+    first, second = GameServer(seed=8), GameServer(seed=8)
+    for _ in range(10):
+        assert _route(first, "POST", "/tables/t/draw") == _route(second, "POST", "/tables/t/draw")
+    assert GameServer().table("t").session.checkpoints is not None
+
+
+def test_seek_and_range():
+    game = GameServer(seed=5)
+    events = [_route(game, "POST", "/tables/a/draw")[1] for _ in range(30)]
+    status, found = _route(game, "GET", "/tables/a/presses/12")
+    assert status == 200 and found["cards"] == events[11]["cards"]
+    status, totals = _route(game, "GET", "/tables/a/presses/3-7")
+    assert status == 200 and (totals["first"], totals["last"]) == (3, 7)
+    assert totals["advantage"] == sum(event["advantage"] for event in events[2:7])
+    assert _route(game, "GET", "/tables/a/presses/31")[0] == 404
+    assert _route(game, "GET", "/tables/a/presses/9-40")[0] == 404
+    assert _route(game, "GET", "/tables/a/presses/x")[0] == 404
+
+
+def test_unseedable_tables_cannot_seek():
+    game = GameServer(backend="secrets")
+    _route(game, "POST", "/tables/a/draw")
+    assert _route(game, "GET", "/tables/a/presses/1") == (409, {"error": "table is not seeded"})
+    assert _route(game, "GET", "/tables/a/presses/1-1")[0] == 200
+
+
+def test_bad_routes():
+    game = GameServer()
+    assert _route(game, "GET", "/nowhere")[0] == 404
+    assert _route(game, "GET", "/tables/a")[0] == 404
+    assert _route(game, "GET", "/tables/a/presses/1")[0] == 404
+    assert _route(game, "POST", "/tables/a/fly")[0] == 404
+    assert _route(game, "GET", "/tables/a/draw")[0] == 405
+    assert _route(game, "POST", "/tables/a")[0] == 405
+    assert _route(game, "GET", "/tables/a b")[0] == 400
+    assert _route(game, "GET", "/tables/a/ranges/1")[0] == 404
+    assert GameServer(max_tables=0).route("POST", ["tables", "a", "draw"])[0] == 503
+
+
+def test_truncated_body_closes_the_connection():
+    async def run():
+        game = GameServer()
+        errors = []
+
+        async def handler(reader, writer):
+            try:
+                await game.handle(reader, writer)
+            except Exception as exc:
+                errors.append(exc)
+
+        server = await asyncio.start_server(handler, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"POST /tables/a/draw HTTP/1.1\r\nContent-Length: 10\r\n\r\nabc")
+        writer.write_eof()
+        reply = await reader.read()
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return reply, errors
+
+    assert asyncio.run(run()) == (b"", [])
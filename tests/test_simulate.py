@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from simulate import main, simulate, simulate_parallel
+
+
+def _histograms(result):
+    return (
+        result.presses,
+        result.advantage.tolist(),
+        result.face_count.tolist(),
+        result.joker_count.tolist(),
+        result.press_length.tolist(),
+        result.xp.tolist(),
+    )
+
+
+def test_parallel_runs_reproduce_and_match_serial_chunks():
+    presses, workers = 30001, 3
+    first = simulate_parallel(presses, seed=11, workers=workers, batch_decks=7)
+    second = simulate_parallel(presses, seed=11, workers=workers, batch_decks=7)
+    assert _histograms(first) == _histograms(second)
+    # The same result, worker by worker, from simulate() on each child
+    # seed and its share of the presses.
+    expected = simulate(0)
+    for idx, child in enumerate(np.random.SeedSequence(11).spawn(workers)):
+        share = presses // workers + (idx < presses % workers)
+        expected.merge(simulate(share, batch_decks=7, rng=np.random.default_rng(child)))
+    assert _histograms(first) == _histograms(expected)
+    assert first.presses == presses
+
+
+@pytest.mark.parametrize("argv", [["10", "--batch-decks", "0"], ["10", "--workers", "0"], ["--", "-1"]])
+def test_rejects_nonpositive_sizes(argv, capsys):
+    with pytest.raises(SystemExit):
+        main(argv)
+    assert "error" in capsys.readouterr().err
@@ -0,0 +1,56 @@
+import pytest
+
+import sprites
+
+pytestmark = pytest.mark.skipif(not sprites.available(), reason="needs Pillow 10.1 or later")
+
+
+class _Root:
+    # SpriteCache only asks the root for its point size before get().
+    def winfo_fpixels(self, distance):
+        return 1.25
+
+
+def test_warm_renders_one_image_per_key():
+    cache = sprites.SpriteCache(_Root(), 50, 70, maxsize=200)
+    cache.warm(scales=(1.0, 0.5), background=False)
+    faces = sprites.all_faces()
+    assert len(cache.rendered) == 2 * len(faces)
+    for rank, suit in faces:
+        assert cache.rendered[rank, suit, 1.0].size == (52, 72)
+        assert cache.rendered[rank, suit, 0.5].size == (27, 37)
+    # Warming again leaves rendered keys alone.
+    image = cache.rendered[faces[0] + (1.0,)]
+    cache.warm(scales=(1.0,), background=False)
+    assert cache.rendered[faces[0] + (1.0,)] is image
+
+
+def test_warm_stops_at_the_cache_size():
+    cache = sprites.SpriteCache(_Root(), 50, 70, maxsize=10)
+    cache.warm(scales=(1.0, 0.5), background=False)
+    assert list(cache.rendered) == [face + (1.0,) for face in sprites.all_faces()[:10]]
+
+
+def test_get_keys_photos_by_rank_suit_and_scale():
+    tkinter = pytest.importorskip("tkinter")
+    try:
+        root = tkinter.Tk()
+    except tkinter.TclError:
+        pytest.skip("needs a display")
+    try:
+        cache = sprites.SpriteCache(root, 50, 70, maxsize=3)
+        cache.warm(scales=(1.0,), background=False)
+        rank, suit = sprites.all_faces()[0]
+        photo = cache.get(rank, suit)
+        assert (rank, suit, 1.0) not in cache.rendered
+        assert cache.get(rank, suit, 1.0) is photo
+        half = cache.get(rank, suit, 0.5)
+        assert half is not photo and half.width() == 27
+        for other_rank, other_suit in sprites.all_faces()[1:3]:
+            cache.get(other_rank, other_suit)
+        # Least recently used goes first.
+        assert list(cache.images) == [(rank, suit, 0.5)] + [
+            face + (1.0,) for face in sprites.all_faces()[1:3]
+        ]
+    finally:
+        root.destroy()
@@ -0,0 +1,74 @@
+import random
+
+from stats import SessionStats
+from timeline import Timeline
+
+
+def totals(stats):
+    return stats.presses, stats.advantage, stats.xp, stats.joker_xp, stats.lengths, stats.index.columns
+
+
+def recounted(timeline):
+    stats = SessionStats()
+    stats.recount(timeline)
+    return stats
+
+
+def test_following_moves_and_branch_switches_matches_a_recount():
+    moves = random.Random(4)
+    timeline = Timeline(random.Random(4))
+    stats = SessionStats()
+    for step in range(1500):
+        roll = moves.random()
+        if roll < 0.6:
+            timeline.press()
+        elif roll < 0.65:
+            timeline.reshuffle()
+        elif roll < 0.8:
+            timeline.undo()
+        elif roll < 0.9:
+            timeline.redo()
+        else:
+            timeline.checkout(moves.choice(timeline.branches()))
+        stats.follow(timeline)
+        if step % 50 == 0:
+            assert totals(stats) == totals(recounted(timeline))
+    assert totals(stats) == totals(recounted(timeline))
+
+
+def test_range_sums_match_the_presses():
+    timeline = Timeline(random.Random(5))
+    stats = SessionStats()
+    outcomes = []
+    for _ in range(300):
+        outcomes.append(timeline.press().outcome)
+        stats.follow(timeline)
+    for first, last in ((1, 300), (1, 1), (17, 203), (256, 300)):
+        run = outcomes[first - 1 : last]
+        found = stats.index.range(first, last)
+        assert found["presses"] == len(run)
+        assert found["advantage"] == sum(outcome.net_advantage for outcome in run)
+        assert found["jokers"] == sum(outcome.joker_count for outcome in run)
+        assert found["press_length"] == sum(outcome.press_length for outcome in run)
+
+
+def test_totals_carry_over_compaction():
+    moves = random.Random(6)
+    timeline = Timeline(random.Random(6))
+    stats = SessionStats()
+    for step in range(1500):
+        roll = moves.random()
+        if roll < 0.7:
+            timeline.press()
+        elif roll < 0.75:
+            timeline.reshuffle()
+        elif roll < 0.95:
+            timeline.undo()
+        else:
+            timeline.redo()
+        stats.follow(timeline)
+        if step % 200 == 199:
+            # As the GUI does: the line is unchanged, only its nodes are new.
+            assert timeline.compact(prune_before=timeline.next_serial)
+            stats.rebind(timeline.current)
+    assert totals(stats) == totals(recounted(timeline))
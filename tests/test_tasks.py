@@ -0,0 +1,99 @@
+import threading
+
+import pytest
+
+from tasks import Cancelled, TaskRunner
+
+
+class _Root:
+    # Just the Tk calls TaskRunner makes; after() callbacks run when the
+    # test calls frame().
+    def __init__(self):
+        self.pending = {}
+        self.ids = 0
+
+    def after(self, ms, callback):
+        self.ids += 1
+        self.pending[self.ids] = callback
+        return self.ids
+
+    def after_cancel(self, after_id):
+        del self.pending[after_id]
+
+    def report_callback_exception(self, kind, value, tb):
+        raise value
+
+    def frame(self):
+        pending, self.pending = self.pending, {}
+        for callback in pending.values():
+            callback()
+
+
+@pytest.fixture
+def runner():
+    busy = []
+    runner = TaskRunner(_Root(), on_busy=lambda count, progress: busy.append((count, progress)))
+    runner.busy_calls = busy
+    yield runner
+    runner.close()
+
+
+def test_completed_task_is_delivered_on_the_next_frame(runner):
+    done = []
+    task = runner.submit("odds", lambda task, value: value * 2, 21, on_done=done.append)
+    task.future.result()
+    assert done == []
+    runner.root.frame()
+    assert done == [42]
+    assert runner.tasks == {} and runner.poll_id is None
+    assert runner.busy_calls[-1] == (0, None)
+
+
+def test_newer_task_cancels_a_running_one(runner):
+    started = threading.Event()
+    release = threading.Event()
+    outcomes = []
+
+    def slow(task):
+        started.set()
+        release.wait()
+        try:
+            task.report(0.5)
+        except Cancelled:
+            outcomes.append("cancelled")
+            raise
+        return "stale"
+
+    done = []
+    first = runner.submit("odds", slow, on_done=done.append)
+    started.wait()
+    runner.submit("odds", lambda task: "fresh", on_done=done.append)
+    assert first.cancelled
+    release.set()
+    first.future.result()
+    runner.executor.submit(lambda: None).result()
+    runner.root.frame()
+    assert outcomes == ["cancelled"]
+    assert done == ["fresh"]
+
+
+def test_errors_go_to_on_error(runner):
+    errors = []
+
+    def fail(task):
+        raise ValueError("boom")
+
+    task = runner.submit("odds", fail, on_error=errors.append)
+    task.future.result()
+    runner.root.frame()
+    assert [str(error) for error in errors] == ["boom"]
+
+
+def test_close_cancels_pending_work(runner):
+    release = threading.Event()
+    runner.submit("slow", lambda task: release.wait())
+    queued = runner.submit("odds", lambda task: "never")
+    runner.close()
+    release.set()
+    assert queued.cancelled
+    assert runner.tasks == {} and runner.root.pending == {}
@@ -0,0 +1,42 @@
+import json
+
+import telemetry
+from telemetry import Tracer
+
+
+def test_ring_keeps_the_latest_spans_in_order():
+    tracer = Tracer(capacity=4)
+    for idx in range(10):
+        tracer.record(f"span{idx % 2}", 1000 * idx, 1000 * idx + idx)
+    spans = list(tracer.spans())
+    assert [(name, start, duration) for name, start, duration, _ in spans] == [
+        ("span0", 6000, 6),
+        ("span1", 7000, 7),
+        ("span0", 8000, 8),
+        ("span1", 9000, 9),
+    ]
+    summary = tracer.summary()
+    assert summary["span0"]["count"] == 2 and summary["span0"]["max"] == 8
+    assert summary["span1"]["total"] == 16
+
+
+def test_chrome_trace_lists_spans_and_counters(tmp_path):
+    tracer = Tracer(capacity=2)
+    with tracer.span("draw"):
+        pass
+    tracer.count("presses", 3)
+    path = tmp_path / "trace.json"
+    tracer.write_chrome_trace(path)
+    events = json.loads(path.read_text())["traceEvents"]
+    assert [event["name"] for event in events if event["ph"] == "X"] == ["draw"]
+    assert {"presses": 3} in [event["args"] for event in events if event["ph"] == "C"]
+
+
+def test_disabled_tracer_records_nothing():
+    telemetry.disable()
+    with telemetry.tracer.span("draw"):
+        pass
+    telemetry.tracer.count("presses")
+    assert not telemetry.tracer.enabled
+    assert telemetry.enable(capacity=8) is telemetry.enable()
+    telemetry.disable()
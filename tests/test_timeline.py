@@ -0,0 +1,164 @@
+import random
+
+import pytest
+
+from engine import DECK_SIZE
+from timeline import MATERIALIZE_CHUNK, PendingPresses, StreamArchive, Timeline, TimelineNode
+
+
+def line_bytes(timeline):
+    segments, back = timeline.line()
+    return [(reshuffle, bytes(stream), drawn, presses) for reshuffle, stream, drawn, presses in segments], back
+
+
+def play(timeline, presses):
+    for _ in range(presses):
+        timeline.press()
+
+
+def test_compact_after_branching_into_archived_segment_keeps_line():
+    timeline = Timeline(random.Random(1))
+    archive = StreamArchive()
+    try:
+        for _ in range(2):
+            play(timeline, 30)
+            timeline.reshuffle()
+        play(timeline, 30)
+        assert timeline.compact(archive, keep=5)
+        # Back into the first (archived) segment, then branch off it with
+        # segments as long as the archived ones they replace.
+        for _ in range(30 + 1 + 30 + 1 + 10):
+            timeline.undo()
+        for _ in range(2):
+            timeline.reshuffle()
+            play(timeline, 30)
+        before = line_bytes(timeline)
+        assert timeline.compact(archive, prune_before=timeline.next_serial, keep=5)
+        assert line_bytes(timeline) == before
+    finally:
+        archive.close()
+
+
+def test_compact_archives_line_that_starts_with_a_reshuffle():
+    timeline = Timeline(random.Random(2))
+    archive = StreamArchive()
+    try:
+        timeline.reshuffle()
+        play(timeline, 5)
+        before = line_bytes(timeline)
+        assert timeline.compact(archive, keep=1)
+        assert line_bytes(timeline) == before
+    finally:
+        archive.close()
+
+
+def test_seek_matches_the_presses_of_the_line():
+    timeline = Timeline(random.Random(3))
+    for length in (45, 0, 90, 7):
+        play(timeline, length)
+        timeline.reshuffle()
+    play(timeline, 60)
+    assert timeline.compact()
+    for _ in range(70):
+        timeline.undo()
+    play(timeline, 3)
+    presses = list(timeline.line_presses())[::-1]
+    for number, cards in enumerate(presses, 1):
+        found = timeline.seek(number)
+        assert tuple(found.cards) == tuple(cards)
+        assert found.position + len(found.deck) == DECK_SIZE
+    for number in (0, len(presses) + 1):
+        with pytest.raises(IndexError):
+            timeline.seek(number)
+
+
+def built_nodes(timeline):
+    # Press and reshuffle nodes from the line's end back to the first
+    # folded press.
+    node = timeline.current
+    while node.redo is not None:
+        node = node.redo
+    count = 0
+    while type(node) is TimelineNode:
+        count += 1
+        node = node._parent
+    return count
+
+
+def test_compact_archives_decks_without_a_reshuffle():
+    timeline = Timeline(random.Random(4))
+    archive = StreamArchive()
+    repeated = 0
+    try:
+        for _ in range(40):
+            play(timeline, 500)
+            written = archive.size
+            assert timeline.compact(archive, keep=100)
+            assert built_nodes(timeline) == 100
+            # Pressing again from the rebuilt node before the first kept
+            # one repeats that press instead of forking, unless it needs a
+            # fresh deck.
+            tip = timeline.current
+            kept = tip
+            while type(kept._parent) is TimelineNode:
+                kept = kept._parent
+            for _ in range(100):
+                timeline.undo()
+            assert timeline.current.redo is kept
+            if len(list(timeline.deck_cards())) >= len(kept.cards):
+                assert timeline.press() is kept
+                repeated += 1
+            while timeline.redo() is not None:
+                pass
+            assert timeline.current is tip and timeline.branches() == [tip]
+        assert repeated > 10
+        assert type(timeline.current._parent) is not PendingPresses
+        # Each compaction appended the new presses rather than rewriting
+        # the line.
+        assert archive.size - written < 1000 * DECK_SIZE // 40
+        assert archive.size >= sum(len(cards) for cards in timeline.line_presses())
+        before = line_bytes(timeline)
+        for _ in range(20_000):
+            timeline.undo()
+        assert timeline.current is timeline.root
+        for _ in range(20_000):
+            timeline.redo()
+        assert line_bytes(timeline) == before
+    finally:
+        archive.close()
+
+
+@pytest.mark.parametrize("keep", [20, MATERIALIZE_CHUNK])
+def test_compacted_timeline_stays_in_step_with_an_uncompacted_one(keep):
+    # Both draw from equal generators; compaction must not change what
+    # any press, undo, redo or reshuffle does.
+    moves = random.Random(9)
+    plain = Timeline(random.Random(9))
+    compacted = Timeline(random.Random(9))
+    archive = StreamArchive()
+    try:
+        for step in range(3000):
+            roll = moves.random()
+            for timeline in (plain, compacted):
+                if roll < 0.6:
+                    timeline.press()
+                elif roll < 0.63:
+                    timeline.reshuffle()
+                elif roll < 0.83:
+                    timeline.undo()
+                elif roll < 0.84:
+                    # Far enough back to reach presses not built yet.
+                    for _ in range(80):
+                        timeline.undo()
+                else:
+                    timeline.redo()
+            if step % 150 == 0:
+                assert compacted.compact(archive, prune_before=compacted.next_serial, keep=keep)
+            if step % 10 == 0:
+                assert line_bytes(compacted) == line_bytes(plain)
+                # A press repeated from a rebuilt node found the node it
+                # repeats rather than forking a new one.
+                assert compacted.next_serial == plain.next_serial
+        assert line_bytes(compacted) == line_bytes(plain)
+    finally:
+        archive.close()
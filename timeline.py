@@ -0,0 +1,663 @@
+"""Branching press timeline with structurally shared deck state.
+
+The deck is a persistent stack of ``(card_id, rest, mask)`` cells, where
+``mask`` is the bitmask of the cards in that stack, so drawing just walks
+down it and every earlier deck state stays valid. Each press is a
+node holding only its own cards and a pointer into that shared stack.
+Undo, redo and switching to another branch only move the ``current``
+pointer.
+
+A reshuffle is also a node: it starts a new segment of the history pane,
+and undoing it brings the previous deck back. Going back a few presses,
+reshuffling and drawing again is how a new branch is started.
+
+Within a segment the cards drawn are just the segment's decks laid end to
+end, so a line of presses can be stored as that card stream alone.
+restore_line() rebuilds a timeline from such streams and only creates
+press nodes, a chunk at a time, when something walks up to them.
+compact() folds the older presses of a live timeline into those streams,
+appending only what was pressed since the last compaction, so long
+sessions keep only recent presses as nodes; a StreamArchive holds the
+streams in a mapped file instead of memory.
+"""
+import mmap
+import random
+import tempfile
+from array import array
+from bisect import bisect_left
+from itertools import islice
+
+from engine import CARD_CLASS, DECK_SIZE, PIP, PIP_TABLE, PIPS_PER_DECK, Seek, resolve_press
+
+MATERIALIZE_CHUNK = 1024
+# Cards whose pips are looked up at a time when walking back over a stream.
+PIP_WINDOW = 4096
+
+
+def fresh_stack(rng):
+    cards = list(range(DECK_SIZE))
+    rng.shuffle(cards)
+    # The last card of the shuffled list is the top, as with deck.pop().
+    stack = None
+    mask = 0
+    for card in cards:
+        mask |= 1 << card
+        stack = (card, stack, mask)
+    return stack
+
+
+def iter_stack(stack):
+    while stack is not None:
+        card, stack, _ = stack
+        yield card
+
+
+def stack_mask(stack):
+    return 0 if stack is None else stack[2]
+
+
+def _press_bounds(stream, end):
+    """(start, end) of each press in ``stream[:end]``, newest first.
+
+    Pips are looked up a window at a time, so walking back a few presses
+    of a long stream only reads the cards near ``end``.
+    """
+    base = end
+    pips = b""
+    while end:
+        found = pips.rfind(1, 0, end - 1 - base) if end - 1 > base else -1
+        if found < 0 and base:
+            base = max(0, min(base, end - 1) - PIP_WINDOW)
+            pips = bytes(stream[base:end]).translate(PIP_TABLE)
+            continue
+        start = base + found + 1
+        yield start, end
+        end = start
+
+
+def _jump(parent, depth):
+    # Skip-list style jump pointer to an earlier node of the segment, so
+    # _ancestor() reaches any depth in O(log n) steps.
+    if not depth or type(parent) is not TimelineNode:
+        return None
+    up = parent.jump
+    if up is not None and up.jump is not None and parent.depth - up.depth == up.depth - up.jump.depth:
+        return up.jump
+    return parent
+
+
+def _ancestor(node, depth):
+    """The node ``depth`` presses into ``node``'s segment.
+
+    Returns the PendingPresses holding that press instead when it has not
+    been built yet.
+    """
+    while node.depth > depth:
+        jump = node.jump
+        if jump is not None and jump.depth >= depth:
+            node = jump
+        else:
+            node = node._parent
+            if type(node) is PendingPresses:
+                return node
+    return node
+
+
+class TimelineNode:
+    __slots__ = ("_parent", "cards", "deck", "depth", "jump", "reshuffle", "_outcome", "redo", "serial")
+
+    def __init__(self, parent, cards, deck, depth, reshuffle=False, serial=None):
+        self._parent = parent
+        self.cards = cards
+        self.deck = deck
+        # Presses since the segment start (the root or latest reshuffle).
+        self.depth = depth
+        self.jump = _jump(parent, depth)
+        self.reshuffle = reshuffle
+        self._outcome = None
+        # Child that redo() returns to: the most recently visited one.
+        self.redo = None
+        self.serial = serial
+
+    @property
+    def parent(self):
+        parent = self._parent
+        if type(parent) is PendingPresses:
+            parent = parent.materialize()
+            parent.redo = self
+            self._parent = parent
+        return parent
+
+    @property
+    def outcome(self):
+        if self._outcome is None and self.cards:
+            self._outcome = resolve_press(self.cards)
+        return self._outcome
+
+
+class LineSegment:
+    """Card stream of one restored or compacted segment: its decks in draw order."""
+
+    def __init__(self, start, stream):
+        self.start = start
+        # bytes or bytearray, or once stored in a StreamArchive a
+        # memoryview of its copy at ``offset`` in ``archive``.
+        self.stream = stream
+        self.archive = None
+        self.offset = 0
+        self.decks = {}
+
+    def extend(self, end, cards, archive=None):
+        """Replace what follows the first ``end`` cards of the stream with ``cards``.
+
+        A stream already in an archive is extended there. The cached decks
+        that may have changed are dropped, so nodes holding their cells
+        must be pointed at new ones with stack_at().
+        """
+        first = -(-end // DECK_SIZE)
+        for index in [index for index in self.decks if index >= first]:
+            del self.decks[index]
+        if self.archive is not None:
+            archive = self.archive
+        if archive is not None:
+            archive.extend(self, end, cards)
+        elif type(self.stream) is bytearray:
+            del self.stream[end:]
+            self.stream += cards
+        else:
+            self.stream = bytearray(self.stream[:end]) + cards
+
+    def stack_at(self, pos):
+        """Deck left after ``pos`` cards of the stream have been drawn."""
+        deck_index, offset = divmod(pos, DECK_SIZE)
+        if offset == 0 and pos:
+            return None
+        cells = self.decks.get(deck_index)
+        if cells is None:
+            base = deck_index * DECK_SIZE
+            cells = [None] * (DECK_SIZE + 1)
+            mask = 0
+            for idx in range(DECK_SIZE - 1, -1, -1):
+                card = self.stream[base + idx]
+                mask |= 1 << card
+                cells[idx] = (card, cells[idx + 1], mask)
+            self.decks[deck_index] = cells
+        return cells[offset]
+
+
+class PendingPresses:
+    """The first ``count`` presses of a restored segment, not yet built.
+
+    They cover ``segment.stream[:end]``; materialize() builds the last
+    chunk of them and returns the node for the press ending at ``end``.
+    """
+
+    __slots__ = ("segment", "end", "count")
+
+    def __init__(self, segment, end, count):
+        self.segment = segment
+        self.end = end
+        self.count = count
+
+    def materialize(self):
+        segment = self.segment
+        stream = segment.stream
+        bounds = list(islice(_press_bounds(stream, self.end), min(self.count, MATERIALIZE_CHUNK)))
+        count = self.count - len(bounds)
+        parent = PendingPresses(segment, bounds[-1][0], count) if count else segment.start
+        node = None
+        for depth, (start, stop) in enumerate(reversed(bounds), count + 1):
+            cards = tuple(stream[start:stop])
+            node = TimelineNode(parent, cards, segment.stack_at(stop), depth)
+            if type(parent) is TimelineNode:
+                parent.redo = node
+            parent = node
+        return node
+
+
+class Timeline:
+    def __init__(self, rng=random):
+        self.rng = rng
+        self.journal = None
+        self.next_serial = 1
+        self.root = TimelineNode(None, (), None, 0, reshuffle=True, serial=0)
+        self.current = self.root
+        # Leaf nodes in creation order; a dict keeps them ordered and
+        # gives O(1) removal when a leaf is extended.
+        self.tips = {self.root: None}
+        # Segments whose streams are in memory rather than an archive.
+        self._resident = []
+        self._reset_segments()
+
+    def _reset_segments(self):
+        # Segment starts of the line last sought, with the presses and decks
+        # dealt before each. Lines share their earlier segments, so seek()
+        # only extends or trims these.
+        self._starts = []
+        self._start_index = {}
+        self._presses_before = array("q")
+        self._decks_before = array("q")
+
+    def _add(self, node):
+        parent = node.parent
+        self.tips.pop(parent, None)
+        self.tips[node] = None
+        parent.redo = node
+        node.serial = self.next_serial
+        self.next_serial += 1
+        self.current = node
+        return node
+
+    def _fresh_stack(self):
+        stack = fresh_stack(self.rng)
+        if self.journal is not None:
+            self.journal.log_deck(list(iter_stack(stack)))
+        return stack
+
+    def press(self):
+        current = self.current
+        stack = current.deck
+        card_class = CARD_CLASS
+        cards = []
+        while True:
+            if stack is None:
+                stack = self._fresh_stack()
+            card, stack, _ = stack
+            cards.append(card)
+            if card_class[card] == PIP:
+                break
+        cards = tuple(cards)
+        # Drawing again from a deck state repeats the undone press unless a
+        # reshuffle intervened, so reuse that node instead of forking.
+        child = current.redo
+        if child is not None and child.cards == cards and child.deck is stack:
+            self.current = child
+        else:
+            self._add(TimelineNode(current, cards, stack, current.depth + 1))
+        if self.journal is not None:
+            self.journal.log_press(cards)
+        return self.current
+
+    def reshuffle(self):
+        node = self._add(TimelineNode(self.current, (), self._fresh_stack(), 0, reshuffle=True))
+        if self.journal is not None:
+            self.journal.log_reshuffle()
+        return node
+
+    def undo(self):
+        node = self.current
+        parent = node.parent
+        if parent is None:
+            return None
+        parent.redo = node
+        self.current = parent
+        if self.journal is not None:
+            self.journal.log_undo()
+        return node
+
+    def redo(self):
+        node = self.current.redo
+        if node is None:
+            return None
+        self.current = node
+        if self.journal is not None:
+            self.journal.log_redo()
+        return node
+
+    def checkout(self, node):
+        self.current = node
+        if self.journal is not None:
+            self.journal.log_checkout(node.serial)
+        return node
+
+    def branches(self):
+        return list(self.tips)
+
+    def deck_cards(self):
+        return iter_stack(self.current.deck)
+
+    def deck_mask(self):
+        return stack_mask(self.current.deck)
+
+    def segment(self, node=None):
+        """Press nodes from the segment start up to ``node`` (default current)."""
+        node = self.current if node is None else node
+        presses = []
+        while not node.reshuffle:
+            presses.append(node)
+            node = node.parent
+        presses.reverse()
+        return presses
+
+    def line_presses(self, node=None):
+        """Cards of every press from the root up to ``node``, newest first.
+
+        Presses not yet built are read from their segment's stream, so
+        this never materializes a compacted line.
+        """
+        node = self.current if node is None else node
+        while node is not None:
+            if type(node) is PendingPresses:
+                segment = node.segment
+                stream = segment.stream
+                for start, end in _press_bounds(stream, node.end):
+                    yield bytes(stream[start:end])
+                node = segment.start
+            else:
+                if node.cards:
+                    yield node.cards
+                node = node._parent
+
+    def line(self):
+        """Describe the current line for a snapshot.
+
+        Returns (segments, back). The line runs from the root to the end of
+        the current redo chain and ``back`` is how many undo steps the
+        current node sits behind that end. Each segment is (reshuffle,
+        stream, drawn, presses): ``stream`` holds the card ids of the
+        segment's decks in draw order and the first ``drawn`` of them were
+        drawn by its ``presses`` presses.
+        """
+        tip = self.current
+        back = 0
+        while tip.redo is not None:
+            tip = tip.redo
+            back += 1
+        segments = []
+        last = tip
+        while last is not None:
+            parts = []
+            presses = 0
+            if type(last) is PendingPresses:
+                segment = last.segment
+                parts.append(segment.stream[: last.end])
+                presses = last.count
+                remaining = segment.stream[last.end:]
+                start = segment.start
+            else:
+                remaining = bytes(iter_stack(last.deck))
+                node = last
+                while not node.reshuffle:
+                    parent = node._parent
+                    parts.append(bytes(node.cards))
+                    presses += 1
+                    if type(parent) is PendingPresses:
+                        parts.append(parent.segment.stream[: parent.end])
+                        presses += parent.count
+                        node = parent.segment.start
+                        break
+                    node = parent
+                start = node
+            parts.reverse()
+            drawn = b"".join(parts)
+            segments.append((start._parent is not None, drawn + remaining, len(drawn), presses))
+            last = start._parent
+        segments.reverse()
+        return segments, back
+
+    def _segment_of(self, node):
+        """Start of ``node``'s segment and the presses in it up to ``node``."""
+        if type(node) is PendingPresses:
+            return node.segment.start, node.count
+        found = _ancestor(node, 0)
+        return (found.segment.start if type(found) is PendingPresses else found), node.depth
+
+    def _line_to(self, start):
+        """Index of segment ``start`` in the cached segment arrays.
+
+        Walks back only to the last segment the cached line shares with
+        this one and replaces the segments after it.
+        """
+        starts = self._starts
+        start_index = self._start_index
+        added = []
+        node = start
+        while True:
+            index = start_index.get(node)
+            if index is not None and index < len(starts) and starts[index] is node:
+                break
+            parent = node._parent
+            if parent is None:
+                index = -1
+                added.append((node, 0))
+                break
+            previous, presses = self._segment_of(parent)
+            added.append((node, presses))
+            node = previous
+        del starts[index + 1 :]
+        del self._presses_before[index + 1 :]
+        del self._decks_before[index + 1 :]
+        for node, presses in reversed(added):
+            if starts:
+                previous = starts[-1]
+                if presses:
+                    decks = (presses - 1) // PIPS_PER_DECK + 1
+                else:
+                    decks = 1 if previous.deck is not None else 0
+                self._presses_before.append(self._presses_before[-1] + presses)
+                self._decks_before.append(self._decks_before[-1] + decks)
+            else:
+                self._presses_before.append(0)
+                self._decks_before.append(0)
+            start_index[node] = len(starts)
+            starts.append(node)
+        return len(starts) - 1
+
+    def steps_from_root(self, node):
+        """Undo steps from ``node`` back to the root: its presses and reshuffles."""
+        start, presses = self._segment_of(node)
+        index = self._line_to(start)
+        return self._presses_before[index] + presses + index
+
+    def seek(self, number):
+        """Press ``number`` of the current line (1-based, from the root).
+
+        The line runs from the root to the current node, as the session
+        stats do. Returns an engine.Seek; ``cycle`` counts the decks dealt
+        along the line before the press's deck and ``deck`` is the rest of
+        that deck in draw order. A bisect over the presses before each
+        segment finds the press's segment and the node's jump pointers
+        reach it in O(log n), so seeking never rebuilds the line. A press
+        not built yet is found in its segment's stream: a segment is whole
+        decks laid end to end and every deck has PIPS_PER_DECK pips, one
+        per press, so only the deck the press ends in is scanned.
+        """
+        if number < 1:
+            raise IndexError(f"press {number} is not on this line")
+        current = self.current
+        head, presses = self._segment_of(current)
+        last = self._line_to(head)
+        presses_before = self._presses_before
+        if number > presses_before[last] + presses:
+            raise IndexError(f"press {number} is not on this line")
+        index = bisect_left(presses_before, number, 0, last + 1) - 1
+        press = number - presses_before[index]
+        deck_index = (press - 1) // PIPS_PER_DECK
+        cycle = self._decks_before[index] + deck_index
+        tail = current if index == last else self._starts[index + 1]._parent
+        found = tail if type(tail) is PendingPresses else _ancestor(tail, press)
+        if type(found) is TimelineNode:
+            cards = found.cards
+            rest = bytes(iter_stack(found.deck))
+            return Seek(number, cards, found.outcome, cycle, DECK_SIZE - len(rest), rest)
+        stream = found.segment.stream
+        pip = (press - 1) % PIPS_PER_DECK
+        base = deck_index * DECK_SIZE
+        pips = bytes(stream[base : base + DECK_SIZE]).translate(PIP_TABLE)
+        start = -1
+        end = pips.find(1)
+        for _ in range(pip):
+            start = end
+            end = pips.find(1, end + 1)
+        end += base + 1
+        if start >= 0:
+            start += base + 1
+        elif deck_index:
+            # The press began with the cards after the last pip of the
+            # previous deck.
+            previous = bytes(stream[base - DECK_SIZE : base]).translate(PIP_TABLE)
+            start = base - DECK_SIZE + previous.rfind(1) + 1
+        else:
+            start = 0
+        cards = tuple(stream[start:end])
+        rest = bytes(stream[end : base + DECK_SIZE])
+        return Seek(number, cards, resolve_press(cards), cycle, end - base, rest)
+
+    def restore_line(self, segments, back=0, tip_serial=None, next_serial=None):
+        """Replace the timeline with a line described by line().
+
+        Only the segment starts and the line's end are built up front; the
+        presses in between are created when undo or a history walk reaches
+        them. Other branches are not part of a line and are not restored.
+        """
+        root = TimelineNode(None, (), None, 0, reshuffle=True, serial=0)
+        last = root
+        resident = []
+        for idx, (reshuffle, stream, drawn, presses) in enumerate(segments):
+            if idx == 0:
+                start = root
+            else:
+                start = TimelineNode(last, (), None, 0, reshuffle=True)
+                if type(last) is TimelineNode:
+                    last.redo = start
+            segment = LineSegment(start, stream)
+            resident.append(segment)
+            if reshuffle:
+                start.deck = segment.stack_at(0)
+            last = PendingPresses(segment, drawn, presses) if presses else start
+        tip = last.materialize() if type(last) is PendingPresses else last
+        if tip_serial is not None:
+            tip.serial = tip_serial
+        self.root = root
+        self.tips = {tip: None}
+        self._resident = resident
+        self._reset_segments()
+        if next_serial is not None:
+            self.next_serial = next_serial
+        node = tip
+        for _ in range(back):
+            node = node.parent
+        self.current = node
+        return node
+
+    def compact(self, archive=None, prune_before=None, keep=MATERIALIZE_CHUNK):
+        """Fold the older presses of the current line into card streams.
+
+        The presses built since the last compaction are folded into their
+        segments' streams and rebuilt when undo reaches them, except the
+        ``keep`` before the current node and the redo chain after it. A
+        segment's stream only has the new presses appended to it, so each
+        compaction costs what was played since the last one. With
+        ``archive``, streams are moved to it; one already archived stays
+        in its archive. Compacting drops the other branches, so it does
+        nothing while there are any, except that branches whose tips have
+        a serial below ``prune_before`` are given up.
+        """
+        tip = self.current
+        back = 0
+        while tip.redo is not None:
+            tip = tip.redo
+            back += 1
+        for other in self.tips:
+            if other is not tip and (prune_before is None or other.serial >= prune_before):
+                return False
+        self.tips = {tip: None}
+        if archive is not None:
+            for segment in self._resident:
+                if segment.archive is None:
+                    segment.extend(len(segment.stream), b"", archive)
+            self._resident = []
+        nodes = []
+        node = tip
+        while type(node) is TimelineNode:
+            nodes.append(node)
+            node = node._parent
+        nodes.reverse()
+        fold = len(nodes) - back - max(keep, 1)
+        # The presses built in each segment, after the PendingPresses or
+        # segment start they hang from.
+        base = node
+        first = 0
+        for index in range(len(nodes) + 1):
+            node = nodes[index] if index < len(nodes) else None
+            if node is not None and not node.reshuffle:
+                continue
+            if index > first and fold > first:
+                self._fold(base, nodes[first:index], min(fold, index) - first, node, archive)
+            base = node
+            first = index + 1
+        return True
+
+    def _fold(self, base, presses, folded, after, archive):
+        """Fold the first ``folded`` of a segment's ``presses`` into its stream.
+
+        ``base`` is what the presses hang from and ``after`` is the
+        reshuffle that ends the segment, if any. The presses left as nodes
+        get deck cells from the stream, as the nodes undo rebuilds from it
+        will, so redo and repeated presses still find them.
+        """
+        if type(base) is PendingPresses:
+            segment, end, count = base.segment, base.end, base.count
+        else:
+            segment = LineSegment(base, b"")
+            end = count = 0
+            if archive is None:
+                self._resident.append(segment)
+            # Undo rebuilds the folded presses and points this back at them.
+            base.redo = None
+        cards = b"".join([bytes(node.cards) for node in presses])
+        segment.extend(end, cards + bytes(iter_stack(presses[-1].deck)), archive)
+        if type(base) is TimelineNode and base.deck is not None:
+            base.deck = segment.stack_at(0)
+        for node in presses[:folded]:
+            end += len(node.cards)
+        parent = PendingPresses(segment, end, count + folded)
+        for node in presses[folded:]:
+            end += len(node.cards)
+            node.deck = segment.stack_at(end)
+            node._parent = parent
+            node.jump = _jump(parent, node.depth)
+            parent = node
+        if after is not None:
+            after._parent = parent
+
+
+class StreamArchive:
+    """Append-only file of segments' card streams, read via mmap.
+
+    A segment stored here keeps a view of its copy in the file, so it
+    costs no memory until it is paged back in. A stream that is extended
+    grows in place while its copy is the last in the file and is copied
+    to the end otherwise; earlier copies stay valid for any views still
+    using them. The file is grown by doubling and mapped again each time.
+    """
+
+    def __init__(self, path=None):
+        self.file = open(path, "w+b") if path else tempfile.TemporaryFile()
+        self.size = 0
+        self.capacity = 0
+        self.map = None
+
+    def extend(self, segment, end, cards):
+        """Store ``segment``'s first ``end`` cards followed by ``cards``."""
+        if segment.archive is self and segment.offset + len(segment.stream) == self.size:
+            offset = segment.offset
+            self.size = offset + end
+        else:
+            offset = self.size
+            cards = bytes(segment.stream[:end]) + cards
+        size = self.size + len(cards)
+        if size > self.capacity:
+            self.capacity = max(size, 2 * self.capacity, 1 << 16)
+            self.file.truncate(self.capacity)
+            self.map = mmap.mmap(self.file.fileno(), self.capacity, access=mmap.ACCESS_READ)
+        self.file.seek(self.size)
+        self.file.write(cards)
+        self.file.flush()
+        self.size = size
+        segment.archive = self
+        segment.offset = offset
+        segment.stream = memoryview(self.map if self.map is not None else b"")[offset:size]
+
+    def close(self):
+        self.file.close()